@@ -0,0 +1,210 @@
+"""
+GET /api/analytics/jobs against the export it replaces: paging every joblist
+and job_applications row out of PostgREST and aggregating in Python. Checks
+the endpoint's percentiles, histograms and bid stats against an independent
+computation over the exported rows, and that a new job shows up after
+refresh_job_analytics() and not before. A few jobs carry shift times and
+dates that do not parse, as rows from before the API validated them do; the
+views leave them out of the shift stats instead of failing.
+
+    cd backend && python -m bench.analytics --latency-ms 20 --jobs 5000 --applications 20000
+"""
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import orjson
+from loguru import logger
+
+from bench import fake_postgrest
+from bench.harness import import_app, api_client, make_token, percentile
+from bench.seed import generate_dataset, load_dataset, job_form
+
+EXPORT_PAGE = 1000
+
+
+def export_table(supabase, table, columns):
+    """Everything in a table, a page at a time, as an analyst's export script would."""
+    rows, size = [], 0
+    while True:
+        query = supabase.from_(table).select(columns).order("id").limit(EXPORT_PAGE)
+        page = (query.gt("id", rows[-1]["id"]) if rows else query).execute()
+        rows.extend(page.data)
+        size += len(orjson.dumps(page.data))
+        if len(page.data) < EXPORT_PAGE:
+            return rows, size
+
+
+def add_legacy_rows(jobs):
+    for i, job in enumerate(jobs):
+        if i % 97 == 0:
+            job["start_of_shift"] = "25:99"
+        elif i % 89 == 0:
+            job["duration_upto"] = "2024-02-30"
+
+
+def shift_hours(job):
+    """Hours worked, or None for a shift Postgres cannot read as times."""
+    start_h, start_m = map(int, job["start_of_shift"].split(":"))
+    end_h, end_m = map(int, job["end_of_shift"].split(":"))
+    if not (start_h < 24 and start_m < 60 and end_h < 24 and end_m < 60):
+        return None
+    hours = (end_h * 60 + end_m - start_h * 60 - start_m) / 60
+    return (hours if hours > 0 else hours + 24) - (job["break"] or 0)
+
+
+def quantiles(values):
+    """p10..p90 with the inclusive method, which is what percentile_cont computes."""
+    deciles = statistics.quantiles(values, n=10, method="inclusive") if len(values) > 1 else [values[0]] * 9
+    quartiles = statistics.quantiles(values, n=4, method="inclusive") if len(values) > 1 else [values[0]] * 3
+    return {"p10": deciles[0], "p25": quartiles[0], "p50": quartiles[1], "p75": quartiles[2], "p90": deciles[8]}
+
+
+def expected_stats(jobs, applications):
+    """The numbers the views should hold, computed straight from exported rows."""
+    salaries, shifts, bids = defaultdict(list), defaultdict(list), defaultdict(list)
+    by_id = {j["id"]: j for j in jobs}
+    for j in jobs:
+        condition = j["salary_condition"] or "unspecified"
+        hours = shift_hours(j)
+        for location in (j["location"], "*"):
+            salaries[(j["category"], location, condition)].append(j["salary"])
+            if hours is not None:
+                shifts[(j["category"], location)].append(hours)
+    for a in applications:
+        job = by_id[a["jobid"]]
+        for location in (job["location"], "*"):
+            bids[(job["category"], location)].append(a)
+    expected = {}
+    for key, values in salaries.items():
+        expected[("salary",) + key] = {"job_count": len(values), **quantiles(values)}
+    for key, values in shifts.items():
+        expected[("shifts",) + key] = {"job_count": len(values), "p50_shift_hours": statistics.median(values),
+                                       "shifts_8_10h": sum(1 for h in values if 8 <= h < 10)}
+    for key, group in bids.items():
+        placed = [a for a in group if a["bid_amount"] is not None]
+        expected[("bids",) + key] = {
+            "application_count": len(group), "bid_count": len(placed),
+            "p50_bid_ratio": statistics.median(a["bid_amount"] / a["amount"] for a in placed) if placed else None,
+        }
+    return expected
+
+
+def compare(body, expected):
+    """Names of the (section, key, stat) cells where the endpoint disagrees with the export."""
+    keys = {"salary": ("category", "location", "salary_condition"), "shifts": ("category", "location"),
+            "bids": ("category", "location")}
+    seen, wrong = set(), []
+    for section, columns in keys.items():
+        for row in body[section]:
+            key = (section,) + tuple(row[c] for c in columns)
+            seen.add(key)
+            for stat, value in expected.get(key, {}).items():
+                if value is None or row.get(stat) is None:
+                    ok = value == row.get(stat)
+                else:
+                    ok = math.isclose(row[stat], value, rel_tol=1e-9, abs_tol=1e-9)
+                if not ok:
+                    wrong.append(f"{key} {stat}: {row.get(stat)} != {value}")
+    wrong += [f"{key}: missing" for key in expected.keys() - seen]
+    return wrong
+
+
+async def run(app, args, parttimer_id):
+    from routers.analytics import analytics_cache
+    from utils.supabase_client import supabase
+
+    headers = {"Authorization": f"Bearer {make_token(parttimer_id)}"}
+    failures = []
+    async with api_client(app) as client:
+        started = time.perf_counter()
+        jobs, job_bytes = await asyncio.to_thread(
+            export_table, supabase, "joblist",
+            "id, category, location, salary, salary_condition, start_of_shift, end_of_shift, break")
+        applications, application_bytes = await asyncio.to_thread(
+            export_table, supabase, "job_applications", "id, jobid, amount, bid_amount")
+        expected = expected_stats(jobs, applications)
+        export_ms = (time.perf_counter() - started) * 1000
+        print(f"{len(jobs)} jobs, {len(applications)} applications, {args.latency_ms:.0f}ms backend latency")
+        print(f"  export + aggregate in Python  {export_ms:8.1f} ms  {(job_bytes + application_bytes) / 1024:8.1f} KiB")
+
+        cold, warm = [], []
+        for i in range(args.requests):
+            analytics_cache.clear()
+            started = time.perf_counter()
+            res = await client.get("/api/analytics/jobs", headers=headers)
+            cold.append((time.perf_counter() - started) * 1000)
+            res.raise_for_status()
+            started = time.perf_counter()
+            await client.get("/api/analytics/jobs", headers=headers)
+            warm.append((time.perf_counter() - started) * 1000)
+        body = res.json()
+        print(f"  /api/analytics/jobs (views)   {percentile(cold, 50):8.1f} ms  {len(res.content) / 1024:8.1f} KiB  "
+              f"({len(body['salary'])} salary, {len(body['shifts'])} shift, {len(body['bids'])} bid rows)")
+        print(f"  /api/analytics/jobs (cached)  {percentile(warm, 50):8.1f} ms")
+
+        category = body["salary"][0]["category"]
+        filtered = (await client.get("/api/analytics/jobs", params={"category": category, "location": "*"},
+                                     headers=headers)).json()
+        if not filtered["salary"] or any(r["category"] != category or r["location"] != "*" for r in filtered["salary"]):
+            failures.append("the category/location filter returned other rows")
+
+        wrong = compare(body, expected)
+        print(f"  matches the export: {'yes' if not wrong else 'NO'}")
+        failures += wrong[:10]
+
+        # the views only move when they are refreshed
+        employer_token = make_token(args.employer_id)
+        form = job_form(random.Random(11))
+        form.update(category="Bench Analytics", salary=1234)
+        res = await client.post("/api/joblist/listNewJob", json=form,
+                                headers={"Authorization": f"Bearer {employer_token}"})
+        res.raise_for_status()
+        params = {"category": "Bench Analytics", "location": "*"}
+        analytics_cache.clear()
+        before = (await client.get("/api/analytics/jobs", params=params, headers=headers)).json()["salary"]
+        await asyncio.to_thread(lambda: supabase.rpc("refresh_job_analytics", {}).execute())
+        analytics_cache.clear()
+        after = (await client.get("/api/analytics/jobs", params=params, headers=headers)).json()["salary"]
+        refreshed = not before and len(after) == 1 and after[0]["p50"] == 1234
+        print(f"  new job counted after refresh_job_analytics() only: {'yes' if refreshed else 'NO'}")
+        if not refreshed:
+            failures.append("the views did not follow refresh_job_analytics()")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--applications", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    logger.remove()
+    process = fake_postgrest.serve_in_process(args.port)
+    app = import_app(f"http://127.0.0.1:{args.port}")
+    try:
+        from utils.supabase_client import supabase
+
+        data, tables = generate_dataset(employers=50, parttimers=500, jobs=args.jobs, applications=args.applications)
+        add_legacy_rows(tables["joblist"])
+        load_dataset(supabase, tables)
+        supabase.rpc("bench_configure", {"latency_ms": args.latency_ms}).execute()
+        args.employer_id = data.employers[0]
+        ok = asyncio.run(run(app, args, data.parttimers[0]))
+    finally:
+        process.terminate()
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
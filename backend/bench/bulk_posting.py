@@ -0,0 +1,79 @@
+"""
+Per-item vs batch job posting and job applications.
+
+    cd backend && python -m bench.bulk_posting --items 50 --latency-ms 20
+"""
+import argparse
+import asyncio
+import time
+
+from bench.harness import start_stack, api_client, make_token, seed_employer, seed_parttimer
+
+
+def job_form(i):
+    return {
+        "category": "Household & Care Services",
+        "location": "Makati",
+        "duration_from": "2026-11-01",
+        "duration_upto": "2026-11-30",
+        "start_of_shift": "08:00",
+        "end_of_shift": "17:00",
+        "break_": 1,
+        "salary": 600 + i,
+        "salary_condition": "per day",
+        "short_desc": "Babysitter",
+        "long_desc": f"Shift #{i}",
+    }
+
+
+def report(label, count, elapsed, round_trips):
+    print(f"{label:<22} {count:>4} items  {elapsed * 1000:8.1f} ms  {count / elapsed:8.1f} items/s  "
+          f"{round_trips:>4} backend calls")
+
+
+async def run(app, store, items):
+    emp_headers = {"Authorization": f"Bearer {make_token(seed_employer(store))}"}
+    pt_headers = {"Authorization": f"Bearer {make_token(seed_parttimer(store))}"}
+
+    async with api_client(app) as client:
+        before, start = store.request_count, time.perf_counter()
+        for i in range(items):
+            res = await client.post("/api/joblist/listNewJob", json=job_form(i), headers=emp_headers)
+            res.raise_for_status()
+        report("listNewJob x N", items, time.perf_counter() - start, store.request_count - before)
+
+        before, start = store.request_count, time.perf_counter()
+        res = await client.post("/api/joblist/listNewJobs", json=[job_form(i) for i in range(items)], headers=emp_headers)
+        res.raise_for_status()
+        report("listNewJobs (batch)", items, time.perf_counter() - start, store.request_count - before)
+        job_ids = [r["job"]["id"] for r in res.json()["results"]]
+
+        before, start = store.request_count, time.perf_counter()
+        for job_id in job_ids:
+            res = await client.post(f"/api/parttimer/apply_job/{job_id}", json={"amount": 600}, headers=pt_headers)
+            res.raise_for_status()
+        report("apply_job x N", items, time.perf_counter() - start, store.request_count - before)
+
+        more_ids = [r["job"]["id"] for r in (await client.post(
+            "/api/joblist/listNewJobs", json=[job_form(i) for i in range(items)], headers=emp_headers)).json()["results"]]
+        before, start = store.request_count, time.perf_counter()
+        res = await client.post("/api/parttimer/apply_jobs",
+                                json=[{"jobid": job_id, "amount": 600} for job_id in more_ids], headers=pt_headers)
+        res.raise_for_status()
+        report("apply_jobs (batch)", items, time.perf_counter() - start, store.request_count - before)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    app, store, server = start_stack(args.port, args.latency_ms)
+    asyncio.run(run(app, store, args.items))
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+First-request latency of a freshly started server, with and without the
+lifespan warmup, and a graceful-drain check of the multi-worker runner.
+
+Both servers are real processes against the PostgREST stand-in:
+  before:  uvicorn main:app --lifespan off  (clients and caches built on first use)
+  after:   python serve.py                   (lifespan warmup, timed until /readyz)
+Then serve.py with two workers gets a SIGTERM: /readyz must turn 503 while
+requests are still answered, and the server must exit within the drain window
+plus the graceful timeout.
+
+    cd backend && python -m bench.cold_start --latency-ms 20 --jobs 5000
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from loguru import logger
+
+from bench import fake_postgrest
+from bench.harness import FAKE_KEY, make_token
+from bench.seed import generate_dataset, load_dataset
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JWT_SECRET = "bench-secret"
+
+FIRST_REQUESTS = [
+    ("taxonomy", "/api/joblist/get_categories_with_short_descs", {}),
+    ("search", "/api/joblist/search", {"q": "cashier"}),
+    ("nearby jobs", "/api/parttimer/job/nearby", {"radius_km": 5}),
+    ("recommended", "/api/parttimer/job/recommended", {}),
+    ("feed", "/api/parttimer/job", {"limit": 20}),
+]
+
+
+def server_env(args, **extra):
+    return {
+        **os.environ,
+        "SUPABASE_URL": f"http://127.0.0.1:{args.backend_port}",
+        "SUPABASE_ANON_KEY": FAKE_KEY,
+        "GOOGLE_CLIENT_ID": "bench-client-id",
+        "GOOGLE_JWKS_URL": f"http://127.0.0.1:{args.backend_port}/oauth2/v3/certs",
+        "JWT_SECRET": JWT_SECRET,
+        "RATE_LIMIT_ENABLED": "0",
+        "PORT": str(args.port),
+        "LOG_LEVEL": "warning",
+        **extra,
+    }
+
+
+def launch(command, env, log):
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_for(url, status=200, timeout=120):
+    """Seconds until url answers with status."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if httpx.get(url, timeout=1).status_code == status:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise RuntimeError(f"{url} did not answer {status} within {timeout}s")
+
+
+async def first_requests(base_url, headers):
+    timings = {}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=60) as client:
+        for name, path, params in FIRST_REQUESTS:
+            started = time.perf_counter()
+            res = await client.get(path, params=params)
+            timings[name] = ((time.perf_counter() - started) * 1000, res.status_code)
+    return timings
+
+
+def stop(process):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def cold_starts(args, headers, log):
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {}
+    for label, command, env, ready_path in (
+        ("before", [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--lifespan", "off",
+                    "--log-level", "warning"], server_env(args), "/livez"),
+        ("after", [sys.executable, "serve.py"], server_env(args, WEB_CONCURRENCY="1", DRAIN_SECONDS="0"), "/readyz"),
+    ):
+        process = launch(command, env, log)
+        try:
+            ready = wait_for(base_url + ready_path)
+            results[label] = ready, asyncio.run(first_requests(base_url, headers))
+        finally:
+            stop(process)
+    return results
+
+
+def drain(args, log):
+    """Poll /readyz and a plain endpoint through a SIGTERM; returns (saw 503 while serving, seconds to exit)."""
+    base_url = f"http://127.0.0.1:{args.port}"
+    process = launch([sys.executable, "serve.py"],
+                     server_env(args, WEB_CONCURRENCY="2", DRAIN_SECONDS=str(args.drain_seconds)), log)
+    try:
+        wait_for(base_url + "/readyz")
+        process.send_signal(signal.SIGTERM)
+        signalled = time.perf_counter()
+        drained_while_serving = False
+        while process.poll() is None and time.perf_counter() - signalled < args.drain_seconds + 35:
+            try:
+                ready = httpx.get(base_url + "/readyz", timeout=1).status_code
+                serving = httpx.get(base_url + "/api/joblist/get_job_category", timeout=1).status_code
+                drained_while_serving |= ready == 503 and serving == 200
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+        process.wait(5)
+        return drained_while_serving, time.perf_counter() - signalled
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--parttimers", type=int, default=2000)
+    parser.add_argument("--applications", type=int, default=10000)
+    parser.add_argument("--drain-seconds", type=float, default=2.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--backend-port", type=int, default=54321)
+    args = parser.parse_args()
+
+    os.environ["JWT_SECRET"] = JWT_SECRET
+    logger.remove()
+    backend = fake_postgrest.serve_in_process(args.backend_port)
+    log = tempfile.NamedTemporaryFile("w+", suffix=".log", delete=False)
+    failures = []
+    try:
+        from supabase import create_client
+
+        client = create_client(f"http://127.0.0.1:{args.backend_port}", FAKE_KEY)
+        data, tables = generate_dataset(employers=50, parttimers=args.parttimers, jobs=args.jobs,
+                                        applications=args.applications)
+        load_dataset(client, tables)
+        client.rpc("bench_configure", {"latency_ms": args.latency_ms,
+                                       "table_latency_ms": {"certs": 100}}).execute()
+        headers = {"Authorization": f"Bearer {make_token(data.parttimers[0])}"}
+
+        print(f"{args.jobs} jobs, {args.parttimers} part-timers, {args.latency_ms:.0f}ms backend latency")
+        results = cold_starts(args, headers, log)
+        print(f"  {'first request':<14} {'before':>10} {'after':>10}")
+        for name, _, _ in FIRST_REQUESTS:
+            (before, before_status), (after, after_status) = results["before"][1][name], results["after"][1][name]
+            print(f"  {name:<14} {before:8.1f}ms {after:8.1f}ms")
+            if before_status != 200 or after_status != 200:
+                failures.append(f"{name} answered {before_status} before, {after_status} after")
+        print(f"  time to ready: before {results['before'][0]:.2f}s (port open), "
+              f"after {results['after'][0]:.2f}s (/readyz, warmup included)")
+
+        drained, exit_seconds = drain(args, log)
+        print(f"  SIGTERM with 2 workers: /readyz 503 while still serving: {'yes' if drained else 'NO'}, "
+              f"exited after {exit_seconds:.1f}s")
+        if not drained:
+            failures.append("readiness did not fail during the drain")
+    finally:
+        backend.terminate()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        print(f"server log: {log.name}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare blocking supabase calls inside coroutines against utils.db.run_query.
+
+    cd backend && python -m bench.db_throughput --requests 200 --latency-ms 20
+
+Each simulated request performs one select against the local PostgREST
+stand-in. With blocking calls the coroutines serialize on the event loop;
+through run_query they overlap up to DB_MAX_CONCURRENCY.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from bench import fake_postgrest
+from bench.harness import FAKE_KEY
+
+
+async def blocking_request(client):
+    client.from_("job_category").select("category").execute()
+
+
+async def pooled_request(client, run_query):
+    await run_query(client.from_("job_category").select("category"))
+
+
+async def measure(label, make_call, total):
+    start = time.perf_counter()
+    await asyncio.gather(*(make_call() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {total} requests in {elapsed:6.2f}s  ->  {total / elapsed:8.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    server = fake_postgrest.serve_in_thread(args.port, args.latency_ms)
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ["SUPABASE_ANON_KEY"] = FAKE_KEY
+
+    from utils.supabase_client import supabase
+    from utils.db import run_query, DB_MAX_CONCURRENCY
+
+    supabase.from_("job_category").insert({"category": "Household & Care Services"}).execute()
+
+    print(f"latency={args.latency_ms}ms pool={DB_MAX_CONCURRENCY}")
+    asyncio.run(measure("blocking", lambda: blocking_request(supabase), args.requests))
+    asyncio.run(measure("run_query", lambda: pooled_request(supabase, run_query), args.requests))
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,789 @@
+"""
+In-memory stand-in for Supabase's PostgREST endpoint (/rest/v1).
+
+Implements the subset of the PostgREST wire protocol that supabase-py's
+query builders emit: select with embedded resources, the common filter
+operators, or/and groups, order/limit/offset, insert/upsert/update/delete,
+Prefer return/count/resolution headers and single-object responses.
+
+Run it standalone:
+    python -m bench.fake_postgrest --port 54321 --latency-ms 20 --jitter-ms 10 \
+        --table-latency joblist=35,users=5 --error-rate 0.01
+
+Latency is a base delay plus uniform jitter, optionally overridden per table;
+--error-rate makes that fraction of requests fail with a 503.
+
+and point the API at it with SUPABASE_URL=http://127.0.0.1:54321.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import operator
+import random
+import re
+import threading
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request, Response
+
+# table -> primary key, generated defaults and unique columns or column tuples (for on_conflict)
+SCHEMA = {
+    "users": {"pk": "id", "defaults": {"id": "uuid"}, "unique": ["google_id"]},
+    "as_employer": {"pk": "id", "defaults": {"as_emp_id": "uuid", "status": False}, "unique": ["as_emp_id"]},
+    "as_parttimer": {"pk": "id", "defaults": {"as_prtmr_id": "uuid"}, "unique": ["as_prtmr_id"]},
+    "joblist": {"pk": "id", "defaults": {"id": "uuid", "created_at": "now", "status": "active"}, "unique": []},
+    "job_applications": {"pk": "id", "defaults": {"id": "uuid", "created_at": "now"}, "unique": [("jobid", "prtmr_id")]},
+    "joblist_archive": {"pk": "id", "defaults": {}, "unique": []},
+    "job_applications_archive": {"pk": "id", "defaults": {}, "unique": []},
+    "job_category": {"pk": "id", "defaults": {"id": "serial"}, "unique": []},
+    "job_details": {"pk": "id", "defaults": {"id": "serial"}, "unique": []},
+}
+
+# (parent, embedded) -> (parent column, embedded column, returns a list)
+RELATIONS = {
+    ("users", "as_employer"): ("id", "id", False),
+    ("users", "as_parttimer"): ("id", "id", False),
+    ("as_employer", "users"): ("id", "id", False),
+    ("as_parttimer", "users"): ("id", "id", False),
+    ("as_employer", "joblist"): ("as_emp_id", "as_emp_id", True),
+    ("joblist", "as_employer"): ("as_emp_id", "as_emp_id", False),
+    ("joblist", "job_applications"): ("id", "jobid", True),
+    ("job_applications", "joblist"): ("jobid", "id", False),
+    ("job_applications", "as_parttimer"): ("prtmr_id", "as_prtmr_id", False),
+    ("as_parttimer", "job_applications"): ("as_prtmr_id", "prtmr_id", True),
+    ("employer_job_inbox", "job_applications"): ("id", "jobid", True),
+}
+
+
+def employer_job_inbox(store):
+    """Mirror of the employer_job_inbox view in sql/005_employer_job_inbox.sql."""
+    stats = {}
+    for a in store.rows("job_applications"):
+        s = stats.setdefault(a.get("jobid"), {"applicant_count": 0, "best_bid": None, "last_applied_at": None})
+        s["applicant_count"] += 1
+        ask = a.get("bid_amount") if a.get("bid_amount") is not None else a.get("amount")
+        if ask is not None and (s["best_bid"] is None or ask < s["best_bid"]):
+            s["best_bid"] = ask
+        if s["last_applied_at"] is None or (a.get("created_at") or "") > s["last_applied_at"]:
+            s["last_applied_at"] = a.get("created_at")
+    empty = {"applicant_count": 0, "best_bid": None, "last_applied_at": None}
+    return [{**j, **stats.get(j.get("id"), empty)} for j in store.rows("joblist")]
+
+
+def percentile_cont(ordered, fraction):
+    """Postgres percentile_cont over an already sorted list: linear interpolation between neighbours."""
+    if not ordered:
+        return None
+    position = fraction * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return float(ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower))
+
+
+def _average(values, digits=2):
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), digits) if values else None
+
+
+def _rollup(rows, extra=()):
+    """GROUPING SETS ((category, location, *extra), (category, *extra)): the location rollup is "*"."""
+    groups = {}
+    for row in rows:
+        tail = tuple(row[k] for k in extra)
+        groups.setdefault((row["category"], row["location"] or "") + tail, []).append(row)
+        groups.setdefault((row["category"], "*") + tail, []).append(row)
+    return [(dict(zip(("category", "location") + tuple(extra), k)), group) for k, group in groups.items()]
+
+
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _hours(text):
+    """Like try_time() in sql/007: raises ValueError for what Postgres would not read as a time."""
+    hours, minutes = str(text).split(":")[:2]
+    hours, minutes = int(hours), int(minutes[:2])
+    if not (0 <= hours < 24 and 0 <= minutes < 60) and (hours, minutes) != (24, 0):
+        raise ValueError(f"not a time: {text!r}")
+    return hours + minutes / 60
+
+
+def _date(text):
+    """Like try_date() in sql/007: the date, or None."""
+    if not isinstance(text, str) or not _ISO_DATE_RE.match(text):
+        return None
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def job_salary_stats(store):
+    """Mirror of the job_salary_stats materialized view in sql/007_job_analytics.sql."""
+    jobs = [{**j, "salary_condition": j.get("salary_condition") or "unspecified"}
+            for j in store.rows("joblist") if j.get("salary") is not None]
+    out = []
+    for key, group in _rollup(jobs, ("salary_condition",)):
+        salaries = sorted(j["salary"] for j in group)
+        out.append({
+            **key,
+            "job_count": len(group),
+            "active_count": sum(1 for j in group if j.get("status") == "active"),
+            "min_salary": salaries[0],
+            "max_salary": salaries[-1],
+            "avg_salary": _average(salaries),
+            **{f"p{int(q * 100)}": percentile_cont(salaries, q) for q in (0.1, 0.25, 0.5, 0.75, 0.9)},
+        })
+    return out
+
+
+SHIFT_BUCKETS = (("shifts_under_4h", 0, 4), ("shifts_4_6h", 4, 6), ("shifts_6_8h", 6, 8),
+                 ("shifts_8_10h", 8, 10), ("shifts_10_12h", 10, 12), ("shifts_12h_plus", 12, float("inf")))
+
+
+def job_shift_stats(store):
+    """Mirror of the job_shift_stats materialized view in sql/007_job_analytics.sql."""
+    shifts = []
+    for j in store.rows("joblist"):
+        try:
+            start, end = _hours(j["start_of_shift"]), _hours(j["end_of_shift"])
+        except (KeyError, ValueError):
+            continue
+        upto, since = _date(j.get("duration_upto")), _date(j.get("duration_from"))
+        days = (upto - since).days + 1 if upto and since else None
+        brk = j.get("break") or 0
+        shifts.append({"category": j.get("category"), "location": j.get("location"), "break": brk,
+                       "hours": end - start + (24 if end <= start else 0) - brk, "days": days})
+    out = []
+    for key, group in _rollup(shifts):
+        hours = sorted(s["hours"] for s in group)
+        days = sorted(s["days"] for s in group if s["days"] is not None)
+        out.append({
+            **key,
+            "job_count": len(group),
+            "avg_shift_hours": _average(hours),
+            "p25_shift_hours": percentile_cont(hours, 0.25),
+            "p50_shift_hours": percentile_cont(hours, 0.5),
+            "p75_shift_hours": percentile_cont(hours, 0.75),
+            **{name: sum(1 for h in hours if low <= h < high) for name, low, high in SHIFT_BUCKETS},
+            "avg_break_hours": _average(s["break"] for s in group),
+            "avg_duration_days": _average(days),
+            "p50_duration_days": percentile_cont(days, 0.5),
+        })
+    return out
+
+
+def job_bid_stats(store):
+    """Mirror of the job_bid_stats materialized view in sql/007_job_analytics.sql."""
+    jobs = {j.get("id"): j for j in store.rows("joblist")}
+    applications = []
+    for a in store.rows("job_applications"):
+        job = jobs.get(a.get("jobid"))
+        if job is not None:
+            applications.append({"category": job.get("category"), "location": job.get("location"),
+                                 "amount": a.get("amount"), "bid_amount": a.get("bid_amount"),
+                                 "salary": job.get("salary")})
+    out = []
+    for key, group in _rollup(applications):
+        bids = [a for a in group if a["bid_amount"] is not None]
+        ratios = sorted(a["bid_amount"] / a["amount"] for a in bids if a["amount"])
+        out.append({
+            **key,
+            "application_count": len(group),
+            "bid_count": len(bids),
+            "bid_rate": round(len(bids) / len(group), 4),
+            "avg_amount": _average(a["amount"] for a in group),
+            "avg_bid_amount": _average(a["bid_amount"] for a in bids),
+            "p50_bid_ratio": percentile_cont(ratios, 0.5),
+            "avg_bid_ratio": _average(ratios, 4),
+            "avg_amount_to_salary": _average((a["amount"] / a["salary"] for a in group
+                                              if a["amount"] is not None and a["salary"]), 4),
+        })
+    return out
+
+
+# materialized views: computed on first read, then only again by the refresh_job_analytics rpc
+MATERIALIZED = {
+    "job_salary_stats": job_salary_stats,
+    "job_shift_stats": job_shift_stats,
+    "job_bid_stats": job_bid_stats,
+}
+
+
+def materialized(name):
+    def read(store):
+        if name not in store.materialized:
+            refresh_materialized(store, name)
+        return store.materialized[name]
+    return read
+
+
+def refresh_materialized(store, name):
+    refreshed_at = datetime.now(timezone.utc).isoformat()
+    store.materialized[name] = [{**row, "refreshed_at": refreshed_at} for row in MATERIALIZED[name](store)]
+
+
+# read-only views computed from the base tables on every request
+VIEWS = {
+    "employer_job_inbox": employer_job_inbox,
+    **{name: materialized(name) for name in MATERIALIZED},
+}
+
+COMPARATORS = {
+    "eq": operator.eq, "neq": operator.ne,
+    "gt": operator.gt, "gte": operator.ge,
+    "lt": operator.lt, "lte": operator.le,
+}
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns", "or", "and"}
+
+
+class Store:
+    def __init__(self):
+        self.tables = {name: [] for name in SCHEMA}
+        self.lock = threading.Lock()
+        self._serial = {}
+        self._key_indexes = {}
+        self.materialized = {}
+        self.request_count = 0
+
+    def reset(self):
+        with self.lock:
+            for name in self.tables:
+                self.tables[name] = []
+            self._serial = {}
+            self._key_indexes = {}
+            self.materialized = {}
+            self.request_count = 0
+
+    def rows(self, table):
+        return self.tables.setdefault(table, [])
+
+    def key_index(self, table, keys):
+        """
+        {key values: row} for a unique key, kept across requests so conflict checks
+        don't rescan the table. Rebuilt when rows were added or removed behind its
+        back (seeding appends to the lists directly); updates call forget().
+        """
+        rows = self.rows(table)
+        cached = self._key_indexes.get((table, keys))
+        if cached is None or cached[0] is not rows or cached[1] != len(rows):
+            cached = [rows, len(rows), {tuple(r.get(k) for k in keys): r for r in rows}]
+            self._key_indexes[(table, keys)] = cached
+        return cached
+
+    def forget(self, table):
+        for key in [key for key in self._key_indexes if key[0] == table]:
+            del self._key_indexes[key]
+
+    def apply_defaults(self, table, row):
+        spec = SCHEMA.get(table, {"defaults": {}})
+        for col, kind in spec["defaults"].items():
+            if row.get(col) is not None:
+                continue
+            if kind == "uuid":
+                row[col] = str(uuid.uuid4())
+            elif kind == "now":
+                row[col] = datetime.now(timezone.utc).isoformat()
+            elif kind == "serial":
+                self._serial[table] = self._serial.get(table, 0) + 1
+                row[col] = self._serial[table]
+            else:
+                row[col] = kind
+        return row
+
+
+store = Store()
+app = FastAPI()
+app.state.latency = 0.0
+app.state.jitter = 0.0
+app.state.table_latency = {}
+app.state.error_rate = 0.0
+
+
+def configure(latency_ms=0.0, jitter_ms=0.0, table_latency_ms=None, error_rate=0.0):
+    """Set the simulated network/database behaviour; safe to call while serving."""
+    app.state.latency = latency_ms / 1000
+    app.state.jitter = jitter_ms / 1000
+    app.state.table_latency = {table: ms / 1000 for table, ms in (table_latency_ms or {}).items()}
+    app.state.error_rate = error_rate
+
+
+def parse_table_latency(text):
+    """"joblist=35,users=5" -> {"joblist": 35.0, "users": 5.0}"""
+    pairs = (item.split("=", 1) for item in text.split(",") if item.strip())
+    return {table.strip(): float(ms) for table, ms in pairs}
+
+
+class PostgrestError(Exception):
+    def __init__(self, status, code, message, details=None):
+        self.status = status
+        self.body = {"code": code, "message": message, "details": details, "hint": None}
+
+
+# ---------------------------------------------------------------- parsing
+
+def _split_top(text, sep=","):
+    """Split on sep, ignoring separators nested in parentheses or quotes."""
+    parts, depth, quoted, cur = [], 0, False, ""
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append(cur)
+            cur = ""
+        else:
+            cur += ch
+    if cur:
+        parts.append(cur)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def parse_select(text):
+    """Return (columns, embeds) where embeds maps name -> nested select."""
+    columns, embeds = [], {}
+    for part in _split_top(text or "*"):
+        if "(" in part and part.endswith(")"):
+            head, inner = part.split("(", 1)
+            alias, _, name = head.partition(":")
+            name = (name or alias).split("!")[0]
+            embeds[alias if _ else name] = (name, parse_select(inner[:-1]))
+        else:
+            columns.append(part.split(":")[-1].split("::")[0])
+    return columns, embeds
+
+
+def _coerce(stored, raw):
+    if raw == "null":
+        return None
+    if isinstance(stored, bool):
+        return raw.lower() == "true"
+    if isinstance(stored, (int, float)):
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return raw.strip('"')
+
+
+def _compare(value, op, raw):
+    if op == "is":
+        if raw == "null":
+            return value is None
+        return value is (raw.lower() == "true")
+    if op == "in":
+        options = [o.strip().strip('"') for o in _split_top(raw.strip("()"))]
+        return value is not None and any(value == _coerce(value, o) for o in options)
+    if op in ("like", "ilike"):
+        if value is None:
+            return False
+        pattern = raw.replace("*", "%")
+        haystack, needle = (str(value), pattern) if op == "like" else (str(value).lower(), pattern.lower())
+        pieces = needle.split("%")
+        pos = 0
+        for i, piece in enumerate(pieces):
+            idx = haystack.find(piece, pos)
+            if idx < 0 or (i == 0 and not needle.startswith("%") and idx != 0):
+                return False
+            pos = idx + len(piece)
+        return needle.endswith("%") or pos == len(haystack)
+    if value is None:
+        return False
+    other = _coerce(value, raw)
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and isinstance(other, float):
+        value = float(value)
+    if op not in COMPARATORS:
+        raise PostgrestError(400, "PGRST100", f"unsupported operator {op}")
+    try:
+        return COMPARATORS[op](value, other)
+    except TypeError:
+        return False
+
+
+def make_filter(column, expr):
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, raw = expr.partition(".")
+    if op == "in":
+        # parsed once per request, not per row: id lists are long and tables are scanned
+        options = [o.strip().strip('"') for o in _split_top(raw.strip("()"))]
+        strings = set(options)
+
+        def matches(value):
+            if isinstance(value, str):
+                return value in strings
+            return value is not None and any(value == _coerce(value, o) for o in options)
+    else:
+        def matches(value):
+            return _compare(value, op, raw)
+
+    def check(row):
+        result = matches(row.get(column))
+        return not result if negate else result
+    return check
+
+
+def make_logic(kind, body):
+    """Build a predicate from an or=(...) / and=(...) expression."""
+    checks = []
+    for part in _split_top(body.strip()[1:-1]):
+        if part.startswith(("or(", "and(")):
+            sub, _, rest = part.partition("(")
+            checks.append(make_logic(sub, "(" + rest))
+        else:
+            column, _, expr = part.partition(".")
+            checks.append(make_filter(column, expr))
+    combine = any if kind == "or" else all
+    return lambda row: combine(c(row) for c in checks)
+
+
+def parse_filters(params, prefix=""):
+    checks = []
+    for key, value in params:
+        if prefix:
+            if not key.startswith(prefix):
+                continue
+            key = key[len(prefix):]
+        if "." in key:
+            continue
+        if key in ("or", "and"):
+            checks.append(make_logic(key, value))
+        elif key not in RESERVED_PARAMS:
+            checks.append(make_filter(key, value))
+    return checks
+
+
+def parse_order(values):
+    terms = []
+    for value in values:
+        for term in _split_top(value):
+            bits = term.split(".")
+            terms.append((bits[0], "desc" in bits[1:], "nullsfirst" in bits[1:]))
+    return terms
+
+
+def sort_rows(rows, terms):
+    for column, desc, nullsfirst in reversed(terms):
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r[column], reverse=desc)
+        rows = missing + present if nullsfirst else present + missing
+    return rows
+
+
+# ---------------------------------------------------------------- rendering
+
+def project(table, row, select, params, path=""):
+    columns, embeds = select
+    out = dict(row) if "*" in columns else {c: row.get(c) for c in columns}
+    for alias, (name, sub_select) in embeds.items():
+        relation = RELATIONS.get((table, name))
+        if relation is None:
+            raise PostgrestError(400, "PGRST200", f"Could not find a relationship between '{table}' and '{name}'")
+        parent_col, child_col, many = relation
+        key = row.get(parent_col)
+        prefix = f"{path}{alias}."
+        checks = parse_filters(params, prefix)
+        children = [r for r in store.rows(name) if r.get(child_col) == key and all(c(r) for c in checks)]
+        if many:
+            children = sort_rows(children, parse_order(v for k, v in params if k == prefix + "order"))
+            offset = int(dict(params).get(prefix + "offset", 0))
+            limit = dict(params).get(prefix + "limit")
+            children = children[offset:offset + int(limit)] if limit else children[offset:]
+            out[alias] = [project(name, c, sub_select, params, prefix) for c in children]
+        else:
+            out[alias] = project(name, children[0], sub_select, params, prefix) if children else None
+    return out
+
+
+def select_rows(table, params):
+    checks = parse_filters(params)
+    source = VIEWS[table](store) if table in VIEWS else store.rows(table)
+    rows = [r for r in source if all(c(r) for c in checks)]
+    return sort_rows(rows, parse_order(v for k, v in params if k == "order"))
+
+
+def respond(request, table, rows, params, status=200, total=None):
+    prefer = request.headers.get("prefer", "")
+    wants_object = "vnd.pgrst.object" in request.headers.get("accept", "")
+    select = parse_select(dict(params).get("select", "*"))
+    headers = {}
+    if total is not None and "count=" in prefer:
+        end = max(len(rows) - 1, 0)
+        headers["content-range"] = f"0-{end}/{total}"
+    if request.method != "GET" and "return=representation" not in prefer:
+        return Response(status_code=201 if request.method == "POST" else 204, headers=headers)
+    body = [project(table, r, select, params) for r in rows]
+    if wants_object:
+        if len(body) != 1:
+            raise PostgrestError(406, "PGRST116", "JSON object requested, multiple (or no) rows returned",
+                                 f"Results contain {len(body)} rows, application/vnd.pgrst.object+json requires 1 row")
+        body = body[0]
+    return Response(json.dumps(body, default=str), status_code=status,
+                    media_type="application/json", headers=headers)
+
+
+# ---------------------------------------------------------------- routes
+
+@app.exception_handler(PostgrestError)
+async def postgrest_error(request, exc):
+    return Response(json.dumps(exc.body), status_code=exc.status, media_type="application/json")
+
+
+@app.middleware("http")
+async def simulate_latency(request, call_next):
+    store.request_count += 1
+    table = request.url.path.rsplit("/", 1)[-1]
+    delay = app.state.table_latency.get(table, app.state.latency)
+    if app.state.jitter:
+        delay += random.uniform(0, app.state.jitter)
+    if delay:
+        await asyncio.sleep(delay)
+    if app.state.error_rate and table != "bench_configure" and random.random() < app.state.error_rate:
+        return Response(json.dumps({"message": "simulated upstream failure"}), status_code=503,
+                        media_type="application/json")
+    return await call_next(request)
+
+
+@app.post("/rest/v1/rpc/bench_configure")
+async def bench_configure(request: Request):
+    """Reconfigure latency/errors of a stand-in running in another process (e.g. after seeding)."""
+    body = await request.json()
+    configure(body.get("latency_ms", 0.0), body.get("jitter_ms", 0.0), body.get("table_latency_ms"),
+              body.get("error_rate", 0.0))
+    return Response(status_code=204)
+
+
+@app.get("/oauth2/v3/certs")
+async def google_certs():
+    """An empty stand-in for Google's JWKS (GOOGLE_JWKS_URL), so startup warmup has something to fetch."""
+    return Response(json.dumps({"keys": []}), media_type="application/json",
+                    headers={"Cache-Control": "public, max-age=3600"})
+
+
+@app.get("/geocode/search")
+async def geocode_search(q: str = ""):
+    """Nominatim-compatible stand-in for GEOCODER_URL: every query lands on a stable point in Metro Manila."""
+    digest = hashlib.sha256(q.encode()).digest()
+    return [{"lat": str(14.4 + digest[0] / 255 * 0.4), "lon": str(120.9 + digest[1] / 255 * 0.2)}]
+
+
+@app.post("/rest/v1/rpc/refresh_job_analytics")
+async def refresh_job_analytics():
+    """Mirror of public.refresh_job_analytics() in sql/007_job_analytics.sql (without its timestamp result)."""
+    with store.lock:
+        for name in MATERIALIZED:
+            refresh_materialized(store, name)
+    return Response(status_code=204)
+
+
+# mirrors of the lifecycle functions in sql/008_job_lifecycle.sql
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+def _upto(job):
+    """duration_upto when it is shaped like YYYY-MM-DD, as 008 requires, else None."""
+    value = job.get("duration_upto")
+    return value if isinstance(value, str) and _ISO_DATE_RE.match(value) else None
+
+
+def _transition(store, status, due, batch_size):
+    moved = []
+    for job in store.rows("joblist"):
+        if len(moved) >= batch_size:
+            break
+        if job.get("status") == "active" and due(job):
+            job["status"] = status
+            moved.append(job)
+    store.forget("joblist")
+    return moved
+
+
+def fill_jobs(store, batch_size=500):
+    accepted = {a["jobid"] for a in store.rows("job_applications") if a.get("status") == "accepted"}
+    return _transition(store, "filled", lambda job: job["id"] in accepted, batch_size)
+
+
+def expire_jobs(store, batch_size=500):
+    today = _today()
+    return _transition(store, "expired", lambda job: _upto(job) is not None and _upto(job) < today.isoformat(),
+                       batch_size)
+
+
+def archive_jobs(store, archive_after_days=90, batch_size=500):
+    cutoff = _today() - timedelta(days=archive_after_days)
+
+    def ended(job):
+        return (_upto(job) or job["created_at"][:10]) < cutoff.isoformat()
+
+    # dated jobs first, oldest first, then undated ones by created_at
+    doomed = sorted((job for job in store.rows("joblist") if job.get("status") != "active" and ended(job)),
+                    key=lambda job: (_upto(job) is None, _upto(job) or job["created_at"]))[:batch_size]
+    ids = {job["id"] for job in doomed}
+    archived_at = datetime.now(timezone.utc).isoformat()
+    applications = store.rows("job_applications")
+    store.rows("job_applications_archive").extend(
+        {**a, "archived_at": archived_at} for a in applications if a.get("jobid") in ids)
+    store.tables["job_applications"] = [a for a in applications if a.get("jobid") not in ids]
+    store.tables["joblist"] = [job for job in store.rows("joblist") if job["id"] not in ids]
+    archived = [{**job, "archived_at": archived_at} for job in doomed]
+    store.rows("joblist_archive").extend(archived)
+    for table in ("joblist", "job_applications"):
+        store.forget(table)
+    return archived
+
+
+LIFECYCLE_FUNCTIONS = {"fill_jobs": fill_jobs, "expire_jobs": expire_jobs, "archive_jobs": archive_jobs}
+
+
+@app.post("/rest/v1/rpc/{function}")
+async def lifecycle_rpc(function: str, request: Request):
+    if function not in LIFECYCLE_FUNCTIONS:
+        raise PostgrestError(404, "PGRST202", f"Could not find the function public.{function}")
+    params = await request.json() if await request.body() else {}
+    with store.lock:
+        rows = LIFECYCLE_FUNCTIONS[function](store, **params)
+        return Response(json.dumps(rows, default=str), media_type="application/json")
+
+
+@app.get("/rest/v1/{table}")
+async def get_rows(table: str, request: Request):
+    params = list(request.query_params.multi_items())
+    with store.lock:
+        rows = select_rows(table, params)
+        total = len(rows)
+        offset = int(dict(params).get("offset", 0))
+        limit = dict(params).get("limit")
+        rows = rows[offset:offset + int(limit)] if limit else rows[offset:]
+        return respond(request, table, rows, params, total=total)
+
+
+@app.post("/rest/v1/{table}")
+async def insert_rows(table: str, request: Request):
+    params = list(request.query_params.multi_items())
+    payload = await request.json()
+    items = payload if isinstance(payload, list) else [payload]
+    prefer = request.headers.get("prefer", "")
+    conflict_cols = [c for c in dict(params).get("on_conflict", "").split(",") if c]
+    spec = SCHEMA.get(table, {"pk": "id", "unique": []})
+    written = []
+    # on_conflict columns (or the primary key) are checked first, then every other unique key
+    key_sets = [tuple(conflict_cols or [spec["pk"]])]
+    key_sets += [k if isinstance(k, tuple) else (k,) for k in spec["unique"] + [spec["pk"]]]
+    with store.lock:
+        rows = store.rows(table)
+        for item in items:
+            existing = None
+            for keys in key_sets:
+                values = tuple(item.get(k) for k in keys)
+                if None not in values:
+                    existing = store.key_index(table, keys)[2].get(values)
+                    if existing is not None:
+                        break
+            if existing is not None:
+                if "resolution=merge-duplicates" in prefer:
+                    existing.update(item)
+                    store.forget(table)
+                    written.append(existing)
+                elif "resolution=ignore-duplicates" in prefer:
+                    continue
+                else:
+                    raise PostgrestError(409, "23505", "duplicate key value violates unique constraint")
+            else:
+                row = store.apply_defaults(table, dict(item))
+                rows.append(row)
+                written.append(row)
+                for (indexed, keys), cached in store._key_indexes.items():
+                    if indexed == table:
+                        cached[1] += 1
+                        cached[2].setdefault(tuple(row.get(k) for k in keys), row)
+        return respond(request, table, written, params, status=201)
+
+
+@app.patch("/rest/v1/{table}")
+async def update_rows(table: str, request: Request):
+    params = list(request.query_params.multi_items())
+    changes = await request.json()
+    with store.lock:
+        rows = select_rows(table, params)
+        for row in rows:
+            row.update(changes)
+        store.forget(table)
+        return respond(request, table, rows, params)
+
+
+@app.delete("/rest/v1/{table}")
+async def delete_rows(table: str, request: Request):
+    params = list(request.query_params.multi_items())
+    with store.lock:
+        doomed = select_rows(table, params)
+        ids = {id(r) for r in doomed}
+        store.tables[table] = [r for r in store.rows(table) if id(r) not in ids]
+        return respond(request, table, doomed, params)
+
+
+def serve_in_thread(port=54321, latency_ms=0.0, **options):
+    """Start the fake on a background thread and return the uvicorn server. options go to configure()."""
+    import time
+    import uvicorn
+
+    configure(latency_ms, **options)
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def _serve_forever(port, latency_ms, options):
+    import uvicorn
+
+    configure(latency_ms, **options)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def serve_in_process(port=54321, latency_ms=0.0, **options):
+    """
+    Start the fake in a child process so its CPU time doesn't compete with the
+    app under test for the GIL. Seed it over HTTP. Returns the Process.
+    """
+    import multiprocessing
+    import time
+    import httpx
+
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve_forever, args=(port, latency_ms, options), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/rest/v1/job_category?limit=0", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("fake PostgREST did not start")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--table-latency", default="", help="per-table overrides, e.g. joblist=35,users=5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    configure(args.latency_ms, args.jitter_ms, parse_table_latency(args.table_latency), args.error_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,64 @@
+"""
+Shared setup for the benchmark scripts: start the PostgREST stand-in, point
+the API at it, and talk to the FastAPI app in-process over ASGI.
+"""
+import os
+import uuid
+
+from bench import fake_postgrest
+
+FAKE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench"
+
+
+def import_app(supabase_url, supabase_key=FAKE_KEY):
+    """Point the API at a PostgREST endpoint and import it."""
+    os.environ["SUPABASE_URL"] = supabase_url
+    os.environ["SUPABASE_ANON_KEY"] = supabase_key
+    os.environ.setdefault("GOOGLE_CLIENT_ID", "bench-client-id")
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    # every simulated user shares one client address; bench.overload turns limits back on
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+    from main import app
+    return app
+
+
+def start_stack(port=54321, latency_ms=0.0, **options):
+    """Start the fake backend in this process and import the app against it. Returns (app, store, server)."""
+    server = fake_postgrest.serve_in_thread(port, latency_ms, **options)
+    return import_app(f"http://127.0.0.1:{port}"), fake_postgrest.store, server
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def api_client(app):
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+def make_token(user_id):
+    from utils.auth import create_access_token
+    return create_access_token({"id": user_id, "google_id": f"g-{user_id}", "email": f"{user_id}@bench.local"})
+
+
+def seed_employer(store):
+    user_id = str(uuid.uuid4())
+    with store.lock:
+        store.rows("users").append({"id": user_id, "google_id": f"g-{user_id}", "name": "Bench Employer",
+                                    "email": f"{user_id}@bench.local", "picture_url": None})
+        store.rows("as_employer").append({"id": user_id, "as_emp_id": str(uuid.uuid4()), "location": "Makati",
+                                          "status": True})
+    return user_id
+
+
+def seed_parttimer(store):
+    user_id = str(uuid.uuid4())
+    with store.lock:
+        store.rows("users").append({"id": user_id, "google_id": f"g-{user_id}", "name": "Bench Part-Timer",
+                                    "email": f"{user_id}@bench.local", "picture_url": None})
+        store.rows("as_parttimer").append({"id": user_id, "as_prtmr_id": str(uuid.uuid4()), "location": "Makati",
+                                           "available": True})
+    return user_id
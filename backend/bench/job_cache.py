@@ -0,0 +1,164 @@
+"""
+Employer dashboard refreshes (GET /api/employer/job and GET /api/joblist/{id})
+with the job cache off and on, a check that writes are visible on the next
+read, and a second worker process changing a job's status to show which cache
+backends keep workers coherent.
+
+    cd backend && python -m bench.job_cache --latency-ms 20 --refreshes 200
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from loguru import logger
+
+from bench import fake_postgrest
+from bench.harness import import_app, api_client, make_token, percentile
+from bench.seed import generate_dataset, load_dataset, job_form
+
+
+async def refreshes(client, headers, job_ids, count):
+    """One dashboard refresh = the job list plus one job's detail."""
+    rng = random.Random(3)
+    samples, calls = [], 0
+    for _ in range(count):
+        started = time.perf_counter()
+        responses = await asyncio.gather(
+            client.get("/api/employer/job", headers=headers),
+            client.get(f"/api/joblist/{rng.choice(job_ids)}", headers=headers),
+        )
+        samples.append((time.perf_counter() - started) * 1000)
+        for res in responses:
+            res.raise_for_status()
+            calls += backend_calls(res)
+    return samples, calls
+
+
+def backend_calls(res):
+    """Backend calls the request made, from its Server-Timing header (db;dur=..;desc="N calls")."""
+    timing = res.headers.get("server-timing", "")
+    return int(timing.split('desc="')[1].split()[0]) if 'desc="' in timing else 0
+
+
+async def job_status(client, headers, job_id):
+    res = await client.get(f"/api/joblist/{job_id}", headers=headers)
+    return res.json()["job"]["status"]
+
+
+def other_worker(port, cache_url, requests, replies):
+    """A second API process sharing the backend stand-in and JOB_CACHE_URL, changing statuses on request."""
+    os.environ["JOB_CACHE_URL"] = cache_url
+    logger.remove()
+    app = import_app(f"http://127.0.0.1:{port}")
+
+    async def serve():
+        async with api_client(app) as client:
+            while True:
+                message = await asyncio.to_thread(requests.get)
+                if message is None:
+                    return
+                token, job_id, status = message
+                res = await client.post(f"/api/joblist/{job_id}/status", json={"status": status},
+                                        headers={"Authorization": f"Bearer {token}"})
+                replies.put(res.status_code)
+
+    asyncio.run(serve())
+
+
+async def coherence(client, headers, token, job_id, port, cache_url):
+    """Warm this worker's cache, change the status in another worker, read again here."""
+    context = multiprocessing.get_context("spawn")
+    requests, replies = context.Queue(), context.Queue()
+    worker = context.Process(target=other_worker, args=(port, cache_url, requests, replies), daemon=True)
+    worker.start()
+    try:
+        seen = []
+        for status in ("closed", "active"):
+            await job_status(client, headers, job_id)  # cached here now
+            requests.put((token, job_id, status))
+            assert await asyncio.to_thread(replies.get, True, 60) == 200
+            seen.append(await job_status(client, headers, job_id) == status)
+        return all(seen)
+    finally:
+        requests.put(None)
+        worker.join(10)
+
+
+async def run(app, args, employer_id, job_ids, cache_url):
+    from utils.job_cache import job_cache
+
+    token = make_token(employer_id)
+    headers = {"Authorization": f"Bearer {token}"}
+    failures = []
+    async with api_client(app) as client:
+        print(f"{len(job_ids)} jobs on the dashboard, {args.refreshes} refreshes, "
+              f"{args.latency_ms:.0f}ms backend latency")
+        for enabled in (False, True):
+            job_cache.enabled = enabled
+            samples, calls = await refreshes(client, headers, job_ids, args.refreshes)
+            print(f"  cache {'on ' if enabled else 'off'}  p50 {percentile(samples, 50):7.1f}  "
+                  f"p99 {percentile(samples, 99):7.1f} ms  {calls / args.refreshes:5.2f} backend calls/refresh")
+        print(f"  {job_cache.snapshot()}")
+
+        # writes through this worker are visible on the very next read
+        res = await client.post("/api/joblist/listNewJob", json=job_form(random.Random(5)), headers=headers)
+        new_id = res.json()["job"][0]["id"]
+        listed = {job["id"] for job in (await client.get("/api/employer/job", headers=headers)).json()["jobs"]}
+        if new_id not in listed:
+            failures.append("a posted job was missing from the cached list")
+        await job_status(client, headers, new_id)
+        await client.post(f"/api/joblist/{new_id}/status", json={"status": "closed"}, headers=headers)
+        if await job_status(client, headers, new_id) != "closed":
+            failures.append("a status change was not visible in the cached detail")
+        statuses = {job["id"]: job["status"] for job in
+                    (await client.get("/api/employer/job", headers=headers)).json()["jobs"]}
+        if statuses.get(new_id) != "closed":
+            failures.append("a status change was not visible in the cached list")
+        print(f"  same-worker writes visible on next read: {'yes' if len(failures) == 0 else 'NO'}")
+
+        coherent = await coherence(client, headers, token, job_ids[0], args.port, cache_url)
+        label = cache_url.split(":")[0] if cache_url else "in-process"
+        print(f"  {label} backend, status changed by another worker visible here: {'yes' if coherent else 'no'}")
+        if cache_url and not coherent:
+            failures.append(f"the {label} backend let workers disagree")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--refreshes", type=int, default=200)
+    parser.add_argument("--jobs", type=int, default=60, help="jobs on the employer's dashboard")
+    parser.add_argument("--backend", choices=("local", "sqlite"), default="sqlite",
+                        help="job cache backend shared with the second worker")
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    cache_url = ""
+    if args.backend == "sqlite":
+        cache_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'job_cache.sqlite')}"
+    os.environ["JOB_CACHE_URL"] = cache_url
+    logger.remove()
+    process = fake_postgrest.serve_in_process(args.port)
+    app = import_app(f"http://127.0.0.1:{args.port}")
+    try:
+        from utils.supabase_client import supabase
+
+        data, tables = generate_dataset(employers=1, parttimers=0, jobs=args.jobs, applications=0)
+        load_dataset(supabase, tables)
+        supabase.rpc("bench_configure", {"latency_ms": args.latency_ms}).execute()
+        ok = asyncio.run(run(app, args, data.employers[0], data.jobs, cache_url))
+    finally:
+        process.terminate()
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Job lifecycle sweeper: what the feed serves and what it costs before and
+after a sweep, and whether the sweep moved exactly the right jobs.
+
+The seeded jobs are mostly still running; the rest ended recently, ended long
+ago, were closed by their employer long ago, have an end date that is not a
+date at all (kept by the sweep, or archived by created_at once closed), or have
+an accepted application.
+One sweep (utils/job_sweeper.py against the stand-in's mirrors of
+sql/008_job_lifecycle.sql) must fill, expire and archive exactly the jobs an
+independent computation says it should, carry their applications into the
+archive, drop them from the in-memory search and matching indexes, and leave
+nothing for a second pass.
+
+    cd backend && python -m bench.job_sweeper --latency-ms 20 --jobs 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+
+from bench import fake_postgrest
+from bench.harness import import_app, api_client, make_token, percentile
+from bench.seed import generate_dataset, load_dataset
+
+ARCHIVE_AFTER_DAYS = 90
+ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def age_jobs(tables, seed=11):
+    """Move some jobs' end dates into the past, close some and accept an application on others."""
+    rng = random.Random(seed)
+    today = datetime.now(timezone.utc).date()
+    with_applications = {a["jobid"] for a in tables["job_applications"]}
+    accepted = set()
+    for job in tables["joblist"]:
+        roll = rng.random()
+        if roll < 0.10:
+            job["duration_upto"] = (today - timedelta(days=rng.randrange(1, ARCHIVE_AFTER_DAYS))).isoformat()
+        elif roll < 0.35:
+            job["duration_upto"] = (today - timedelta(days=rng.randrange(ARCHIVE_AFTER_DAYS + 1, 400))).isoformat()
+        elif roll < 0.40:
+            job["duration_upto"] = (today - timedelta(days=rng.randrange(ARCHIVE_AFTER_DAYS + 1, 400))).isoformat()
+            job["status"] = "closed"
+        elif roll < 0.42:
+            job["duration_upto"] = "until filled"  # free text from before the API validated dates
+            if roll < 0.41:
+                job["status"] = "closed"
+                job["created_at"] = (today - timedelta(days=ARCHIVE_AFTER_DAYS + 30)).isoformat() + "T00:00:00+00:00"
+        elif roll < 0.50 and job["id"] in with_applications:
+            accepted.add(job["id"])
+        if ISO_DATE_RE.match(job["duration_upto"]):
+            job["duration_from"] = min(job["duration_from"], job["duration_upto"])
+    for application in tables["job_applications"]:
+        if application["jobid"] in accepted:
+            application["status"] = "accepted"
+            accepted.discard(application["jobid"])  # one accepted application per job is enough
+    return today
+
+
+def expected_outcome(tables, today):
+    """{job id: status after a sweep} and the ids that should have been archived."""
+    accepted = {a["jobid"] for a in tables["job_applications"] if a["status"] == "accepted"}
+    cutoff = (today - timedelta(days=ARCHIVE_AFTER_DAYS)).isoformat()
+    statuses, archived = {}, set()
+    for job in tables["joblist"]:
+        upto = job["duration_upto"] if ISO_DATE_RE.match(job["duration_upto"]) else None
+        status = job["status"]
+        if status == "active" and job["id"] in accepted:
+            status = "filled"
+        elif status == "active" and upto is not None and upto < today.isoformat():
+            status = "expired"
+        statuses[job["id"]] = status
+        if status != "active" and (upto or job["created_at"][:10]) < cutoff:
+            archived.add(job["id"])
+    return statuses, archived
+
+
+async def feed_pages(client, headers, requests, today):
+    """p50 of the first feed page, and how many of the jobs on it had already ended."""
+    samples, ended = [], 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        res = await client.get("/api/parttimer/job", params={"limit": 20, "fields": "id,duration_upto"},
+                               headers=headers)
+        samples.append((time.perf_counter() - started) * 1000)
+        res.raise_for_status()
+        ended = sum(1 for job in res.json()["jobs"] if job["duration_upto"] < today.isoformat())
+    return percentile(samples, 50), ended
+
+
+def table_sizes(supabase):
+    sizes = {}
+    for table in ("joblist", "joblist_archive", "job_applications", "job_applications_archive"):
+        sizes[table] = supabase.from_(table).select("id", count="exact").limit(1).execute().count
+    return sizes
+
+
+def statuses_now(supabase):
+    rows, last = [], None
+    while True:
+        query = supabase.from_("joblist").select("id, status").order("id").limit(1000)
+        if last is not None:
+            query = query.gt("id", last)
+        page = query.execute().data
+        rows += page
+        if len(page) < 1000:
+            return {row["id"]: row["status"] for row in rows}
+        last = page[-1]["id"]
+
+
+def stale_in_indexes(ids):
+    from utils.matching import matching
+    from utils.search import search_index
+
+    return sum(1 for job_id in ids if job_id in matching.jobs or job_id in search_index.docs)
+
+
+async def run(app, args, supabase, headers, tables, today):
+    from utils.job_sweeper import JobSweeper
+    from utils.matching import matching
+    from utils.search import search_index
+
+    failures = []
+    statuses, archived = expected_outcome(tables, today)
+    leaving = [job_id for job_id, status in statuses.items() if status != "active"]
+    await asyncio.gather(matching.ensure_loaded(), search_index.ensure_loaded())
+    print(f"{len(statuses)} jobs, {args.latency_ms:.0f}ms backend latency, sweep batches of {args.batch}")
+    print(f"  expected: {sum(s == 'filled' for s in statuses.values())} filled, "
+          f"{sum(s == 'expired' for s in statuses.values())} expired, {len(archived)} archived")
+
+    async with api_client(app) as client:
+        before_p50, before_ended = await feed_pages(client, headers, args.requests, today)
+        before_sizes = await asyncio.to_thread(table_sizes, supabase)
+        before_stale = stale_in_indexes(leaving)
+
+        sweeper = JobSweeper(batch=args.batch, max_batches=1000, archive_after_days=ARCHIVE_AFTER_DAYS)
+        started = time.perf_counter()
+        counts = await sweeper.sweep()
+        sweep_ms = (time.perf_counter() - started) * 1000
+        again = await sweeper.sweep()
+
+        after_p50, after_ended = await feed_pages(client, headers, args.requests, today)
+        after_sizes = await asyncio.to_thread(table_sizes, supabase)
+        after_stale = stale_in_indexes(leaving)
+
+    print(f"  sweep: {counts} in {sweep_ms:.0f}ms; second pass {again}")
+    print(f"  {'':<28} {'before':>10} {'after':>10}")
+    print(f"  {'feed first page p50':<28} {before_p50:8.1f}ms {after_p50:8.1f}ms")
+    print(f"  {'ended jobs on that page':<28} {before_ended:>10} {after_ended:>10}")
+    print(f"  {'ended jobs in search/match':<28} {before_stale:>10} {after_stale:>10}")
+    for table in before_sizes:
+        print(f"  {table + ' rows':<28} {before_sizes[table]:>10} {after_sizes[table]:>10}")
+
+    live = await asyncio.to_thread(statuses_now, supabase)
+    wrong = sum(1 for job_id, status in statuses.items() if job_id not in archived and live.get(job_id) != status)
+    if set(live) != set(statuses) - archived or wrong:
+        failures.append(f"{wrong} jobs have the wrong status; {len(set(live) ^ (set(statuses) - archived))} "
+                        f"are in the wrong table")
+    moved_applications = sum(1 for a in tables["job_applications"] if a["jobid"] in archived)
+    if after_sizes["job_applications_archive"] != moved_applications:
+        failures.append(f"{after_sizes['job_applications_archive']} applications archived, "
+                        f"expected {moved_applications}")
+    if counts["archived"] != len(archived) or any(again.values()):
+        failures.append("the sweep did not finish in one pass")
+    if after_ended or after_stale:
+        failures.append("ended jobs are still served after the sweep")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--applications", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=30, help="feed requests before and after")
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    os.environ.setdefault("JOB_SWEEP_ENABLED", "0")  # the bench sweeps by hand
+    logger.remove()
+    process = fake_postgrest.serve_in_process(args.port)
+    app = import_app(f"http://127.0.0.1:{args.port}")
+    try:
+        from utils.supabase_client import supabase
+
+        data, tables = generate_dataset(employers=50, parttimers=500, jobs=args.jobs,
+                                        applications=args.applications)
+        today = age_jobs(tables)
+        load_dataset(supabase, tables)
+        supabase.rpc("bench_configure", {"latency_ms": args.latency_ms}).execute()
+        headers = {"Authorization": f"Bearer {make_token(data.parttimers[0])}"}
+        failures = asyncio.run(run(app, args, supabase, headers, tables, today))
+    finally:
+        process.terminate()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Scenario load test against the API, in-process, backed by the PostgREST stand-in.
+
+    cd backend && python -m bench.loadtest --users 50 --duration 30 --latency-ms 15 --jitter-ms 10
+    python -m bench.loadtest --mix feed=1 --save feed.json
+    python -m bench.loadtest --compare feed.json --tolerance 0.2   # exits 1 on a p95 regression
+    python -m bench.loadtest --backend-url http://127.0.0.1:54321 --backend-key ...   # a local Supabase stack
+
+The PostgREST stand-in runs in a child process and is seeded over HTTP.
+Virtual users loop over scenarios picked by weight (--mix). Every request is
+timed under its route template, and the report gives throughput, errors,
+p50/p95/p99 per endpoint, plus the mean Supabase calls and time spent in
+them per request (from the Server-Timing header). The stand-in is a single
+Python process and tops out at roughly a hundred queries per second on a
+laptop; when the db column dominates, scale with --backend-url instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+
+from bench import fake_postgrest
+from bench.harness import FAKE_KEY, import_app, api_client, make_token, percentile
+from bench.seed import generate_dataset, load_dataset, job_form, TAXONOMY
+
+DEFAULT_MIX = "login=1,employer_dashboard=2,parttimer_dashboard=2,feed=5,search=2,post=1,apply=2"
+SEARCH_TERMS = ["baby", "barista", "cook", "driver weekend", "event", "cashier", "data entry", "night shift"]
+_TIMING_RE = re.compile(r'db;dur=([\d.]+);desc="(\d+) calls"')
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}  # endpoint -> [ms]
+        self.errors = {}
+        self.calls = {}  # endpoint -> Supabase calls, summed
+        self.db_ms = {}  # endpoint -> time inside Supabase calls, summed
+
+    def add(self, endpoint, ms, ok, calls=0, db_ms=0.0):
+        self.samples.setdefault(endpoint, []).append(ms)
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + calls
+        self.db_ms[endpoint] = self.db_ms.get(endpoint, 0.0) + db_ms
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed):
+        rows = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            rows[endpoint] = {
+                "count": len(samples),
+                "errors": self.errors.get(endpoint, 0),
+                "rps": round(len(samples) / elapsed, 2),
+                "p50": round(percentile(samples, 50), 2),
+                "p95": round(percentile(samples, 95), 2),
+                "p99": round(percentile(samples, 99), 2),
+                "max": round(max(samples), 2),
+                "calls": round(self.calls.get(endpoint, 0) / len(samples), 2),
+                "db_ms": round(self.db_ms.get(endpoint, 0.0) / len(samples), 2),
+            }
+        return rows
+
+
+class Context:
+    def __init__(self, client, recorder, rng, data, signer):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.data = data
+        self.signer = signer
+
+    async def call(self, method, endpoint, url=None, **kwargs):
+        """Issue a request and record it under endpoint (the route template)."""
+        started = time.perf_counter()
+        ok, calls, db_ms = False, 0, 0.0
+        try:
+            res = await self.client.request(method, url or endpoint.split(" ", 1)[1], **kwargs)
+            ok = res.status_code < 400
+            match = _TIMING_RE.search(res.headers.get("server-timing", ""))
+            if match:
+                db_ms, calls = float(match.group(1)), int(match.group(2))
+            return res
+        finally:
+            self.recorder.add(endpoint, (time.perf_counter() - started) * 1000, ok, calls, db_ms)
+
+    def headers(self, user_id):
+        # clients keep their token between requests, as the SPA does
+        token = _tokens.get(user_id)
+        if token is None:
+            token = _tokens[user_id] = make_token(user_id)
+        return {"Authorization": f"Bearer {token}"}
+
+
+_tokens = {}
+
+
+class GoogleSigner:
+    """Signs Google-style ID tokens with a local RSA key and installs it as the trusted JWKS."""
+
+    def __init__(self, client_id):
+        import jwt
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from jwt.algorithms import RSAAlgorithm
+        from utils.google_tokens import google_keys
+
+        self._jwt = jwt
+        self.client_id = client_id
+        self.kid = "bench-key"
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(RSAAlgorithm.to_jwk(self.private_key.public_key()))
+        google_keys.set_keys({"keys": [{**jwk, "kid": self.kid, "alg": "RS256", "use": "sig"}]}, ttl=86400)
+
+    def id_token(self, google_id, email):
+        now = int(time.time())
+        claims = {"iss": "https://accounts.google.com", "aud": self.client_id, "sub": google_id, "email": email,
+                  "email_verified": True, "name": "Bench User", "iat": now, "exp": now + 3600}
+        return self._jwt.encode(claims, self.private_key, algorithm="RS256", headers={"kid": self.kid})
+
+
+# ---------------------------------------------------------------- scenarios
+
+async def login(ctx):
+    user_id = ctx.rng.choice(ctx.data.parttimers + ctx.data.employers)
+    token = ctx.signer.id_token(f"g-{user_id}", f"{user_id}@bench.local")
+    await ctx.call("POST", "POST /api/auth/google", json={"token": token})
+
+
+async def employer_dashboard(ctx):
+    # the dashboard fires its panels concurrently
+    headers = ctx.headers(ctx.rng.choice(ctx.data.employers))
+    await asyncio.gather(
+        ctx.call("GET", "GET /api/employer/profile", headers=headers),
+        ctx.call("GET", "GET /api/employer/job", headers=headers),
+        ctx.call("GET", "GET /api/employer/applications", headers=headers),
+        ctx.call("GET", "GET /api/joblist/get_categories_with_short_descs"),
+    )
+
+
+async def parttimer_dashboard(ctx):
+    headers = ctx.headers(ctx.rng.choice(ctx.data.parttimers))
+    await asyncio.gather(
+        ctx.call("GET", "GET /api/parttimer/profile", headers=headers),
+        ctx.call("GET", "GET /api/parttimer/job/recommended", headers=headers),
+        ctx.call("GET", "GET /api/joblist/get_job_category"),
+    )
+
+
+async def feed(ctx):
+    headers = ctx.headers(ctx.rng.choice(ctx.data.parttimers))
+    params = {"limit": 20}
+    if ctx.rng.random() < 0.3:
+        params["category"] = ctx.rng.choice(list(TAXONOMY))
+    res = await ctx.call("GET", "GET /api/parttimer/job", params=params, headers=headers)
+    cursor = res.json().get("next_cursor") if res.status_code == 200 else None
+    if cursor:
+        await ctx.call("GET", "GET /api/parttimer/job?cursor", "/api/parttimer/job",
+                       params={**params, "cursor": cursor}, headers=headers)
+
+
+async def search(ctx):
+    headers = ctx.headers(ctx.rng.choice(ctx.data.parttimers))
+    term = ctx.rng.choice(SEARCH_TERMS)
+    await ctx.call("GET", "GET /api/joblist/search/suggest", params={"q": term[:3]}, headers=headers)
+    await ctx.call("GET", "GET /api/joblist/search", params={"q": term}, headers=headers)
+
+
+async def post(ctx):
+    headers = ctx.headers(ctx.rng.choice(ctx.data.employers))
+    res = await ctx.call("POST", "POST /api/joblist/listNewJob", json=job_form(ctx.rng), headers=headers)
+    if res.status_code == 200:
+        ctx.data.jobs.extend(job["id"] for job in res.json().get("job", []))
+
+
+async def apply(ctx):
+    headers = ctx.headers(ctx.rng.choice(ctx.data.parttimers))
+    job_id = ctx.rng.choice(ctx.data.jobs)
+    amount = ctx.rng.randrange(450, 2000, 10)
+    await ctx.call("POST", "POST /api/parttimer/apply_job/{jobid}", f"/api/parttimer/apply_job/{job_id}",
+                   json={"amount": amount}, headers=headers)
+
+
+SCENARIOS = {
+    "login": login,
+    "employer_dashboard": employer_dashboard,
+    "parttimer_dashboard": parttimer_dashboard,
+    "feed": feed,
+    "search": search,
+    "post": post,
+    "apply": apply,
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name.strip()!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def virtual_user(ctx, mix, deadline):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = ctx.rng.choices(names, weights)[0]
+        try:
+            await SCENARIOS[name](ctx)
+        except Exception as e:
+            ctx.recorder.add(f"{name} (exception)", 0.0, False)
+            print(f"{name}: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+async def run(app, data, args, mix):
+    signer = GoogleSigner(os.environ["GOOGLE_CLIENT_ID"])
+    recorder = Recorder()
+    async with api_client(app) as client:
+        # warm-up: loads taxonomy, search/matching indexes and caches outside the measured window
+        warm = Context(client, Recorder(), random.Random(0), data, signer)
+        for scenario in SCENARIOS.values():
+            await scenario(warm)
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            virtual_user(Context(client, recorder, random.Random(args.seed + i), data, signer), mix, deadline)
+            for i in range(args.users)
+        ))
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed
+
+
+def report(recorder, elapsed, args):
+    rows = recorder.summary(elapsed)
+    total = sum(r["count"] for r in rows.values())
+    backend = args.backend_url or f"stand-in, {args.latency_ms}ms +{args.jitter_ms}ms jitter"
+    print(f"\n{args.users} users, {elapsed:.1f}s, backend {backend}: {total} requests, {total / elapsed:.1f} req/s")
+    print(f"{'endpoint (ms)':<48} {'count':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'max':>8} {'calls':>6} {'db':>8}")
+    for endpoint, r in rows.items():
+        print(f"{endpoint:<48} {r['count']:>7} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} {r['max']:>8.1f} {r['calls']:>6.1f} {r['db_ms']:>8.1f}")
+    return rows
+
+
+def compare(rows, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["endpoints"]
+    regressions = []
+    for endpoint, base in baseline.items():
+        current = rows.get(endpoint)
+        if current and current["p95"] > base["p95"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {base['p95']}ms -> {current['p95']}ms")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, e.g. feed=5,apply=1")
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--employers", type=int, default=50)
+    parser.add_argument("--parttimers", type=int, default=500)
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--applications", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--backend-url", help="use this PostgREST/Supabase instead of starting the stand-in")
+    parser.add_argument("--backend-key", default=FAKE_KEY)
+    parser.add_argument("--save", help="write the results as JSON, e.g. to use as a baseline")
+    parser.add_argument("--compare", help="baseline JSON from --save; exit 1 if any endpoint's p95 regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 increase over the baseline")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    process = None
+    if not args.backend_url:
+        # seed at full speed, then switch on the simulated latency
+        process = fake_postgrest.serve_in_process(args.port)
+    app = import_app(args.backend_url or f"http://127.0.0.1:{args.port}", args.backend_key)
+    try:
+        from utils.supabase_client import supabase
+
+        data, tables = generate_dataset(args.employers, args.parttimers, args.jobs, args.applications, args.seed)
+        load_dataset(supabase, tables)
+        print(f"seeded {len(data.employers)} employers, {len(data.parttimers)} part-timers, "
+              f"{len(data.jobs)} jobs, {data.applications} applications")
+        if process is not None:
+            supabase.rpc("bench_configure", {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                                             "error_rate": args.error_rate}).execute()
+        recorder, elapsed = asyncio.run(run(app, data, args, mix))
+    finally:
+        if process is not None:
+            process.terminate()
+    rows = report(recorder, elapsed, args)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"args": vars(args), "elapsed": elapsed, "endpoints": rows}, f, indent=2)
+    if args.compare and not compare(rows, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Synthetic benchmark for utils.matching: build, incremental updates and top-K queries.
+
+    cd backend && python -m bench.matching_engine --jobs 100000 --parttimers 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+from bench.harness import FAKE_KEY, percentile
+
+CATEGORIES = [f"category-{i}" for i in range(20)]
+LOCATIONS = [f"city-{i}" for i in range(50)]
+
+
+def timed(label, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed:8.2f}s  ({count / elapsed:,.0f}/s)")
+
+
+def query_latency(label, fn, runs=2000):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    print(f"{label:<34} p50 {percentile(samples, 50):8.1f}us  p99 {percentile(samples, 99):8.1f}us  "
+          f"mean {statistics.mean(samples):8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--parttimers", type=int, default=1_000_000)
+    parser.add_argument("--applications", type=int, default=200_000)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+    os.environ.setdefault("SUPABASE_ANON_KEY", FAKE_KEY)
+    from utils.matching import MatchingEngine
+
+    rng = random.Random(args.seed)
+    engine = MatchingEngine()
+    engine.loaded = True
+
+    jobs = [{"id": i, "as_emp_id": f"emp-{i % 5000}", "category": rng.choice(CATEGORIES),
+             "location": rng.choice(LOCATIONS), "salary": rng.randint(400, 2000), "status": "active"}
+            for i in range(args.jobs)]
+    timed("add jobs", lambda: [engine.add_job(j) for j in jobs], args.jobs)
+    timed("add part-timers", lambda: [engine.update_parttimer(f"pt-{i}", rng.choice(LOCATIONS))
+                                      for i in range(args.parttimers)], args.parttimers)
+    timed("record applications", lambda: [engine.record_application(f"pt-{rng.randrange(args.parttimers)}",
+                                                                    job_id=rng.randrange(args.jobs))
+                                          for _ in range(args.applications)], args.applications)
+
+    query_latency(f"recommend_jobs k={args.k}", lambda: engine.recommend_jobs(rng.choice(LOCATIONS), args.k))
+    query_latency(f"recommend_jobs k={args.k} filtered",
+                  lambda: engine.recommend_jobs(rng.choice(LOCATIONS), args.k, [rng.choice(CATEGORIES)], 1500))
+    query_latency(f"recommend_parttimers k={args.k}",
+                  lambda: engine.recommend_parttimers(rng.choice(LOCATIONS), rng.choice(CATEGORIES), args.k))
+    query_latency("add_job (incremental)", lambda: engine.add_job(
+        {"id": rng.randrange(args.jobs), "category": rng.choice(CATEGORIES), "location": rng.choice(LOCATIONS),
+         "salary": rng.randint(400, 2000), "status": "active"}))
+    query_latency("update_parttimer (incremental)",
+                  lambda: engine.update_parttimer(f"pt-{rng.randrange(args.parttimers)}", rng.choice(LOCATIONS)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Open-loop overload test for the backend admission limit and the per-user rate
+limit. Requests arrive on a fixed schedule whatever the API's latency, at
+multiples of what the backend can serve (concurrency / latency). The same
+schedule runs twice: with an unbounded queue in front of Supabase, and with
+the bounded queue and timeout that shed the excess as 503s. A last phase adds
+one user hammering the feed next to well-behaved ones.
+
+    cd backend && python -m bench.overload --latency-ms 100 --concurrency 4
+
+Exits 1 if, under the bounded queue, p99 latency of successful requests goes
+over the queue timeout plus --slack-ms, or the noisy user isn't throttled.
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from collections import Counter
+
+from loguru import logger
+
+from bench import fake_postgrest
+from bench.harness import import_app, api_client, make_token, percentile
+from bench.seed import generate_dataset, load_dataset
+
+FEED = "/api/parttimer/job"
+
+
+async def request(client, headers):
+    started = time.perf_counter()
+    res = await client.get(FEED, params={"limit": 20}, headers=headers)
+    return res.status_code, (time.perf_counter() - started) * 1000
+
+
+async def open_loop(client, rate, seconds, pick_headers):
+    """Fire rate requests per second for seconds, then wait for every response."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = []
+    for i in range(int(rate * seconds)):
+        delay = start + i / rate - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        headers = pick_headers(i)
+        tasks.append((headers, asyncio.create_task(request(client, headers))))
+    return [(headers, await task) for headers, task in tasks]
+
+
+def summarize(label, results, seconds):
+    statuses = Counter(status for _, (status, _) in results)
+    ok = [ms for _, (status, ms) in results if status == 200]
+    p50, p99 = (percentile(ok, 50), percentile(ok, 99)) if ok else (0.0, 0.0)
+    shed = " ".join(f"{code}x{n}" for code, n in sorted(statuses.items()) if code != 200)
+    print(f"{label:<34} {len(ok) / seconds:7.1f} ok/s  p50 {p50:8.1f}  p99 {p99:8.1f} ms  {shed}")
+    return p99
+
+
+async def run(app, args):
+    from utils.db import admission
+    from utils.ratelimit import rate_limiter
+
+    capacity = args.concurrency / (args.latency_ms / 1000)
+    tokens = [{"Authorization": f"Bearer {make_token(str(uuid.uuid4()))}"} for _ in range(args.users)]
+    print(f"nominal backend capacity ~{capacity:.0f} calls/s ({args.concurrency} slots x {args.latency_ms:.0f}ms), "
+          f"{args.seconds:.0f}s per step\n")
+    worst = 0.0
+    async with api_client(app) as client:
+        for mode in ("unbounded", "bounded"):
+            if mode == "unbounded":
+                admission.max_queue, admission.timeout = 10 ** 9, 10 ** 9
+            else:
+                admission.max_queue, admission.timeout = args.max_queue, args.queue_timeout
+            print(f"{mode} queue" + ("" if mode == "unbounded" else
+                                     f" (max {args.max_queue} waiting, {args.queue_timeout * 1000:.0f}ms timeout)"))
+            for multiple in args.load:
+                results = await open_loop(client, capacity * multiple, args.seconds,
+                                          lambda i: tokens[i % len(tokens)])
+                p99 = summarize(f"  {multiple:g}x capacity", results, args.seconds)
+                if mode == "bounded":
+                    worst = max(worst, p99)
+            print()
+
+        # one client polling far over its per-user limit next to the others
+        rate_limiter.enabled = True
+        noisy = {"Authorization": f"Bearer {make_token(str(uuid.uuid4()))}"}
+        others, noisy_results = await asyncio.gather(
+            open_loop(client, capacity / 2, args.seconds, lambda i: tokens[i % len(tokens)]),
+            open_loop(client, args.noisy_rate, args.seconds, lambda i: noisy),
+        )
+        print(f"per-user limit, one user at {args.noisy_rate:g} req/s next to {capacity / 2:.0f} req/s from the rest")
+        summarize("  well-behaved users", others, args.seconds)
+        summarize("  noisy user", noisy_results, args.seconds)
+        noisy_statuses = Counter(status for _, (status, _) in noisy_results)
+
+    failures = []
+    budget = args.queue_timeout * 1000 + args.slack_ms
+    if worst > budget:
+        failures.append(f"bounded p99 {worst:.0f}ms is over {budget:.0f}ms")
+    if not noisy_statuses.get(429):
+        failures.append("the noisy user was never rate limited")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="backend stand-in latency per call")
+    parser.add_argument("--concurrency", type=int, default=4, help="DB_MAX_CONCURRENCY for the run")
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--queue-timeout", type=float, default=0.5, help="seconds")
+    parser.add_argument("--load", type=lambda s: [float(x) for x in s.split(",")], default=[0.5, 1, 2, 4],
+                        help="offered load as multiples of capacity")
+    parser.add_argument("--seconds", type=float, default=5.0, help="per load step")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--noisy-rate", type=float, default=100.0, help="req/s from the one noisy user")
+    parser.add_argument("--slack-ms", type=float, default=400.0, help="allowed over the queue timeout at p99")
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    os.environ["DB_MAX_CONCURRENCY"] = str(args.concurrency)
+    # the load all comes from one address: leave IPs alone, limit per user
+    os.environ["RATE_LIMIT_IP_RATE"] = os.environ["RATE_LIMIT_IP_BURST"] = "1000000"
+    process = fake_postgrest.serve_in_process(args.port)
+    logger.remove()  # every shed call logs an error; the summary is what matters here
+    app = import_app(f"http://127.0.0.1:{args.port}")
+    try:
+        from utils.ratelimit import rate_limiter
+        from utils.supabase_client import supabase
+
+        rate_limiter.enabled = False  # switched on for the noisy-user phase
+        _, tables = generate_dataset(employers=20, parttimers=0, jobs=args.jobs, applications=0)
+        load_dataset(supabase, tables)
+        supabase.rpc("bench_configure", {"latency_ms": args.latency_ms}).execute()
+        ok = asyncio.run(run(app, args))
+    finally:
+        process.terminate()
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Bytes on the wire and server time for the list endpoints, by encoding and fieldset,
+plus the stdlib-json vs orjson serialization cost of the same payloads.
+
+    cd backend && python -m bench.response_size --jobs 2000 --parttimers 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from bench.harness import start_stack, api_client, make_token
+from bench.seed import seed_dataset
+
+CASES = [
+    ("GET /api/parttimer/job?limit=100", "/api/parttimer/job", {"limit": 100}, "parttimer"),
+    ("  ?fields=id,short_desc,salary", "/api/parttimer/job", {"limit": 100, "fields": "id,short_desc,salary"}, "parttimer"),
+    ("GET /api/employer/job", "/api/employer/job", {}, "employer"),
+    ("  ?fields=id,short_desc,status", "/api/employer/job", {"fields": "id,short_desc,status"}, "employer"),
+    ("GET /api/employer/available-parttimers", "/api/employer/available-parttimers", {"limit": 100}, "employer"),
+    ("  ?fields=id,name", "/api/employer/available-parttimers", {"limit": 100, "fields": "id,name"}, "employer"),
+    ("  ?stream=true", "/api/employer/available-parttimers", {"stream": "true"}, "employer"),
+    ("GET /api/joblist/get_categories_with_short_descs", "/api/joblist/get_categories_with_short_descs", {}, None),
+]
+ENCODINGS = ("identity", "gzip", "br")
+
+
+async def measure(client, path, params, headers, encoding, runs):
+    elapsed, size, body = 0.0, 0, None
+    for _ in range(runs):
+        started = time.perf_counter()
+        res = await client.get(path, params=params, headers={**headers, "Accept-Encoding": encoding})
+        elapsed += time.perf_counter() - started
+        res.raise_for_status()
+        size = res.num_bytes_downloaded  # bytes as sent, before decoding
+        body = res.content
+        if encoding != "identity" and size >= 1024:
+            assert res.headers.get("content-encoding") == encoding, f"{path}: expected {encoding}"
+    return size, elapsed / runs * 1000, body
+
+
+async def run(app, data, runs):
+    users = {"parttimer": data.parttimers[0], "employer": data.employers[0]}
+    async with api_client(app) as client:
+        print(f"{'endpoint':<50}" + "".join(f"{e:>16}" for e in ENCODINGS))
+        for label, path, params, role in CASES:
+            headers = {"Authorization": f"Bearer {make_token(users[role])}"} if role else {}
+            await client.get(path, params=params, headers=headers)  # warm caches
+            cells, bodies = [], set()
+            for encoding in ENCODINGS:
+                size, ms, body = await measure(client, path, params, headers, encoding, runs)
+                cells.append(f"{size / 1024:7.1f}KB {ms:5.1f}ms")
+                bodies.add(body)
+            assert len(bodies) == 1, f"{label}: decoded bodies differ between encodings"
+            print(f"{label:<50}" + "".join(f"{c:>16}" for c in cells))
+
+
+def serialization(payload, runs=200):
+    import orjson
+
+    for label, dump in (("json.dumps", lambda: json.dumps(payload).encode()), ("orjson.dumps", lambda: orjson.dumps(payload))):
+        started = time.perf_counter()
+        for _ in range(runs):
+            dump()
+        print(f"{label:<14} {(time.perf_counter() - started) / runs * 1000:7.3f}ms per {len(orjson.dumps(payload)) / 1024:.0f}KB body")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--parttimers", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    app, store, server = start_stack(args.port)
+    data = seed_dataset(store, employers=1, parttimers=args.parttimers, jobs=args.jobs, applications=0)
+    try:
+        asyncio.run(run(app, data, args.runs))
+    finally:
+        server.should_exit = True
+    with store.lock:
+        serialization({"jobs": [dict(job) for job in store.rows("joblist")[:500]]})
+
+
+if __name__ == "__main__":
+    main()
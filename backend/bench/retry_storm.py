@@ -0,0 +1,125 @@
+"""
+Mobile-style retry storms against the write endpoints: every submission is
+sent --copies times at once, with and without an Idempotency-Key. Checks that
+no duplicate rows are written and counts the backend calls each storm cost.
+
+    cd backend && python -m bench.retry_storm --copies 8 --latency-ms 20
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter
+
+from bench.harness import start_stack, api_client, make_token, seed_employer, seed_parttimer
+from bench.seed import job_form
+
+
+def report(label, statuses, elapsed, calls, rows):
+    codes = " ".join(f"{code}x{n}" for code, n in sorted(Counter(statuses).items()))
+    print(f"{label:<52} {elapsed * 1000:8.1f} ms  {calls:>4} backend calls  {rows:>3} rows  [{codes}]")
+
+
+async def storm(client, store, copies, send):
+    before, started = store.request_count, time.perf_counter()
+    responses = await asyncio.gather(*(send() for _ in range(copies)))
+    return responses, time.perf_counter() - started, store.request_count - before
+
+
+async def run(app, store, copies):
+    rng = random.Random(1)
+    failures = []
+    async with api_client(app) as client:
+        # part-timer signing up: concurrent check_or_create calls for a brand-new user
+        user_id = str(uuid.uuid4())
+        with store.lock:
+            store.rows("users").append({"id": user_id, "google_id": f"g-{user_id}", "name": "Storm",
+                                        "email": f"{user_id}@bench.local"})
+        headers = {"Authorization": f"Bearer {make_token(user_id)}"}
+        responses, elapsed, calls = await storm(
+            client, store, copies, lambda: client.post("/api/parttimer/check_or_create_parttimer", headers=headers))
+        rows = sum(1 for row in store.rows("as_parttimer") if row["id"] == user_id)
+        report("check_or_create_parttimer", [r.status_code for r in responses], elapsed, calls, rows)
+        if rows != 1 or len({r.json().get("as_prtmr_id") for r in responses}) != 1:
+            failures.append("check_or_create_parttimer created more than one part-timer")
+
+        emp_headers = {"Authorization": f"Bearer {make_token(seed_employer(store))}"}
+        form = job_form(rng)
+        responses, elapsed, calls = await storm(
+            client, store, copies, lambda: client.post("/api/joblist/listNewJob", json=form, headers=emp_headers))
+        job_id = responses[0].json()["job"][0]["id"]
+        report("listNewJob, no key (each copy posts a job)", [r.status_code for r in responses], elapsed, calls,
+               len({r.json()["job"][0]["id"] for r in responses}))
+
+        key = {"Idempotency-Key": str(uuid.uuid4())}
+        form = job_form(rng)
+        responses, elapsed, calls = await storm(
+            client, store, copies,
+            lambda: client.post("/api/joblist/listNewJob", json=form, headers={**emp_headers, **key}))
+        posted = {r.json()["job"][0]["id"] for r in responses}
+        report("listNewJob, Idempotency-Key", [r.status_code for r in responses], elapsed, calls, len(posted))
+        if len(posted) != 1:
+            failures.append("listNewJob with one Idempotency-Key posted more than one job")
+
+        pt_id = seed_parttimer(store)
+        pt_headers = {"Authorization": f"Bearer {make_token(pt_id)}"}
+        body = {"amount": 650, "bid_amount": 600, "bid_reason": "storm"}
+
+        def applications():
+            with store.lock:
+                return sum(1 for row in store.rows("job_applications") if row["jobid"] == job_id)
+
+        responses, elapsed, calls = await storm(
+            client, store, copies, lambda: client.post(f"/api/parttimer/apply_job/{job_id}", json=body, headers=pt_headers))
+        report("apply_job, no key", [r.status_code for r in responses], elapsed, calls, applications())
+        if applications() != 1 or len({r.json()["application"]["id"] for r in responses}) != 1:
+            failures.append("apply_job stored or returned more than one application")
+
+        key = {"Idempotency-Key": str(uuid.uuid4())}
+        responses, elapsed, calls = await storm(
+            client, store, copies,
+            lambda: client.post(f"/api/parttimer/apply_job/{job_id}", json=body, headers={**pt_headers, **key}))
+        replayed = sum(1 for r in responses if r.headers.get("idempotent-replayed"))
+        report(f"apply_job again, Idempotency-Key ({replayed} replayed)", [r.status_code for r in responses],
+               elapsed, calls, applications())
+        if applications() != 1:
+            failures.append("apply_job retry added an application")
+
+        res = await client.post(f"/api/parttimer/apply_job/{job_id}", json={**body, "amount": 700},
+                                headers={**pt_headers, **key})
+        print(f"{'same key, different body':<52} {res.status_code}")
+        if res.status_code != 422:
+            failures.append("a reused Idempotency-Key with a different body was not rejected")
+
+        batch = [{"jobid": job_id, **body}] + [{"jobid": next(iter(posted)), **body}]
+        responses, elapsed, calls = await storm(
+            client, store, copies, lambda: client.post("/api/parttimer/apply_jobs", json=batch, headers=pt_headers))
+        statuses = Counter(item["status"] for r in responses for item in r.json()["results"])
+        report(f"apply_jobs, no key {dict(statuses)}", [r.status_code for r in responses], elapsed, calls,
+               applications())
+        if statuses["applied"] != 1:
+            failures.append("apply_jobs applied to the same job more than once")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    app, store, server = start_stack(args.port, args.latency_ms)
+    try:
+        ok = asyncio.run(run(app, store, args.copies))
+    finally:
+        server.should_exit = True
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
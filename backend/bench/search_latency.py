@@ -0,0 +1,92 @@
+"""
+Latency benchmark for utils.search: index build, full-word and typeahead queries,
+and incremental updates. Exits non-zero when a p99 target is missed.
+
+    cd backend && python -m bench.search_latency --jobs 100000 --p99-ms 25
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from bench.harness import FAKE_KEY, percentile
+
+WORDS = ("babysitter nanny tutor cleaner cook barista waiter driver delivery gardener painter "
+         "mover cashier receptionist warehouse packer caregiver elderly pet walker dog sitter "
+         "event staff promoter usher kitchen helper dishwasher laundry ironing plumber electrician "
+         "handyman assembly furniture photographer translator typist data entry survey weekend "
+         "evening morning night shift urgent flexible experienced student friendly reliable").split()
+
+
+# job text is Zipf-distributed: the words above are the head, followed by a long tail
+VOCABULARY = list(WORDS) + [f"term{i}" for i in range(5000)]
+ZIPF_WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def make_job(rng, job_id):
+    return {
+        "id": job_id,
+        "category": f"category-{rng.randrange(20)}",
+        "short_desc": " ".join(rng.sample(WORDS, 2)),
+        "long_desc": " ".join(rng.choices(VOCABULARY, ZIPF_WEIGHTS, k=rng.randint(15, 40))),
+        "location": f"city-{rng.randrange(50)}",
+        "salary": rng.randint(400, 2000),
+        "status": "active",
+    }
+
+
+def measure(label, fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    p50, p99 = percentile(samples, 50), percentile(samples, 99)
+    print(f"{label:<28} p50 {p50:7.3f}ms  p99 {p99:7.3f}ms")
+    return p99
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--p99-ms", type=float, default=25.0, help="target for search and suggest")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+    os.environ.setdefault("SUPABASE_ANON_KEY", FAKE_KEY)
+    from utils.search import SearchIndex
+
+    rng = random.Random(args.seed)
+    index = SearchIndex()
+    index.loaded = True
+
+    jobs = [make_job(rng, i) for i in range(args.jobs)]
+    start = time.perf_counter()
+    index.add_many(jobs)
+    elapsed = time.perf_counter() - start
+    print(f"indexed {args.jobs} jobs in {elapsed:.2f}s ({args.jobs / elapsed:,.0f}/s)")
+
+    p99s = {
+        "search one word": measure("search one word", lambda: index.search(rng.choice(WORDS), prefix=False), args.runs),
+        "search two words": measure("search two words",
+                                    lambda: index.search(" ".join(rng.sample(WORDS, 2)), prefix=False), args.runs),
+        "search typeahead": measure("search typeahead", lambda: index.search(rng.choice(WORDS)[:2]), args.runs),
+        "search page 5": measure("search page 5",
+                                 lambda: index.search(rng.choice(WORDS), offset=80, prefix=False), args.runs),
+        "suggest": measure("suggest", lambda: index.suggest(rng.choice(WORDS)[:2]), args.runs),
+    }
+    measure("add (incremental)", lambda: index.add(make_job(rng, rng.randrange(args.jobs))), args.runs)
+    measure("status change (remove)", lambda: index.add({"id": rng.randrange(args.jobs), "status": "closed"}), args.runs)
+
+    missed = [label for label, p99 in p99s.items() if p99 > args.p99_ms]
+    if missed:
+        print(f"p99 target {args.p99_ms}ms missed: {', '.join(missed)}")
+        sys.exit(1)
+    print(f"all queries within p99 target {args.p99_ms}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Synthetic data for the benchmarks. Generation is deterministic for a given
+seed, so runs are comparable; the rows are then written straight into an
+in-process fake store or loaded through PostgREST.
+"""
+import random
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+# (location, lat, lng)
+PLACES = [
+    ("Makati", 14.5547, 121.0244), ("Taguig", 14.5176, 121.0509), ("Pasig", 14.5764, 121.0851),
+    ("Quezon City", 14.6760, 121.0437), ("Manila", 14.5995, 120.9842), ("Mandaluyong", 14.5794, 121.0359),
+    ("Pasay", 14.5378, 121.0014), ("Paranaque", 14.4793, 121.0198), ("Cebu City", 10.3157, 123.8854),
+    ("Davao City", 7.1907, 125.4553),
+]
+
+TAXONOMY = {
+    "Household & Care Services": ["Babysitter", "Nanny", "Caregiver", "House Cleaner", "Laundry Helper"],
+    "Food & Beverage": ["Barista", "Waiter", "Kitchen Helper", "Dishwasher", "Cook"],
+    "Retail": ["Cashier", "Sales Promoter", "Stock Clerk", "Merchandiser"],
+    "Events": ["Event Staff", "Usher", "Photographer", "Host"],
+    "Logistics": ["Delivery Rider", "Warehouse Packer", "Mover", "Driver"],
+    "Office Support": ["Data Entry", "Receptionist", "Typist", "Survey Enumerator"],
+}
+
+DETAIL_WORDS = ("weekend evening morning night shift urgent flexible experienced student friendly reliable "
+                "uniform provided meals included near mrt lrt bus stop training paid daily weekly bonus "
+                "tips overtime english tagalog bisaya license motorcycle smartphone required").split()
+
+
+class Dataset:
+    """Ids of everything seeded, for scenarios to pick from."""
+
+    def __init__(self):
+        self.employers = []  # user ids
+        self.parttimers = []  # user ids
+        self.jobs = []  # job ids
+        self.applications = 0
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128)))
+
+
+def _user(rng, role, i):
+    user_id = _uuid(rng)
+    return {"id": user_id, "google_id": f"g-{user_id}", "name": f"Bench {role} {i}",
+            "email": f"{role.lower()}{i}@bench.local", "picture_url": None, "email_verified": True}
+
+
+def _place(rng):
+    location, lat, lng = rng.choice(PLACES)
+    return location, lat + rng.uniform(-0.03, 0.03), lng + rng.uniform(-0.03, 0.03)
+
+
+def make_job(rng, as_emp_id, created_at=None):
+    category = rng.choice(list(TAXONOMY))
+    short_desc = rng.choice(TAXONOMY[category])
+    location, lat, lng = _place(rng)
+    start = date(2026, 11, 1) + timedelta(days=rng.randrange(60))
+    return {
+        "category": category,
+        "location": location,
+        "duration_from": start.isoformat(),
+        "duration_upto": (start + timedelta(days=rng.randrange(1, 30))).isoformat(),
+        "start_of_shift": "08:00",
+        "end_of_shift": rng.choice(["12:00", "17:00", "20:00"]),
+        "break": rng.choice([0, 0.5, 1]),
+        "salary": rng.randrange(450, 2000, 10),
+        "salary_condition": rng.choice(["per day", "per hour", "per shift"]),
+        "short_desc": short_desc,
+        "long_desc": f"{short_desc} needed. " + " ".join(rng.choices(DETAIL_WORDS, k=rng.randint(8, 25))),
+        "as_emp_id": as_emp_id,
+        "status": "active",
+        "lat": lat,
+        "lng": lng,
+        "created_at": created_at,
+    }
+
+
+def job_form(rng):
+    """Request body for POST /api/joblist/listNewJob."""
+    job = make_job(rng, None)
+    form = {k: job[k] for k in ("category", "location", "duration_from", "duration_upto", "start_of_shift",
+                                "end_of_shift", "salary", "salary_condition", "short_desc", "long_desc")}
+    form["break_"] = job["break"]
+    return form
+
+
+def generate_dataset(employers=50, parttimers=500, jobs=2000, applications=5000, seed=7):
+    """Users, employer/part-timer profiles, jobs and applications. Returns (Dataset, {table: rows})."""
+    rng = random.Random(seed)
+    data = Dataset()
+    tables = {name: [] for name in ("users", "as_employer", "as_parttimer", "job_category", "job_details",
+                                    "joblist", "job_applications")}
+    for category_id, (category, short_descs) in enumerate(TAXONOMY.items(), start=1):
+        tables["job_category"].append({"id": category_id, "category": category})
+        for short_desc in short_descs:
+            tables["job_details"].append({"category_id": category_id, "short_desc": short_desc,
+                                          "long_desc": f"{short_desc} for {category.lower()}"})
+
+    emp_ids, prtmr_ids = [], []
+    for i in range(employers):
+        user = _user(rng, "Employer", i)
+        location, lat, lng = _place(rng)
+        as_emp_id = _uuid(rng)
+        tables["users"].append(user)
+        tables["as_employer"].append({"id": user["id"], "as_emp_id": as_emp_id, "location": location,
+                                      "status": True, "lat": lat, "lng": lng})
+        data.employers.append(user["id"])
+        emp_ids.append(as_emp_id)
+    for i in range(parttimers):
+        user = _user(rng, "Parttimer", i)
+        location, lat, lng = _place(rng)
+        as_prtmr_id = _uuid(rng)
+        tables["users"].append(user)
+        tables["as_parttimer"].append({"id": user["id"], "as_prtmr_id": as_prtmr_id, "location": location,
+                                       "available": rng.random() < 0.8, "lat": lat, "lng": lng})
+        data.parttimers.append(user["id"])
+        prtmr_ids.append(as_prtmr_id)
+
+    now = datetime.now(timezone.utc)
+    for i in range(jobs if emp_ids else 0):
+        job = make_job(rng, rng.choice(emp_ids), (now - timedelta(minutes=jobs - i)).isoformat())
+        job["id"] = _uuid(rng)
+        tables["joblist"].append(job)
+        data.jobs.append(job["id"])
+
+    applied = set()
+    for _ in range(applications if data.jobs and prtmr_ids else 0):
+        pair = (rng.choice(data.jobs), rng.choice(prtmr_ids))
+        if pair in applied:
+            continue  # one application per part-timer per job
+        applied.add(pair)
+        amount = rng.randrange(450, 2000, 10)
+        tables["job_applications"].append({
+            "id": _uuid(rng), "jobid": pair[0], "prtmr_id": pair[1], "status": "applied", "amount": amount,
+            "bid_amount": amount - rng.randrange(0, 100, 10) if rng.random() < 0.3 else None, "bid_reason": None,
+            "created_at": (now - timedelta(seconds=rng.randrange(86400 * 30))).isoformat()})
+    data.applications = len(tables["job_applications"])
+    return data, tables
+
+
+def seed_dataset(store, *args, **kwargs):
+    """Generate a dataset and write it straight into an in-process fake store."""
+    data, tables = generate_dataset(*args, **kwargs)
+    with store.lock:
+        for table, rows in tables.items():
+            store.rows(table).extend(store.apply_defaults(table, dict(row)) for row in rows)
+    return data
+
+
+def load_dataset(client, tables, chunk=500):
+    """Write a generated dataset through PostgREST (the fake in another process, or a real local stack)."""
+    for table, rows in tables.items():
+        for i in range(0, len(rows), chunk):
+            client.from_(table).insert(rows[i:i + chunk]).execute()
@@ -0,0 +1,175 @@
+"""
+Background task queue: write latency against side-effect cost, and the
+queue's retry, dead-letter, concurrency and durability behaviour.
+
+POST /api/joblist/listNewJob for places only the remote geocoder knows, with
+the geocoder (GEOCODER_URL, served by the PostgREST stand-in) getting slower:
+  inline  TASKS_ENABLED=0, the geocode runs inside the request as it used to
+  queued  the job is saved, the geocode task runs after the response
+then a check that every queued job did get its coordinates.
+
+    cd backend && python -m bench.task_queue --latency-ms 20 --geocoder-ms 0,250,1000,3000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from loguru import logger
+
+from bench import fake_postgrest
+from bench.harness import import_app, api_client, make_token, percentile
+from bench.seed import generate_dataset, load_dataset, job_form
+
+
+async def post_jobs(client, headers, count, tag):
+    rng = random.Random(tag)
+    samples, ids = [], []
+    for i in range(count):
+        form = job_form(rng)
+        form["location"] = f"{i} Bench Street {tag}, Makati"  # unknown to the gazetteer and the cache
+        started = time.perf_counter()
+        res = await client.post("/api/joblist/listNewJob", json=form, headers=headers)
+        samples.append((time.perf_counter() - started) * 1000)
+        res.raise_for_status()
+        ids.append(res.json()["job"][0]["id"])
+    return samples, ids
+
+
+def placed(supabase, ids):
+    rows = supabase.from_("joblist").select("id, lat, lng").in_("id", ids).execute().data
+    return sum(1 for row in rows if row.get("lat") is not None)
+
+
+async def write_latency(app, args, headers):
+    from utils.supabase_client import supabase
+    from utils.tasks import tasks
+
+    failures = []
+    print(f"POST /api/joblist/listNewJob, {args.requests} requests per step, {args.latency_ms:.0f}ms backend latency")
+    print(f"  {'geocoder':>9}  {'inline p50':>11} {'p99':>8}  {'queued p50':>11} {'p99':>8}  placed after queue drained")
+    async with api_client(app) as client:
+        for step, geocoder_ms in enumerate(args.geocoder_ms):
+            await asyncio.to_thread(lambda: supabase.rpc("bench_configure", {
+                "latency_ms": args.latency_ms, "table_latency_ms": {"search": geocoder_ms}}).execute())
+            row = [f"  {geocoder_ms:7.0f}ms"]
+            for enabled in (False, True):
+                tasks.enabled = enabled
+                samples, ids = await post_jobs(client, headers, args.requests, f"{step}-{enabled}")
+                row.append(f"{percentile(samples, 50):9.1f}ms {percentile(samples, 99):6.1f}ms")
+            drained = await tasks.join(timeout=60)
+            count = await asyncio.to_thread(placed, supabase, ids)
+            row.append(f"{count}/{len(ids)}")
+            print("  ".join(row))
+            if not drained or count != len(ids):
+                failures.append(f"{len(ids) - count} queued jobs were never geocoded at {geocoder_ms:.0f}ms")
+    print(f"  {tasks.snapshot()}")
+    return failures
+
+
+async def queue_mechanics():
+    """Retries, dead-lettering and the per-handler limit, on a queue of its own."""
+    from utils.tasks import TaskQueue, MemoryTaskBackend
+
+    failures = []
+    queue = TaskQueue(MemoryTaskBackend(), poll_interval=0.05, backoff_base=0.01)
+    attempts, active, peak = {}, [0], [0]
+
+    async def flaky(payload):
+        attempts[payload["n"]] = attempts.get(payload["n"], 0) + 1
+        if attempts[payload["n"]] <= payload["failures"]:
+            raise RuntimeError("flaky side effect")
+
+    async def slow(payload):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        active[0] -= 1
+
+    queue.register("flaky", flaky, max_attempts=3)
+    queue.register("slow", slow, concurrency=4)
+    for n in range(50):
+        await queue.enqueue("flaky", {"n": n, "failures": 2 if n < 40 else 99})
+    for _ in range(40):
+        await queue.enqueue("slow", {})
+    await queue.join(timeout=30)
+    dead = await queue.backend.dead_letters()
+    await queue.stop()
+    print(f"queue mechanics: {queue.snapshot()}")
+    print(f"  40 tasks failing twice then succeeding: {queue.succeeded - 40} succeeded after "
+          f"{queue.retried} retries; 10 failing always: {len(dead)} dead-lettered after 3 attempts each")
+    print(f"  40 slow tasks with a per-handler limit of 4: at most {peak[0]} ran at once")
+    if queue.succeeded != 80 or len(dead) != 10 or any(task["attempts"] != 3 for task in dead):
+        failures.append("retries or dead-lettering did not add up")
+    if peak[0] > 4:
+        failures.append(f"the per-handler limit let {peak[0]} tasks run at once")
+    return failures
+
+
+async def durability():
+    """Tasks claimed by a worker that dies are run by the next one that opens the same file."""
+    from utils.tasks import TaskQueue, SqliteTaskBackend
+
+    path = os.path.join(tempfile.mkdtemp(), "tasks.sqlite")
+    done = set()
+
+    async def hang(payload):
+        await asyncio.sleep(3600)
+
+    async def record(payload):
+        done.add(payload["n"])
+
+    crashed = TaskQueue(SqliteTaskBackend(path), poll_interval=0.05, lease=0.2)
+    crashed.register("work", hang)
+    for n in range(20):
+        await crashed.enqueue("work", {"n": n})
+    await asyncio.sleep(0.2)
+    await crashed.stop(timeout=0)  # running tasks are cancelled without acking, as if the process died
+
+    restarted = TaskQueue(SqliteTaskBackend(path), poll_interval=0.05, lease=0.2)
+    restarted.register("work", record)
+    await restarted.start()
+    await restarted.join(timeout=10)
+    await restarted.stop()
+    print(f"sqlite backend: {len(done)}/20 tasks left running by a crashed worker completed after restart")
+    return [] if len(done) == 20 else [f"only {len(done)} of 20 tasks survived the restart"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--geocoder-ms", type=lambda s: [float(x) for x in s.split(",")], default=[0, 250, 1000, 3000])
+    parser.add_argument("--requests", type=int, default=20, help="jobs posted per step and mode")
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    os.environ["GEOCODER_URL"] = f"http://127.0.0.1:{args.port}/geocode/search"
+    os.environ.setdefault("GEOCODE_CONCURRENCY", "8")
+    logger.remove()
+    process = fake_postgrest.serve_in_process(args.port)
+    app = import_app(f"http://127.0.0.1:{args.port}")
+    try:
+        from utils.supabase_client import supabase
+
+        data, tables = generate_dataset(employers=1, parttimers=0, jobs=10, applications=0)
+        load_dataset(supabase, tables)
+        headers = {"Authorization": f"Bearer {make_token(data.employers[0])}"}
+
+        async def run():
+            failures = await write_latency(app, args, headers)
+            failures += await queue_mechanics()
+            failures += await durability()
+            return failures
+
+        failures = asyncio.run(run())
+    finally:
+        process.terminate()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,29 @@
 # main.py (Updated)
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import employer, parttimer, joblist  # <- new imports
+from fastapi.responses import PlainTextResponse, ORJSONResponse
+from routers import employer, parttimer, joblist, events, analytics  # <- new imports
 from utils import auth  # <- new import
+from utils.metrics import metrics, MetricsMiddleware
+from utils.compression import CompressionMiddleware
+from utils.ratelimit import RateLimitMiddleware
+from utils.lifecycle import lifecycle
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    await lifecycle.startup()
+    try:
+        yield
+    finally:
+        await lifecycle.shutdown()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# added first so it runs inside CORS: browsers can only read a 429/503 that carries CORS headers
+app.add_middleware(RateLimitMiddleware)
 
 # CORS setup
 origins = [
@@ -21,13 +40,33 @@ app.add_middleware(
     expose_headers=["Content-Type", "Authorization"],
     max_age=3600,
 )
+app.add_middleware(CompressionMiddleware)
+# added last so it wraps CORS and compression too and times the whole request
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/livez", include_in_schema=False)
+async def liveness():
+    """The worker's event loop is running; restart it if this stops answering."""
+    return {"status": "alive"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readiness():
+    """Whether to route traffic here: 503 while warming up and once draining for shutdown."""
+    status = "ready" if lifecycle.ready else "draining" if lifecycle.draining else "starting"
+    return ORJSONResponse({"status": status, **lifecycle.snapshot()}, status_code=200 if lifecycle.ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(employer.router)
 app.include_router(parttimer.router)
 app.include_router(joblist.router)
+app.include_router(events.router)
+app.include_router(analytics.router)
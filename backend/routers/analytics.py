@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from loguru import logger
+from utils.auth import get_current_user
+from utils.supabase_client import supabase
+from utils.db import run_queries
+from utils.cache import TTLCache
+from utils.responses import json_response
+from typing import Optional
+import os
+
+router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
+
+# the views behind this are refreshed every few minutes (sql/007_job_analytics.sql),
+# so a short per-process cache only saves round trips, not freshness
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "60"))
+analytics_cache = TTLCache(maxsize=1000, ttl=ANALYTICS_CACHE_TTL)
+
+# location "*" rows are the per-category rollups over every location
+ALL_LOCATIONS = "*"
+
+SALARY_COLUMNS = ("category, location, salary_condition, job_count, active_count, min_salary, max_salary, "
+                  "avg_salary, p10, p25, p50, p75, p90, refreshed_at")
+SHIFT_COLUMNS = ("category, location, job_count, avg_shift_hours, p25_shift_hours, p50_shift_hours, "
+                 "p75_shift_hours, shifts_under_4h, shifts_4_6h, shifts_6_8h, shifts_8_10h, shifts_10_12h, "
+                 "shifts_12h_plus, avg_break_hours, avg_duration_days, p50_duration_days, refreshed_at")
+BID_COLUMNS = ("category, location, application_count, bid_count, bid_rate, avg_amount, avg_bid_amount, "
+               "p50_bid_ratio, avg_bid_ratio, avg_amount_to_salary, refreshed_at")
+
+
+def stats_query(view, columns, category, location):
+    query = supabase.from_(view).select(columns)
+    if category:
+        query = query.eq("category", category)
+    if location:
+        query = query.eq("location", location)
+    # a single order parameter; chained .order() calls would send it twice
+    return query.order("category,location")
+
+
+@router.get("/jobs")
+async def get_job_analytics(
+    category: Optional[str] = Query(None, max_length=100),
+    location: Optional[str] = Query(None, max_length=200, description='"*" for the per-category rollups'),
+    user=Depends(get_current_user),
+):
+    """
+    Salary percentiles per category/location/salary_condition, shift-length
+    distributions and bid-vs-amount stats, read from precomputed views.
+    """
+    key = (category, location)
+    body = analytics_cache.get(key)
+    if body is None:
+        try:
+            salary, shifts, bids = await run_queries(
+                stats_query("job_salary_stats", SALARY_COLUMNS, category, location),
+                stats_query("job_shift_stats", SHIFT_COLUMNS, category, location),
+                stats_query("job_bid_stats", BID_COLUMNS, category, location),
+            )
+        except Exception as e:
+            logger.error(f"Error fetching job analytics: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+        salary, shifts, bids = salary.data or [], shifts.data or [], bids.data or []
+        refreshed = [row["refreshed_at"] for row in salary + shifts + bids if row.get("refreshed_at")]
+        body = {
+            "salary": salary,
+            "shifts": shifts,
+            "bids": bids,
+            "refreshed_at": min(refreshed) if refreshed else None,
+        }
+        analytics_cache.set(key, body)
+
+    return json_response(body, headers={"Cache-Control": f"private, max-age={int(ANALYTICS_CACHE_TTL)}"})
@@ -1,88 +1,122 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from loguru import logger
 from utils.auth import get_current_user
 from utils.supabase_client import supabase
+from utils.db import BackendOverloaded, run_query, run_queries, embedded_one
+from utils.cache import TTLCache
+from utils.geo import geocode, geocode_local, geocoder_limit, parttimer_index, load_parttimer_index
+from utils.matching import matching
+from utils.pagination import MAX_PAGE_SIZE, encode_cursor, decode_cursor, keyset_after, order_keyset, split_page
+from utils.responses import json_response, dumps, parse_fields, select_columns, project
+from utils.job_cache import job_cache, employer_jobs_key
+from utils.tasks import tasks
 from pydantic import BaseModel
+from typing import Optional
+import os
 
 router = APIRouter(prefix="/api/employer", tags=["Employer"])
 
+# as_emp_id never changes for a user, so resolve it once per process
+as_emp_id_cache = TTLCache(
+    maxsize=int(os.getenv("IDENTITY_CACHE_SIZE", "50000")),
+    ttl=float(os.getenv("IDENTITY_CACHE_TTL", "600")),
+)
+
 async def fetch_as_emp_id(user_id):
+    cached = as_emp_id_cache.get(user_id)
+    if cached:
+        return cached
     try:
-        result = supabase.from_("as_employer").select("as_emp_id").eq("id", user_id).maybe_single().execute()
-        if result.data and "as_emp_id" in result.data:
+        result = await run_query(supabase.from_("as_employer").select("as_emp_id").eq("id", user_id).maybe_single())
+        if result and result.data and result.data.get("as_emp_id"):
+            as_emp_id_cache.set(user_id, result.data["as_emp_id"])
             return result.data["as_emp_id"]
+    except BackendOverloaded:
+        raise  # a shed lookup is not a missing row
     except Exception as e:
         logger.warning(f"fetch_as_emp_id failed: {str(e)}")
     return ""
 
+EMPLOYER_COLUMNS = "as_emp_id, location, status, lat, lng"
+
+async def fetch_employer_row(user_id):
+    """Returns the caller's whole as_employer row in one query, or {} if there is none."""
+    try:
+        result = await run_query(supabase.from_("as_employer").select(EMPLOYER_COLUMNS).eq("id", user_id).maybe_single())
+        if result and result.data:
+            if result.data.get("as_emp_id"):
+                as_emp_id_cache.set(user_id, result.data["as_emp_id"])
+            return result.data
+    except BackendOverloaded:
+        raise  # a shed lookup is not a missing row
+    except Exception as e:
+        logger.warning(f"fetch_employer_row failed: {str(e)}")
+    return {}
+
+async def load_employer_profile(user_id):
+    """Returns the users row joined with its as_employer row in a single round trip."""
+    result = await run_query(
+        supabase.from_("users")
+        .select(f"name, picture_url, email, as_employer({EMPLOYER_COLUMNS})")
+        .eq("id", user_id)
+        .maybe_single()
+    )
+    if not result or not result.data:
+        return None
+    profile = dict(result.data)
+    employer = embedded_one(profile.pop("as_employer", None))
+    return {**profile, **{col: employer.get(col) for col in ("as_emp_id", "location", "status")}}
+
 @router.get("/as_emp_id")
 async def get_as_emp_id(user=Depends(get_current_user)):
-    user_id = user.get("id")
-    as_emp_id = await fetch_as_emp_id(user_id)
-    if as_emp_id:
-        return {"as_emp_id": as_emp_id}
+    employer = await fetch_employer_row(user.get("id"))
+    if employer.get("as_emp_id"):
+        return {"as_emp_id": employer["as_emp_id"]}
     raise HTTPException(status_code=404, detail="Employer ID not found")
 
 
-async def fetch_emp_location(user_id):
-    try:
-        result = supabase.from_("as_employer").select("location").eq("id", user_id).maybe_single().execute()
-        if result.data and "location" in result.data:
-            return result.data["location"]
-    except Exception as e:
-        logger.warning(f"fetch_location failed: {str(e)}")
-    return ""
-
 @router.get("/location")
-async def get_as_emp_id(user=Depends(get_current_user)):
-    user_id = user.get("id")
-    location = await fetch_emp_location(user_id)
-    if location:
-        return {"location": location}
+async def get_emp_location(user=Depends(get_current_user)):
+    employer = await fetch_employer_row(user.get("id"))
+    if employer.get("location"):
+        return {"location": employer["location"]}
     raise HTTPException(status_code=404, detail="Employer Location not found")
 
 
-async def fetch_emp_status(user_id):
-    try:
-        result = supabase.from_("as_employer").select("status").eq("id", user_id).maybe_single().execute()
-        if result.data and "status" in result.data:
-            return result.data["status"]
-    except Exception as e:
-        logger.warning(f"fetch_status failed: {str(e)}")
-    return ""
-
 @router.get("/status")
-async def get_as_emp_id(user=Depends(get_current_user)):
-    user_id = user.get("id")
-    status = await fetch_emp_status(user_id)
-    if status:
-        return {"status": status}
+async def get_emp_status(user=Depends(get_current_user)):
+    employer = await fetch_employer_row(user.get("id"))
+    if employer.get("status") is not None:
+        return {"status": employer["status"]}
     raise HTTPException(status_code=404, detail="Employer status not found")
 
 
 @router.get("/profile")
 async def employer_profile(user=Depends(get_current_user)):
-    user_id = user.get("id")
-    user_result = supabase.from_("users").select("name, picture_url, email").eq("id", user_id).maybe_single().execute()
-    name = user_result.data.get("name") if user_result.data else None
-    picture_url = user_result.data.get("picture_url") if user_result.data else None
-    email = user_result.data.get("email") if user_result.data else None
-    as_emp_id = await fetch_as_emp_id(user_id)
-    location = await fetch_emp_location(user_id)
-    status = await fetch_emp_status(user_id)
-    if name:
-        return {"name": name, "picture_url": picture_url, "email":email, "as_emp_id": as_emp_id, "location": location, "status": status}
+    profile = await load_employer_profile(user.get("id"))
+    if profile and profile.get("name"):
+        return profile
     raise HTTPException(status_code=404, detail="User not found")
 
 @router.post("/check_or_create_employer")
 async def check_or_create_employer(user=Depends(get_current_user)):
     user_id = user.get("id")
+    as_emp_id_cache.pop(user_id)
     as_emp_id = await fetch_as_emp_id(user_id)
     if as_emp_id:
         return {"status": "exists", "as_emp_id": as_emp_id}
-    response = supabase.from_("as_employer").insert({"id": user_id}).execute()
-    if response.error:
+    # ON CONFLICT (id) DO NOTHING: of two racing first calls only one inserts,
+    # the other gets no row back and reads the winner's
+    response = await run_query(
+        supabase.from_("as_employer").upsert({"id": user_id}, on_conflict="id", ignore_duplicates=True)
+    )
+    if not response.data:
+        as_emp_id = await fetch_as_emp_id(user_id)
+        if as_emp_id:
+            return {"status": "exists", "as_emp_id": as_emp_id}
         raise HTTPException(status_code=500, detail="Failed to create employer account")
+    as_emp_id_cache.set(user_id, response.data[0]["as_emp_id"])
     return {"status": "created", "as_emp_id": response.data[0]["as_emp_id"]}
 
 
@@ -90,6 +124,21 @@ class LocationUpdateRequest(BaseModel):
     location: str
     status: str
 
+GEOCODE_TASK = "employer.geocode"
+
+async def geocode_employer(payload):
+    """Task: place an employer whose location the remote geocoder had to look up."""
+    coords = await geocode(payload["location"], strict=True)
+    if not coords:
+        return
+    # a later location_update wins over this one
+    await run_query(
+        supabase.from_("as_employer").update({"lat": coords[0], "lng": coords[1]})
+        .eq("id", payload["id"]).eq("location", payload["location"])
+    )
+
+tasks.register(GEOCODE_TASK, geocode_employer, concurrency=geocoder_limit)
+
 @router.post("/location_update")
 async def location_update(
     data: LocationUpdateRequest,
@@ -99,27 +148,42 @@ async def location_update(
         user_id = user.get("id")
         location = data.location
         status = data.status.lower() == "true"  # convert string to boolean
+        # places the geocoder has to look up are filled in by GEOCODE_TASK after the update
+        resolved, coords = geocode_local(location)
+        lat, lng = coords if coords else (None, None)
 
-        response = supabase.from_("as_employer").update({
+        response = await run_query(supabase.from_("as_employer").update({
             "location": location,
-            "status": status
-        }).eq("id", user_id).execute()
-
-        if response.error:
-            print("Supabase update error:", response.error)
-            return {"status": "failed", "error": str(response.error)}
+            "status": status,
+            "lat": lat,
+            "lng": lng,
+        }).eq("id", user_id))
+
+        if not response.data:
+            logger.error(f"Employer location update matched no row for user {user_id}")
+            return {"status": "failed", "error": "Employer not found"}
+        if not resolved:
+            await tasks.enqueue(GEOCODE_TASK, {"id": user_id, "location": location})
+        matching.set_employer_active(response.data[0].get("as_emp_id"), status)
 
         return {"status": "updated", "location": location, "status_value": status}
 
+    except BackendOverloaded:
+        raise  # answered with a 503 by the overload middleware
     except Exception as e:
-        print("Unhandled exception:", str(e))
+        logger.error(f"Error updating employer location: {str(e)}")
         return {"status": "failed", "error": "Something went wrong"}
 
  
 
 
+EMPLOYER_JOB_DEFAULT_COLUMNS = ("id", "category", "short_desc", "created_at", "status")
+EMPLOYER_JOB_COLUMNS = EMPLOYER_JOB_DEFAULT_COLUMNS + ("location", "salary", "salary_condition", "duration_from",
+                                                      "duration_upto", "start_of_shift", "end_of_shift", "long_desc")
+
 @router.get("/job")
-async def get_employer_jobs(user=Depends(get_current_user)):
+async def get_employer_jobs(user=Depends(get_current_user), fields: Optional[str] = None):
+    fieldset = parse_fields(fields, EMPLOYER_JOB_COLUMNS)
     try:
         user_id = user.get("id")
         # Get as_emp_id
@@ -128,50 +192,276 @@ async def get_employer_jobs(user=Depends(get_current_user)):
         if not as_emp_id:
             raise HTTPException(status_code=404, detail="Employer ID not found")
 
-        jobs_result = supabase.from_("joblist").select("id, category, short_desc, created_at, status").eq("as_emp_id", as_emp_id).execute()
-        return {"jobs": jobs_result.data}
+        async def load():
+            # every column ?fields= may ask for, so one cached list serves all fieldsets
+            jobs_result = await run_query(
+                supabase.from_("joblist").select(", ".join(EMPLOYER_JOB_COLUMNS)).eq("as_emp_id", as_emp_id)
+            )
+            return jobs_result.data
+
+        jobs = await job_cache.get_or_load(employer_jobs_key(as_emp_id), load)
+        return json_response({"jobs": project(jobs, fieldset or EMPLOYER_JOB_DEFAULT_COLUMNS)})
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching employer jobs: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-    
-@router.get("/available-parttimers")
-async def get_available_as_parttimer(user=Depends(get_current_user)):
+
+@router.get("/job/{job_id}/candidates")
+async def get_job_candidates(
+    job_id: str,
+    user=Depends(get_current_user),
+    k: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Top-k available part-timers for one of the caller's jobs, from the matching indexes."""
+    as_emp_id = await fetch_as_emp_id(user.get("id"))
+    if not as_emp_id:
+        raise HTTPException(status_code=404, detail="Employer ID not found")
+
     try:
+        await matching.ensure_loaded()
+        indexed = matching.jobs.get(job_id)
+        job = indexed[2] if indexed else None
+        if job is None:
+            job_result = await run_query(
+                supabase.from_("joblist").select("as_emp_id, category, location").eq("id", job_id).maybe_single()
+            )
+            job = job_result.data if job_result else None
+        if not job or job.get("as_emp_id") != as_emp_id:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        ranked = matching.recommend_parttimers(job.get("location"), job.get("category"), k)
+        if not ranked:
+            return {"candidates": []}
+        result = await run_query(
+            supabase.from_("as_parttimer").select(PARTTIMER_LIST_SELECT).in_("id", [c["id"] for c in ranked])
+        )
+        by_id = {row["id"]: flatten_parttimer(row) for row in result.data or []}
+        return {"candidates": [{**by_id[c["id"]], **c} for c in ranked if c["id"] in by_id]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching job candidates: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-        # Get all part-timers
-        as_parttimer_info = supabase.from_("as_parttimer").select("id, as_prtmr_id, location").execute()
-        parttimer_data = as_parttimer_info.data
 
-        if not parttimer_data:
-            return {"as_parttimer": []}
+APPLICANT_SELECT = (
+    "id, jobid, status, amount, bid_amount, bid_reason, created_at, "
+    "as_parttimer(as_prtmr_id, location, users(name, email, picture_url))"
+)
+INBOX_JOB_COLUMNS = "id, category, short_desc, location, created_at, status, applicant_count, best_bid, last_applied_at"
+
+def flatten_applicant(row):
+    row = dict(row)
+    parttimer = embedded_one(row.pop("as_parttimer", None))
+    user_info = embedded_one(parttimer.get("users"))
+    return {
+        **row,
+        "as_prtmr_id": parttimer.get("as_prtmr_id"),
+        "location": parttimer.get("location"),
+        "name": user_info.get("name"),
+        "email": user_info.get("email"),
+        "picture_url": user_info.get("picture_url"),
+    }
+
+@router.get("/applications")
+async def get_applications_inbox(
+    user=Depends(get_current_user),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    applicants: int = Query(5, ge=0, le=50),
+    status: Optional[str] = None,
+):
+    """
+    The employer's jobs, newest first, each with applicant_count, best_bid (lowest
+    asking amount) and its most recent applicants with their profiles, all from one
+    query against the employer_job_inbox view. Page jobs with ?cursor=; page one job's
+    applicants further with /applications/{job_id}.
+    """
+    as_emp_id = await fetch_as_emp_id(user.get("id"))
+    if not as_emp_id:
+        raise HTTPException(status_code=404, detail="Employer ID not found")
+
+    select = INBOX_JOB_COLUMNS + (f", job_applications({APPLICANT_SELECT})" if applicants else "")
+    query = supabase.from_("employer_job_inbox").select(select).eq("as_emp_id", as_emp_id)
+    if status:
+        query = query.eq("status", status)
+    if cursor:
+        query = keyset_after(query, cursor)
+    query = order_keyset(query).limit(limit + 1)
+    if applicants:
+        query = order_keyset(query, embedded="job_applications").limit(applicants, foreign_table="job_applications")
 
-        # Get all related user_ids
-        user_ids = [item["id"] for item in parttimer_data]
+    try:
+        result = await run_query(query)
+        jobs, next_cursor = split_page(result.data, limit)
+        for job in jobs:
+            rows = job.pop("job_applications", None) or []
+            job["applicants"] = [flatten_applicant(row) for row in rows]
+            more = rows and (job.get("applicant_count") or 0) > len(rows)
+            job["applicants_cursor"] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if more else None
+        return {"jobs": jobs, "next_cursor": next_cursor}
+    except Exception as e:
+        logger.error(f"Error fetching applications inbox: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/applications/{job_id}")
+async def get_job_applicants(
+    job_id: str,
+    user=Depends(get_current_user),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Applicants for one of the caller's jobs, newest first, keyset-paged."""
+    as_emp_id = await fetch_as_emp_id(user.get("id"))
+    if not as_emp_id:
+        raise HTTPException(status_code=404, detail="Employer ID not found")
 
-        # Fetch all user info in one query
-        parttimer_user_data = supabase.from_("users").select("id, name, picture_url, email").in_("id", user_ids).execute()
-        user_data_map = {user["id"]: user for user in parttimer_user_data.data}
+    query = supabase.from_("job_applications").select(APPLICANT_SELECT).eq("jobid", job_id)
+    if cursor:
+        query = keyset_after(query, cursor)
+    query = order_keyset(query).limit(limit + 1)
 
-        # Merge the data
-        result = []
-        for p in parttimer_data:
-            user_info = user_data_map.get(p["id"], {})
-            result.append({
-                "id": p["id"],
-                "location": p.get("location"),
-                "as_prtmr_id": p.get("as_prtmr_id"),
-                "name": user_info.get("name"),
-                "email": user_info.get("email"),
-                "picture_url": user_info.get("picture_url")
-            })
+    try:
+        job_result, applicants_result = await run_queries(
+            supabase.from_("joblist").select("id").eq("id", job_id).eq("as_emp_id", as_emp_id),
+            query,
+        )
+    except Exception as e:
+        logger.error(f"Error fetching job applicants: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-        return {"as_parttimer": result}
+    if not job_result.data:
+        raise HTTPException(status_code=404, detail="Job not found")
+    rows, next_cursor = split_page(applicants_result.data, limit)
+    return {"applicants": [flatten_applicant(row) for row in rows], "next_cursor": next_cursor}
+
+    
+PARTTIMER_LIST_COLUMNS = ("id", "as_prtmr_id", "location")
+PARTTIMER_USER_COLUMNS = ("name", "email", "picture_url")
+PARTTIMER_LIST_FIELDS = PARTTIMER_LIST_COLUMNS + PARTTIMER_USER_COLUMNS
+PARTTIMER_STREAM_BATCH = 500
+
+def parttimer_list_select(fieldset=None):
+    """as_parttimer columns plus the users embed, trimmed to a fieldset; id is kept for paging."""
+    own = [f for f in fieldset or PARTTIMER_LIST_COLUMNS if f in PARTTIMER_LIST_COLUMNS]
+    user_columns = [f for f in fieldset or PARTTIMER_USER_COLUMNS if f in PARTTIMER_USER_COLUMNS]
+    columns = select_columns(own, (), required=("id",))
+    return f"{columns}, users({', '.join(user_columns)})" if user_columns else columns
+
+PARTTIMER_LIST_SELECT = parttimer_list_select()
+
+def flatten_parttimer(row):
+    user_info = embedded_one(row.get("users"))
+    return {
+        "id": row["id"],
+        "location": row.get("location"),
+        "as_prtmr_id": row.get("as_prtmr_id"),
+        "name": user_info.get("name"),
+        "email": user_info.get("email"),
+        "picture_url": user_info.get("picture_url"),
+    }
+
+async def fetch_parttimer_page(limit, after_id=None, location=None, available=None, fieldset=None):
+    """One page of part-timers joined with their users row, ordered by id."""
+    query = supabase.from_("as_parttimer").select(parttimer_list_select(fieldset))
+    if location:
+        query = query.eq("location", location)
+    if available is not None:
+        query = query.eq("available", available)
+    if after_id is not None:
+        query = query.gt("id", after_id)
+    result = await run_query(query.order("id").limit(limit))
+    return [flatten_parttimer(row) for row in result.data or []]
+
+@router.get("/available-parttimers")
+async def get_available_as_parttimer(
+    user=Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    location: Optional[str] = None,
+    available: Optional[bool] = True,
+    stream: bool = False,
+    fields: Optional[str] = None,
+):
+    """
+    Part-timers with their profile joined server-side, paged by id.
+    With ?stream=true the whole filtered set is sent as NDJSON, one part-timer
+    per line, fetched PARTTIMER_STREAM_BATCH rows at a time; a stream that fails
+    part way ends with an {"error": ...} line. Part-timers set available with
+    POST /api/parttimer/availability_update.
+    ?fields=id,name limits the columns fetched and returned.
+    """
+    after_id = decode_cursor(cursor, size=1)[0] if cursor else None
+    fieldset = parse_fields(fields, PARTTIMER_LIST_FIELDS)
+
+    if stream:
+        async def ndjson():
+            last_id = after_id
+            while True:
+                try:
+                    batch = await fetch_parttimer_page(PARTTIMER_STREAM_BATCH, last_id, location, available, fieldset)
+                except Exception as e:
+                    logger.error(f"Error streaming available part-timers: {str(e)}")
+                    # the 200 is already sent: a last line tells clients the list is cut short
+                    yield dumps({"error": "Internal server error"}) + b"\n"
+                    return
+                # one chunk per batch keeps sends (and compressor flushes) per batch, not per row
+                yield b"".join(dumps(parttimer) + b"\n" for parttimer in project(batch, fieldset))
+                if len(batch) < PARTTIMER_STREAM_BATCH:
+                    return
+                last_id = batch[-1]["id"]
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    try:
+        parttimers = await fetch_parttimer_page(limit + 1, after_id, location, available, fieldset)
+        next_cursor = encode_cursor(parttimers[limit - 1]["id"]) if len(parttimers) > limit else None
+        return json_response({"as_parttimer": project(parttimers[:limit], fieldset), "next_cursor": next_cursor})
 
     except Exception as e:
         logger.error(f"Error fetching available part-timers: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/available-parttimers/nearby")
+async def get_nearby_parttimers(
+    user=Depends(get_current_user),
+    job_id: Optional[str] = None,
+    radius_km: float = Query(10, gt=0, le=200),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Part-timers within radius_km of one of the caller's jobs (or of the employer), nearest first."""
+    user_id = user.get("id")
+    if job_id:
+        as_emp_id = await fetch_as_emp_id(user_id)
+        job_result = await run_query(
+            supabase.from_("joblist").select("lat, lng").eq("id", job_id).eq("as_emp_id", as_emp_id).maybe_single()
+        )
+        origin = job_result.data if job_result else None
+        if not origin:
+            raise HTTPException(status_code=404, detail="Job not found")
+    else:
+        origin = await fetch_employer_row(user_id)
+    lat, lng = origin.get("lat"), origin.get("lng")
+    if lat is None or lng is None:
+        raise HTTPException(status_code=400, detail="Location has no coordinates")
+
+    try:
+        await parttimer_index.ensure_loaded(load_parttimer_index)
+        hits = parttimer_index.within(lat, lng, radius_km, limit)
+        if not hits:
+            return {"as_parttimer": []}
+
+        result = await run_query(
+            supabase.from_("as_parttimer").select(PARTTIMER_LIST_SELECT).in_("id", [pid for _, pid in hits])
+        )
+        by_id = {row["id"]: flatten_parttimer(row) for row in result.data or []}
+        return {"as_parttimer": [{**by_id[pid], "distance_km": round(d, 2)} for d, pid in hits if pid in by_id]}
+    except Exception as e:
+        logger.error(f"Error fetching nearby part-timers: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 class StatusUpdateRequest(BaseModel):
     status: bool
 
@@ -181,9 +471,10 @@ async def status_update(data: StatusUpdateRequest, user=Depends(get_current_user
     if user_id is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    response = supabase.from_("as_employer").update({"status": data.status}).eq("id", user_id).execute()
+    response = await run_query(supabase.from_("as_employer").update({"status": data.status}).eq("id", user_id))
 
-    if response.error:
+    if not response.data:
         raise HTTPException(status_code=500, detail="Failed to update status")
+    matching.set_employer_active(response.data[0].get("as_emp_id"), data.status)
 
     return {"message": "Status updated", "status": data.status}
@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from routers.employer import fetch_as_emp_id
+from utils.auth import get_current_user, get_stream_user, create_stream_ticket, STREAM_TICKET_TTL
+from utils.supabase_client import supabase
+from utils.db import run_query
+from utils.events import events, JOB_CREATED, JOB_STATUS, APPLICATION_CREATED
+from utils.lifecycle import lifecycle
+from typing import Optional
+import asyncio
+import json
+
+router = APIRouter(prefix="/api/events", tags=["Events"])
+
+HEARTBEAT_SECONDS = 15
+PUBLIC_EVENTS = {JOB_CREATED, JOB_STATUS}
+
+
+def subscriber_filter(types, category, location, as_emp_id, own_job_ids):
+    """
+    Job events are public and narrowed by category/location. Application events
+    only reach the employer who owns the job.
+    """
+    def accepts(event):
+        event_type, data = event["type"], event["data"]
+        if event_type == JOB_CREATED and as_emp_id and event.get("owner") == as_emp_id:
+            own_job_ids.add(str(data.get("id")))
+        if types and event_type not in types:
+            return False
+        if event_type == APPLICATION_CREATED:
+            return str(data.get("jobid")) in own_job_ids
+        if event_type not in PUBLIC_EVENTS:
+            return False
+        if category and data.get("category") != category:
+            return False
+        if location and data.get("location") != location:
+            return False
+        return True
+    return accepts
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+@router.post("/ticket")
+async def stream_ticket(user=Depends(get_current_user)):
+    """A single-use ?ticket= for /stream, valid for STREAM_TICKET_TTL seconds; the access token stays out of URLs."""
+    return {"ticket": create_stream_ticket(user), "expires_in": STREAM_TICKET_TTL}
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    user=Depends(get_stream_user),
+    types: Optional[str] = None,
+    category: Optional[str] = None,
+    location: Optional[str] = None,
+):
+    """
+    Server-sent events replacing feed polling. Part-timers receive job.created /
+    job.status; employers additionally receive application.created for their jobs.
+    Filter with ?types=job.created,job.status&category=...&location=...
+    Browsers authenticate with ?ticket= from POST /api/events/ticket.
+    """
+    as_emp_id = await fetch_as_emp_id(user.get("id"))
+    own_job_ids = set()
+    if as_emp_id:
+        try:
+            jobs_result = await run_query(supabase.from_("joblist").select("id").eq("as_emp_id", as_emp_id))
+            own_job_ids = {str(job["id"]) for job in jobs_result.data or []}
+        except Exception as e:
+            logger.warning(f"Could not load employer jobs for event stream: {str(e)}")
+
+    wanted = {t.strip() for t in types.split(",") if t.strip()} if types else set()
+    await events.start()
+    subscription = events.subscribe(subscriber_filter(wanted, category, location, as_emp_id, own_job_ids))
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            # a draining worker ends its streams; clients reconnect (retry: 5000) to another one
+            while not lifecycle.draining and not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
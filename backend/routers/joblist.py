@@ -1,10 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response, Query
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from datetime import date
 from loguru import logger
 from routers.employer import fetch_as_emp_id  # Importing the function to fetch as_emp_id
 from utils.auth import get_current_user
 from utils.supabase_client import supabase
+from utils.db import run_query
+from utils.taxonomy import taxonomy, TAXONOMY_TTL
+from utils.geo import geocode, geocode_local, geocoder_limit, job_index
+from utils.events import events, job_event, JOB_CREATED
+from utils.matching import matching
+from utils.search import search_index
+from utils.pagination import MAX_PAGE_SIZE
+from utils.responses import parse_fields, project
+from utils.idempotency import idempotency
+from utils.job_cache import job_cache, employer_jobs_key, job_key
+from utils.tasks import tasks
+from utils.job_sweeper import apply_job_statuses
 
 router = APIRouter(prefix="/api/joblist", tags=["Joblist"])
 
@@ -21,85 +34,221 @@ class JobForm(BaseModel):
     short_desc: str
     long_desc: str
 
+MAX_JOBS_PER_BATCH = 200
+
+def build_job_row(form: JobForm, as_emp_id, coords):
+    return {
+        "category": form.category,
+        "location": form.location,
+        "duration_from": form.duration_from,
+        "duration_upto": form.duration_upto,
+        "start_of_shift": form.start_of_shift,
+        "end_of_shift": form.end_of_shift,
+        "break": form.break_,
+        "salary": form.salary,
+        "salary_condition": form.salary_condition,
+        "short_desc": form.short_desc,
+        "long_desc": form.long_desc,
+        "as_emp_id": as_emp_id,
+        "status": "active",  # Default status
+        "lat": coords[0] if coords else None,
+        "lng": coords[1] if coords else None,
+    }
+
+GEOCODE_TASK = "job.geocode"
+
+async def geocode_job(payload):
+    """Task: place a job saved before the remote geocoder had answered for its location."""
+    coords = await geocode(payload["location"], strict=True)
+    if not coords:
+        return
+    response = await run_query(
+        supabase.from_("joblist").update({"lat": coords[0], "lng": coords[1]}).eq("id", payload["id"])
+    )
+    if not response.data:
+        return  # deleted in the meantime
+    job = response.data[0]
+    await job_cache.invalidate(employer_jobs_key(job.get("as_emp_id")), job_key(job["id"]))
+    if job.get("status") == "active":
+        job_index.add(job["id"], *coords)
+
+tasks.register(GEOCODE_TASK, geocode_job, concurrency=geocoder_limit)
+
+def validate_job(form: JobForm):
+    """Checks the schema can't express; returns a list of error messages."""
+    errors = []
+    try:
+        if date.fromisoformat(form.duration_upto) < date.fromisoformat(form.duration_from):
+            errors.append("duration_upto is before duration_from")
+    except ValueError:
+        errors.append("duration_from and duration_upto must be YYYY-MM-DD dates")
+    if form.salary < 0:
+        errors.append("salary must not be negative")
+    if not form.short_desc.strip() or not form.category.strip():
+        errors.append("category and short_desc are required")
+    return errors
+
 @router.post("/listNewJob")
-async def save_job(form: JobForm, user=Depends(get_current_user)):
+async def save_job(
+    form: JobForm,
+    response: Response,
+    user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """A retry carrying the same Idempotency-Key gets the first response back instead of a second job."""
+    errors = validate_job(form)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return await idempotency.run(("listNewJob", user.get("id")), idempotency_key, form.model_dump(),
+                                 lambda: create_job(form, user), response)
+
+
+async def create_job(form: JobForm, user):
     try:
         user_id = user.get("id")
 
         # Get as_emp_id from as_employer table
         as_emp_id = await fetch_as_emp_id(user_id)
+        # places the geocoder has to look up are filled in by GEOCODE_TASK after the insert
+        resolved, coords = geocode_local(form.location)
+
+        job_data = build_job_row(form, as_emp_id, coords)
 
-        job_data = {
-            "category": form.category,
-            "location": form.location,
-            "duration_from": form.duration_from,
-            "duration_upto": form.duration_upto,
-            "start_of_shift": form.start_of_shift,
-            "end_of_shift": form.end_of_shift,
-            "break": form.break_,
-            "salary": form.salary,
-            "salary_condition": form.salary_condition,
-            "short_desc": form.short_desc,
-            "long_desc": form.long_desc,
-            "as_emp_id": as_emp_id,
-            "status": "active",  # Default status
-        }
-
-        response = supabase.from_("joblist").insert(job_data).execute()
+        response = await run_query(supabase.from_("joblist").insert(job_data))
 
         # ✅ Check if insertion returned data
         if not response.data:
             raise HTTPException(status_code=500, detail="Job insertion failed")
 
+        await job_cache.invalidate(employer_jobs_key(as_emp_id))
+        if not resolved:
+            await tasks.enqueue(GEOCODE_TASK, {"id": response.data[0]["id"], "location": form.location})
+        if coords:
+            job_index.add(response.data[0]["id"], *coords)
+        matching.add_job(response.data[0])
+        search_index.add(response.data[0])
+        await events.publish(JOB_CREATED, job_event(response.data[0]), owner=as_emp_id)
+
         return {"status": "success", "message": "Job saved successfully", "job": response.data}
     except Exception as e:
         logger.error(f"Error saving job: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")  
+
+
+@router.post("/listNewJobs")
+async def save_jobs(
+    forms: List[JobForm],
+    response: Response,
+    user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Posts many jobs with one auth check, one as_emp_id lookup and one multi-row insert.
+    Every item is validated first; invalid items are reported and skipped, the rest are
+    written together. Results are returned per item, in request order.
+    """
+    return await idempotency.run(("listNewJobs", user.get("id")), idempotency_key,
+                                 [form.model_dump() for form in forms], lambda: create_jobs(forms, user), response)
+
+
+async def create_jobs(forms: List[JobForm], user):
+    if not forms:
+        return {"status": "success", "created": 0, "results": []}
+    if len(forms) > MAX_JOBS_PER_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_JOBS_PER_BATCH} jobs per request")
+
+    as_emp_id = await fetch_as_emp_id(user.get("id"))
+    if not as_emp_id:
+        raise HTTPException(status_code=403, detail="Employer ID not found")
+
+    results = [None] * len(forms)
+    valid = []
+    for i, form in enumerate(forms):
+        errors = validate_job(form)
+        if errors:
+            results[i] = {"index": i, "status": "rejected", "errors": errors}
+        else:
+            valid.append(i)
+
+    try:
+        placed = [geocode_local(forms[i].location) for i in valid]
+        rows = [build_job_row(forms[i], as_emp_id, coords) for i, (_, coords) in zip(valid, placed)]
+        inserted = []
+        if rows:
+            response = await run_query(supabase.from_("joblist").insert(rows))
+            inserted = response.data or []
+            if len(inserted) != len(rows):
+                raise RuntimeError(f"inserted {len(inserted)} of {len(rows)} jobs")
+    except Exception as e:
+        logger.error(f"Error saving jobs in bulk: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    if inserted:
+        await job_cache.invalidate(employer_jobs_key(as_emp_id))
+    # PostgREST returns inserted rows in the order they were sent
+    for i, (resolved, coords), job in zip(valid, placed, inserted):
+        if not resolved:
+            await tasks.enqueue(GEOCODE_TASK, {"id": job["id"], "location": forms[i].location})
+        if coords:
+            job_index.add(job["id"], *coords)
+        matching.add_job(job)
+        search_index.add(job)
+        await events.publish(JOB_CREATED, job_event(job), owner=as_emp_id)
+        results[i] = {"index": i, "status": "created", "job": job}
+
+    return {"status": "success", "created": len(inserted), "results": results}
     
  
-@router.get("/get_job_category")
-async def get_job_category():
-    try:
-        job_category = supabase.from_("job_category").select("category").execute()
+TAXONOMY_CACHE_CONTROL = f"public, max-age={int(min(TAXONOMY_TTL, 300))}"
 
-        # Only check .error if attribute exists
-        if hasattr(job_category, "error") and job_category.error:
-            logger.error(f"Supabase error: {job_category.error}")
-            raise HTTPException(status_code=500, detail=str(job_category.error))
+def taxonomy_response(request: Request, snapshot, key, build, fieldset=None):
+    """
+    Serialized-once JSON body tagged with the snapshot's ETag (one per fieldset);
+    304 when the client already has it.
+    """
+    etag = f'W/"{snapshot.digest}.{"+".join(fieldset)}"' if fieldset else snapshot.etag
+    headers = {"ETag": etag, "Cache-Control": TAXONOMY_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(snapshot.render(key, build), media_type="application/json", headers=headers)
 
-        if not job_category.data:
-            raise HTTPException(status_code=404, detail="No job categories found")
 
-        return job_category.data  # returns list of {"category": "..."}
+@router.get("/get_job_category")
+async def get_job_category(request: Request):
+    try:
+        snapshot = await taxonomy.get()
     except Exception as e:
         logger.error(f"Error fetching job category: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+    if not snapshot.categories:
+        raise HTTPException(status_code=404, detail="No job categories found")
+
+    # returns list of {"category": "..."}
+    return taxonomy_response(request, snapshot, ("categories",),
+                             lambda: [{"category": c["category"]} for c in snapshot.categories])
     
     
 @router.get("/get_short_desc/{category_id}")
-async def get_short_desc(category_id: str):
+async def get_short_desc(category_id: str, request: Request):
     try:
         if not category_id or category_id.strip() == "":
             return []
 
-        job_details = (
-            supabase.from_("job_details")
-            .select("short_desc")
-            .eq("category_id", category_id)
-            .execute()
-        )
-
-        if not job_details.data:
-            return []
-
-        return job_details.data
+        snapshot = await taxonomy.get()
+        short_descs = snapshot.short_descs_by_category.get(category_id.strip(), [])
+        return taxonomy_response(request, snapshot, ("short_descs", category_id.strip()),
+                                 lambda: [{"short_desc": sd} for sd in short_descs])
     except Exception as e:
         logger.error(f"Error fetching short descriptions: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
     
-    
+
+CATEGORY_TREE_FIELDS = ("id", "category", "short_descs")
+
 @router.get("/get_categories_with_short_descs")
-async def get_categories_with_short_descs():
+async def get_categories_with_short_descs(request: Request, fields: Optional[str] = None):
     """
     Returns a list of categories with their associated short descriptions.
     Example return:
@@ -107,46 +256,13 @@ async def get_categories_with_short_descs():
       { "id": 1, "category": "Household & Care Services", "short_descs": ["Nanny", "Babysitter"] },
       ...
     ]
+    ?fields=id,category drops the rest of each entry.
     """
+    fieldset = parse_fields(fields, CATEGORY_TREE_FIELDS)
     try:
-        # 1) fetch categories
-        cat_res = supabase.from_("job_category").select("id,category").execute()
-        if hasattr(cat_res, "error") and cat_res.error:
-            logger.error(f"Supabase error (categories): {cat_res.error}")
-            raise HTTPException(status_code=500, detail="Error fetching categories")
-
-        categories = cat_res.data or []
-        if not categories:
-            return []
-
-        # 2) fetch job_details (short_descs) for all categories
-        jd_res = supabase.from_("job_details").select("category_id,short_desc").execute()
-        if hasattr(jd_res, "error") and jd_res.error:
-            logger.error(f"Supabase error (job_details): {jd_res.error}")
-            raise HTTPException(status_code=500, detail="Error fetching job details")
-
-        job_details = jd_res.data or []
-
-        # 3) aggregate short_descs by category_id
-        mapping: dict = {}
-        for jd in job_details:
-            cid = jd.get("category_id")
-            sd = jd.get("short_desc")
-            if cid is None or sd is None:
-                continue
-            mapping.setdefault(cid, []).append(sd)
-
-        # 4) build final payload
-        result = []
-        for c in categories:
-            result.append({
-                "id": c.get("id"),
-                "category": c.get("category"),
-                "short_descs": mapping.get(c.get("id"), [])
-            })
-
-        return result
-
+        snapshot = await taxonomy.get()
+        return taxonomy_response(request, snapshot, ("categories_with_short_descs", fieldset),
+                                 lambda: project(snapshot.categories_with_short_descs, fieldset), fieldset)
     except Exception as e:
         logger.error(f"Error in get_categories_with_short_descs: {str(e)}")
         # don't leak internals to client, but log details server-side
@@ -154,7 +270,7 @@ async def get_categories_with_short_descs():
 
 
 @router.get("/get_long_desc")
-async def get_long_desc(short_desc: str = ""):
+async def get_long_desc(request: Request, short_desc: str = ""):
     """
     Returns {"long_desc": "<text>"} for the given short_desc.
     If short_desc is empty or not found, returns {"long_desc": ""}.
@@ -164,50 +280,84 @@ async def get_long_desc(short_desc: str = ""):
         if not short_desc or short_desc.strip() == "":
             return {"long_desc": ""}
 
-        # try to get single result first
-        res = (
-            supabase
-            .from_("job_details")
-            .select("long_desc")
-            .eq("short_desc", short_desc)
-            .maybe_single()
-            .execute()
-        )
+        snapshot = await taxonomy.get()
+        long_desc = snapshot.long_desc_by_short_desc.get(short_desc, "")
+        return taxonomy_response(request, snapshot, ("long_desc", short_desc), lambda: {"long_desc": long_desc})
+    except Exception as e:
+        logger.error(f"Error fetching long description: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-        # safe error check (different supabase-py versions)
-        if hasattr(res, "error") and res.error:
-            logger.error(f"Supabase error (get_long_desc): {res.error}")
-            raise HTTPException(status_code=500, detail="Error fetching long description")
 
-        data = res.data
 
-        # handle different shapes returned by supabase client
-        if isinstance(data, dict) and "long_desc" in data:
-            return {"long_desc": data.get("long_desc") or ""}
+    
+JOB_STATUSES = ("active", "closed", "filled", "expired")
 
-        # fallback: if data is a list or maybe_single didn't work, try a normal select
-        list_res = supabase.from_("job_details").select("long_desc").eq("short_desc", short_desc).execute()
-        if hasattr(list_res, "error") and list_res.error:
-            logger.error(f"Supabase error (get_long_desc fallback): {list_res.error}")
-            raise HTTPException(status_code=500, detail="Error fetching long description")
+class JobStatusUpdate(BaseModel):
+    status: str
 
-        if list_res.data and isinstance(list_res.data, list) and len(list_res.data) > 0:
-            return {"long_desc": list_res.data[0].get("long_desc", "")}
+@router.post("/{job_id}/status")
+async def update_job_status(job_id: str, data: JobStatusUpdate, user=Depends(get_current_user)):
+    if data.status not in JOB_STATUSES:
+        raise HTTPException(status_code=422, detail=f"status must be one of {', '.join(JOB_STATUSES)}")
 
-        # not found
-        return {"long_desc": ""}
+    as_emp_id = await fetch_as_emp_id(user.get("id"))
+    if not as_emp_id:
+        raise HTTPException(status_code=403, detail="Access denied")
 
-    except HTTPException:
-        # re-raise known HTTP exceptions
-        raise
+    try:
+        response = await run_query(
+            supabase.from_("joblist")
+            .update({"status": data.status})
+            .eq("id", job_id)
+            .eq("as_emp_id", as_emp_id)
+        )
     except Exception as e:
-        logger.error(f"Error fetching long description: {str(e)}")
+        logger.error(f"Error updating job status: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Job not found")
 
+    job = response.data[0]
+    await apply_job_statuses([job])
+
+    return {"status": "updated", "job": job}
+
+
+@router.get("/search")
+async def search_jobs(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=1000),
+    prefix: bool = True,
+    user=Depends(get_current_user),
+):
+    """Keyword search over active jobs' short_desc, long_desc and category, best match first."""
+    try:
+        await search_index.ensure_loaded()
+        jobs, has_more = search_index.search(q, limit=limit, offset=offset, prefix=prefix)
+    except Exception as e:
+        logger.error(f"Error searching jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    return {"jobs": jobs, "next_offset": offset + len(jobs) if has_more else None}
+
+
+@router.get("/search/suggest")
+async def suggest_search_terms(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    user=Depends(get_current_user),
+):
+    """Typeahead completions for the word being typed."""
+    try:
+        await search_index.ensure_loaded()
+        return {"suggestions": search_index.suggest(q, limit=limit)}
+    except Exception as e:
+        logger.error(f"Error suggesting search terms: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
 
-    
 @router.get("/{job_id}")
 async def get_job_by_id(job_id: str, user=Depends(get_current_user)):
     try:
@@ -221,19 +371,16 @@ async def get_job_by_id(job_id: str, user=Depends(get_current_user)):
         if not as_emp_id:
             raise HTTPException(status_code=403, detail="Access denied")
 
-        job_result = (
-            supabase.from_("joblist")
-            .select("*")
-            .eq("id", job_id)
-            .eq("as_emp_id", as_emp_id)
-            .maybe_single()
-            .execute()
-        )
+        async def load():
+            job_result = await run_query(supabase.from_("joblist").select("*").eq("id", job_id).maybe_single())
+            return job_result.data if job_result else None
 
-        if not job_result.data:
+        # cached by job alone, so ownership is checked on every read
+        job = await job_cache.get_or_load(job_key(job_id), load)
+        if not job or job.get("as_emp_id") != as_emp_id:
             raise HTTPException(status_code=404, detail="Job not found")
 
-        return {"job": job_result.data}
+        return {"job": job}
 
     except HTTPException:
         # Re-raise HTTP exceptions (like 403, 404)
@@ -1,16 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from loguru import logger
 from utils.auth import get_current_user
 from utils.supabase_client import supabase
+from utils.db import BackendOverloaded, run_query, embedded_one
+from utils.cache import TTLCache
+from utils.pagination import MAX_PAGE_SIZE, keyset_after, order_keyset, split_page
+from utils.geo import geocode, geocode_local, geocoder_limit, job_index, parttimer_index, load_job_index
+from utils.events import events, APPLICATION_CREATED
+from utils.matching import matching
+from utils.responses import json_response, parse_fields, select_columns, project
+from utils.idempotency import idempotency
+from utils.tasks import tasks
+from postgrest.exceptions import APIError
 from pydantic import BaseModel
+from typing import List, Optional
+import os
 
 router = APIRouter(prefix="/api/parttimer", tags=["Part-Timer"])
 
+# as_prtmr_id never changes for a user, so resolve it once per process
+as_prtmr_id_cache = TTLCache(
+    maxsize=int(os.getenv("IDENTITY_CACHE_SIZE", "50000")),
+    ttl=float(os.getenv("IDENTITY_CACHE_TTL", "600")),
+)
+
 async def fetch_as_prtmr_id(user_id):
+    cached = as_prtmr_id_cache.get(user_id)
+    if cached:
+        return cached
     try:
-        result = supabase.from_("as_parttimer").select("as_prtmr_id").eq("id", user_id).maybe_single().execute()
-        if result.data and "as_prtmr_id" in result.data:
+        result = await run_query(supabase.from_("as_parttimer").select("as_prtmr_id").eq("id", user_id).maybe_single())
+        if result and result.data and result.data.get("as_prtmr_id"):
+            as_prtmr_id_cache.set(user_id, result.data["as_prtmr_id"])
             return result.data["as_prtmr_id"]
+    except BackendOverloaded:
+        raise  # a shed lookup is not a missing row
     except Exception as e:
         logger.warning(f"fetch_as_prtmr_id failed: {str(e)}")
     return ""
@@ -25,43 +49,84 @@ async def get_as_prtmr_id(user=Depends(get_current_user)):
         return {"as_prtmr_id": as_prtmr_id}
     raise HTTPException(status_code=404, detail="Part-Timer ID not found")
 
-async def fetch_emp_location(user_id):
+PARTTIMER_COLUMNS = "as_prtmr_id, location, lat, lng"
+
+async def fetch_parttimer_row(user_id):
+    """Returns the caller's whole as_parttimer row in one query, or {} if there is none."""
     try:
-        result = supabase.from_("as_parttimer").select("location").eq("id", user_id).maybe_single().execute()
-        if result.data and "location" in result.data:
-            return result.data["location"]
+        result = await run_query(supabase.from_("as_parttimer").select(PARTTIMER_COLUMNS).eq("id", user_id).maybe_single())
+        if result and result.data:
+            if result.data.get("as_prtmr_id"):
+                as_prtmr_id_cache.set(user_id, result.data["as_prtmr_id"])
+            return result.data
+    except BackendOverloaded:
+        raise  # a shed lookup is not a missing row
     except Exception as e:
-        logger.warning(f"fetch_location failed: {str(e)}")
-    return ""
+        logger.warning(f"fetch_parttimer_row failed: {str(e)}")
+    return {}
+
+async def load_parttimer_profile(user_id):
+    """Returns the users row joined with its as_parttimer row in a single round trip."""
+    result = await run_query(
+        supabase.from_("users")
+        .select(f"name, picture_url, email, as_parttimer({PARTTIMER_COLUMNS})")
+        .eq("id", user_id)
+        .maybe_single()
+    )
+    if not result or not result.data:
+        return None
+    profile = dict(result.data)
+    parttimer = embedded_one(profile.pop("as_parttimer", None))
+    return {**profile, "as_prtmr_id": parttimer.get("as_prtmr_id"), "location": parttimer.get("location")}
 
 @router.get("/profile")
 async def parttimer_profile(user=Depends(get_current_user)):
-    user_id = user.get("id")
-    result = supabase.from_("users").select("name, email, picture_url").eq("id", user_id).maybe_single().execute()
-    name = result.data.get("name") if result.data else None
-    email = result.data.get("email") if result.data else None
-    picture_url = result.data.get("picture_url") if result.data else None
-    as_prtmr_id = await fetch_as_prtmr_id(user_id)
-    location = await fetch_emp_location(user_id)
-    if name:
-        return {"name": name, "picture_url": picture_url, "email":email, "as_prtmr_id": as_prtmr_id, "location": location}
+    profile = await load_parttimer_profile(user.get("id"))
+    if profile and profile.get("name"):
+        return profile
     raise HTTPException(status_code=404, detail="User not found")
 
 @router.post("/check_or_create_parttimer")
 async def check_or_create_parttimer(user=Depends(get_current_user)):
     user_id = user.get("id")
+    as_prtmr_id_cache.pop(user_id)
     as_prtmr_id = await fetch_as_prtmr_id(user_id)
     if as_prtmr_id:
         return {"status": "exists", "as_prtmr_id": as_prtmr_id}
-    response = supabase.from_("as_parttimer").insert({"id": user_id}).execute()
-    if response.error:
+    # ON CONFLICT (id) DO NOTHING: of two racing first calls only one inserts,
+    # the other gets no row back and reads the winner's
+    response = await run_query(
+        supabase.from_("as_parttimer").upsert({"id": user_id}, on_conflict="id", ignore_duplicates=True)
+    )
+    if not response.data:
+        as_prtmr_id = await fetch_as_prtmr_id(user_id)
+        if as_prtmr_id:
+            return {"status": "exists", "as_prtmr_id": as_prtmr_id}
         raise HTTPException(status_code=500, detail="Failed to create part-timer account")
+    as_prtmr_id_cache.set(user_id, response.data[0]["as_prtmr_id"])
     return {"status": "created", "as_prtmr_id": response.data[0]["as_prtmr_id"]}
 
 
 class LocationUpdateRequest(BaseModel):
     location: str
 
+GEOCODE_TASK = "parttimer.geocode"
+
+async def geocode_parttimer(payload):
+    """Task: place a part-timer whose location the remote geocoder had to look up."""
+    coords = await geocode(payload["location"], strict=True)
+    if not coords:
+        return
+    # a later location_update wins over this one
+    response = await run_query(
+        supabase.from_("as_parttimer").update({"lat": coords[0], "lng": coords[1]})
+        .eq("id", payload["id"]).eq("location", payload["location"])
+    )
+    if response.data:
+        parttimer_index.add(payload["id"], *coords)
+
+tasks.register(GEOCODE_TASK, geocode_parttimer, concurrency=geocoder_limit)
+
 @router.post("/location_update")
 async def location_update(
     data: LocationUpdateRequest,
@@ -69,33 +134,184 @@ async def location_update(
 ):
     user_id = user.get("id")
     location = data.location
+    # places the geocoder has to look up are filled in by GEOCODE_TASK after the update
+    resolved, coords = geocode_local(location)
+    lat, lng = coords if coords else (None, None)
 
-    response = supabase.from_("as_parttimer").update({"location": location}).eq("id", user_id).execute()
+    response = await run_query(
+        supabase.from_("as_parttimer").update({"location": location, "lat": lat, "lng": lng}).eq("id", user_id)
+    )
 
-    if response.error:
+    if not response.data:
         raise HTTPException(status_code=500, detail="Failed to update parttimer location")
 
-    return {"status": "updated", "location": location}
+    if coords:
+        parttimer_index.add(user_id, lat, lng)
+    else:
+        parttimer_index.remove(user_id)
+    if not resolved:
+        await tasks.enqueue(GEOCODE_TASK, {"id": user_id, "location": location})
+    matching.update_parttimer(user_id, location, response.data[0].get("available", True) is not False)
+
+    return {"status": "updated", "location": location, "lat": lat, "lng": lng}
+
+
+class AvailabilityUpdateRequest(BaseModel):
+    available: bool
+
+@router.post("/availability_update")
+async def availability_update(data: AvailabilityUpdateRequest, user=Depends(get_current_user)):
+    """Whether employers see this part-timer in /api/employer/available-parttimers and matches."""
+    user_id = user.get("id")
+    response = await run_query(
+        supabase.from_("as_parttimer").update({"available": data.available}).eq("id", user_id)
+    )
+
+    if not response.data:
+        raise HTTPException(status_code=500, detail="Failed to update availability")
+    matching.update_parttimer(user_id, response.data[0].get("location"), data.available)
 
+    return {"status": "updated", "available": data.available}
+
+
+JOB_FEED_DEFAULT_COLUMNS = ("id", "category", "short_desc", "location", "created_at", "status")
+# what ?fields= may ask for
+JOB_FEED_COLUMNS = JOB_FEED_DEFAULT_COLUMNS + ("salary", "salary_condition", "duration_from", "duration_upto",
+                                              "start_of_shift", "end_of_shift", "lat", "lng")
 
 @router.get("/job")
-async def get_parttimer_jobs(user=Depends(get_current_user)):
+async def get_parttimer_jobs(
+    user=Depends(get_current_user),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    location: Optional[str] = None,
+    status: str = "active",
+    fields: Optional[str] = None,
+):
+    """
+    Newest-first job feed, paged by keyset on (created_at, id).
+    Pass the returned next_cursor back as ?cursor= to fetch the following page.
+    ?fields=id,short_desc limits the columns fetched and returned.
+    """
+    fieldset = parse_fields(fields, JOB_FEED_COLUMNS)
+    # the cursor is built from created_at and id, so those are always fetched
+    columns = select_columns(fieldset, JOB_FEED_DEFAULT_COLUMNS, required=("created_at", "id"))
+    query = supabase.from_("joblist").select(columns).eq("status", status)
+    if category:
+        query = query.eq("category", category)
+    if location:
+        query = query.eq("location", location)
+    if cursor:
+        query = keyset_after(query, cursor)
+    query = order_keyset(query).limit(limit + 1)
     try:
-        jobs_result = supabase.from_("joblist").select("id, category, short_desc, created_at, status").execute()
-        return {"jobs": jobs_result.data}
+        jobs_result = await run_query(query)
+        jobs, next_cursor = split_page(jobs_result.data, limit)
+        return json_response({"jobs": project(jobs, fieldset), "next_cursor": next_cursor})
     except Exception as e:
         logger.error(f"Error fetching employer jobs: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+
+@router.get("/job/nearby")
+async def get_nearby_jobs(
+    user=Depends(get_current_user),
+    radius_km: float = Query(10, gt=0, le=200),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+):
+    """Active jobs within radius_km of lat/lng (default: the caller's saved location), nearest first."""
+    if lat is None or lng is None:
+        parttimer = await fetch_parttimer_row(user.get("id"))
+        lat, lng = parttimer.get("lat"), parttimer.get("lng")
+        if lat is None or lng is None:
+            raise HTTPException(status_code=400, detail="Location not set; pass lat and lng")
+
+    try:
+        await job_index.ensure_loaded(load_job_index)
+        hits = job_index.within(lat, lng, radius_km, limit)
+        if not hits:
+            return {"jobs": []}
+
+        jobs_result = await run_query(
+            supabase.from_("joblist")
+            .select("id, category, short_desc, location, created_at, status")
+            .in_("id", [job_id for _, job_id in hits])
+            .eq("status", "active")
+        )
+        by_id = {job["id"]: job for job in jobs_result.data or []}
+        return {"jobs": [{**by_id[job_id], "distance_km": round(d, 2)} for d, job_id in hits if job_id in by_id]}
+    except Exception as e:
+        logger.error(f"Error fetching nearby jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
     
     
-    
+@router.get("/job/recommended")
+async def get_recommended_jobs(
+    user=Depends(get_current_user),
+    k: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    category: Optional[List[str]] = Query(None),
+    min_salary: Optional[float] = None,
+):
+    """Top-k active jobs in the caller's location, best paid first, served from the matching indexes."""
+    parttimer = await fetch_parttimer_row(user.get("id"))
+    if not parttimer.get("location"):
+        raise HTTPException(status_code=400, detail="Location not set")
+    try:
+        await matching.ensure_loaded()
+        return {"jobs": matching.recommend_jobs(parttimer["location"], k, category, min_salary)}
+    except Exception as e:
+        logger.error(f"Error recommending jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+FOREIGN_KEY_VIOLATION = "23503"
+
+APPLICATION_EVENT_FIELDS = ("id", "jobid", "prtmr_id", "status", "amount", "bid_amount", "created_at")
+
+def application_event(application):
+    return {field: application.get(field) for field in APPLICATION_EVENT_FIELDS}
+
 class JobApplicationRequest(BaseModel):
     amount: float
     bid_amount: float | None = None
     bid_reason: str | None = None
 
+APPLICATION_CONFLICT = "jobid,prtmr_id"  # unique constraint, see sql/006_write_path_dedup.sql
+
+def application_row(jobid, as_prtmr_id, data: JobApplicationRequest):
+    return {
+        "jobid": jobid,
+        "prtmr_id": as_prtmr_id,
+        "status": "applied",
+        "amount": data.amount,
+        "bid_amount": data.bid_amount,
+        "bid_reason": data.bid_reason,
+    }
+
+async def fetch_applications(as_prtmr_id, jobids):
+    """The caller's existing applications to the given jobs, by jobid."""
+    result = await run_query(
+        supabase.from_("job_applications").select("*").eq("prtmr_id", as_prtmr_id).in_("jobid", list(jobids))
+    )
+    return {str(application["jobid"]): application for application in result.data or []}
+
 @router.post("/apply_job/{jobid}")
-async def apply_job(jobid: str, data: JobApplicationRequest, user=Depends(get_current_user)):
+async def apply_job(
+    jobid: str,
+    data: JobApplicationRequest,
+    response: Response,
+    user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Applies once per job: ON CONFLICT (jobid, prtmr_id) DO NOTHING makes a
+    repeated or concurrent submission return the existing application instead
+    of adding a row. An Idempotency-Key replays the first response outright.
+    """
     user_id = user.get("id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -104,29 +320,120 @@ async def apply_job(jobid: str, data: JobApplicationRequest, user=Depends(get_cu
     if not as_prtmr_id:
         raise HTTPException(status_code=404, detail="Part-Timer ID not found")
 
-    try:
-        insert_data = {
-            "jobid": jobid,
-            "prtmr_id": as_prtmr_id,
-            "status": "applied",
-            "amount": data.amount,
-            "bid_amount": data.bid_amount,
-            "bid_reason": data.bid_reason
-        }
-
-        response = supabase.from_("job_applications").insert(insert_data).execute()
-
-        # Safely check for error in the returned object
-        res_dict = response.model_dump()
-        if res_dict.get("error"):
-            logger.error(f"Error inserting application: {res_dict['error']}")
-            # Instead of failing, we can still return success if insert went through
-            return {"message": "Application submitted, but with warnings.", "details": res_dict.get("error")}
-
-        return {"message": "Application submitted successfully", "application": res_dict.get("data", [{}])[0]}
+    async def apply():
+        try:
+            result = await run_query(
+                supabase.from_("job_applications")
+                .upsert(application_row(jobid, as_prtmr_id, data), on_conflict=APPLICATION_CONFLICT, ignore_duplicates=True)
+            )
+            if not result.data:
+                existing = (await fetch_applications(as_prtmr_id, [jobid])).get(jobid)
+                if existing is None:
+                    raise RuntimeError("insert ignored but no existing application found")
+                return {"message": "Application already submitted", "application": existing}
+        except APIError as e:
+            if e.code == FOREIGN_KEY_VIOLATION:
+                raise HTTPException(status_code=404, detail="Job not found")
+            logger.error(f"Error in apply_job: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+        except Exception as e:
+            logger.error(f"Error in apply_job: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
 
-    except Exception as e:
-        logger.error(f"Error in apply_job: {str(e)}")
-        # Suppress the crash and send a safe response
-        return {"message": "Application attempt made, but an internal error occurred", "error": str(e)}
+        application = result.data[0]
+        matching.record_application(user_id, job_id=jobid)
+        await events.publish(APPLICATION_CREATED, application_event(application))
+        return {"message": "Application submitted successfully", "application": application}
+
+    return await idempotency.run(("apply_job", user_id), idempotency_key, {"jobid": jobid, **data.model_dump()},
+                                 apply, response)
+
+
+
+MAX_APPLICATIONS_PER_BATCH = 100
+
+class BatchJobApplication(JobApplicationRequest):
+    jobid: str
+
+@router.post("/apply_jobs")
+async def apply_jobs(
+    items: List[BatchJobApplication],
+    response: Response,
+    user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    Applies to many jobs with one as_prtmr_id lookup, one query checking every
+    target job and one multi-row insert. Duplicate jobids and jobs that are
+    missing or no longer active are rejected; jobs already applied to come back
+    as already_applied with the existing application. Results follow request order.
+    """
+    if not items:
+        return {"status": "success", "applied": 0, "results": []}
+    if len(items) > MAX_APPLICATIONS_PER_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_APPLICATIONS_PER_BATCH} applications per request")
+
+    user_id = user.get("id")
+    as_prtmr_id = await fetch_as_prtmr_id(user_id)
+    if not as_prtmr_id:
+        raise HTTPException(status_code=404, detail="Part-Timer ID not found")
+
+    async def apply():
+        try:
+            jobs_result = await run_query(
+                supabase.from_("joblist")
+                .select("id, category, status")
+                .in_("id", list({item.jobid for item in items}))
+            )
+        except Exception as e:
+            logger.error(f"Error checking jobs for batch apply: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+        jobs = {str(job["id"]): job for job in jobs_result.data or []}
+
+        results = [None] * len(items)
+        valid, seen = [], set()
+        for i, item in enumerate(items):
+            job = jobs.get(item.jobid)
+            if item.jobid in seen:
+                results[i] = {"index": i, "status": "rejected", "errors": ["duplicate jobid in batch"]}
+            elif job is None:
+                results[i] = {"index": i, "status": "rejected", "errors": ["job not found"]}
+            elif job.get("status", "active") != "active":
+                results[i] = {"index": i, "status": "rejected", "errors": [f"job is {job['status']}"]}
+            else:
+                valid.append(i)
+            seen.add(item.jobid)
+
+        rows = [application_row(items[i].jobid, as_prtmr_id, items[i]) for i in valid]
+        try:
+            inserted, existing = {}, {}
+            if rows:
+                result = await run_query(
+                    supabase.from_("job_applications")
+                    .upsert(rows, on_conflict=APPLICATION_CONFLICT, ignore_duplicates=True)
+                )
+                inserted = {str(application["jobid"]): application for application in result.data or []}
+                # rows skipped by ON CONFLICT DO NOTHING are applications made earlier
+                skipped = [row["jobid"] for row in rows if row["jobid"] not in inserted]
+                if skipped:
+                    existing = await fetch_applications(as_prtmr_id, skipped)
+                    if len(existing) != len(skipped):
+                        raise RuntimeError(f"inserted {len(inserted)} of {len(rows)} applications")
+        except Exception as e:
+            logger.error(f"Error applying to jobs in bulk: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+        for i in valid:
+            jobid = items[i].jobid
+            if jobid in existing:
+                results[i] = {"index": i, "status": "already_applied", "application": existing[jobid]}
+                continue
+            application = inserted[jobid]
+            matching.record_application(user_id, job_id=jobid, category=jobs[jobid].get("category"))
+            await events.publish(APPLICATION_CREATED, application_event(application))
+            results[i] = {"index": i, "status": "applied", "application": application}
+
+        return {"status": "success", "applied": len(inserted), "results": results}
 
+    return await idempotency.run(("apply_jobs", user_id), idempotency_key, [item.model_dump() for item in items],
+                                 apply, response)
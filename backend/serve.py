@@ -0,0 +1,95 @@
+"""
+Production entry point: uvicorn with one worker process per core, each running
+the lifespan hook in main.py (shared clients, cache warmup) before it accepts
+requests.
+
+    cd backend && python serve.py
+
+On SIGTERM a worker fails /readyz and keeps serving for DRAIN_SECONDS so the
+load balancer stops sending it traffic, then stops accepting connections and
+gives in-flight requests up to GRACEFUL_TIMEOUT to finish. A second signal
+skips the drain.
+"""
+import os
+import threading
+
+import uvicorn
+from dotenv import load_dotenv
+from loguru import logger
+from uvicorn.supervisors import Multiprocess
+
+load_dotenv()
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+DRAIN_SECONDS = float(os.getenv("DRAIN_SECONDS", "5"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", "5"))
+# addresses allowed to set X-Forwarded-For/-Proto, e.g. the load balancer's
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+
+# state that each worker otherwise keeps to itself
+PROCESS_LOCAL = {
+    "RATE_LIMIT_STORE": ("memory", "rate limits apply per worker, not per user"),
+    "JOB_CACHE_URL": ("", "a job changed through one worker can stay stale in another for up to JOB_CACHE_TTL"),
+    "EVENTS_REDIS_URL": ("", "event streams only see events published by their own worker, and job search, "
+                             "recommendations and nearby results see jobs posted or closed through other workers "
+                             "only after INDEX_RELOAD_INTERVAL"),
+    "IDEMPOTENCY_URL": ("", "a retried write that reaches another worker runs again, e.g. posts a second job"),
+    "STREAM_TICKET_URL": ("", "an event stream ticket can be used once per worker instead of once"),
+}
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn.Server that drains before honouring the first shutdown signal."""
+
+    def handle_exit(self, sig, frame):
+        from utils.lifecycle import lifecycle
+
+        if DRAIN_SECONDS <= 0 or lifecycle.draining or self.should_exit:
+            return super().handle_exit(sig, frame)
+        lifecycle.begin_drain()
+        timer = threading.Timer(DRAIN_SECONDS, super().handle_exit, (sig, frame))
+        timer.daemon = True
+        timer.start()
+
+
+def warn_process_local_state(workers):
+    if workers < 2:
+        return
+    for name, (default, consequence) in PROCESS_LOCAL.items():
+        if os.getenv(name, default) == default:
+            logger.warning(f"{workers} workers without {name}: {consequence}")
+    if float(os.getenv("INDEX_RELOAD_INTERVAL", "300")) <= 0:
+        logger.warning(f"{workers} workers with INDEX_RELOAD_INTERVAL=0: the search, geo and matching indexes "
+                       "never see part-timer changes made through other workers")
+
+
+def main():
+    from utils.lifecycle import check_config
+
+    check_config()  # fail once here rather than in every worker as it is restarted
+    config = uvicorn.Config(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        lifespan="on",
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        timeout_keep_alive=KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        log_level=LOG_LEVEL,
+    )
+    server = DrainingServer(config)
+    warn_process_local_state(config.workers)
+    if config.workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
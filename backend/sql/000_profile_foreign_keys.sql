@@ -0,0 +1,15 @@
+-- Foreign keys PostgREST needs to embed as_employer(...) and as_parttimer(...)
+-- into users rows, so GET /api/employer/profile and GET /api/parttimer/profile
+-- load the user and its role row in a single round trip.
+
+do $$
+begin
+    if not exists (select 1 from pg_constraint where conname = 'as_employer_id_fkey') then
+        alter table public.as_employer
+            add constraint as_employer_id_fkey foreign key (id) references public.users (id);
+    end if;
+    if not exists (select 1 from pg_constraint where conname = 'as_parttimer_id_fkey') then
+        alter table public.as_parttimer
+            add constraint as_parttimer_id_fkey foreign key (id) references public.users (id);
+    end if;
+end $$;
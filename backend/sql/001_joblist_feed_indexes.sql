@@ -0,0 +1,16 @@
+-- Keyset pagination for GET /api/parttimer/job.
+-- The feed always filters on status and orders by (created_at desc, id desc),
+-- so these partial indexes let each page be an index range scan regardless
+-- of how many rows joblist holds.
+
+create index concurrently if not exists joblist_active_feed_idx
+    on public.joblist (created_at desc, id desc)
+    where status = 'active';
+
+create index concurrently if not exists joblist_active_category_feed_idx
+    on public.joblist (category, created_at desc, id desc)
+    where status = 'active';
+
+create index concurrently if not exists joblist_active_location_feed_idx
+    on public.joblist (location, created_at desc, id desc)
+    where status = 'active';
@@ -0,0 +1,16 @@
+-- Coordinates resolved from the free-text location at write time
+-- (location_update, listNewJob). Radius and nearest-neighbour queries are
+-- served from the in-process grid index in utils/geo.py; these indexes keep
+-- its startup load and the bounding-box fallback cheap.
+
+alter table public.as_employer  add column if not exists lat double precision, add column if not exists lng double precision;
+alter table public.as_parttimer add column if not exists lat double precision, add column if not exists lng double precision;
+alter table public.joblist      add column if not exists lat double precision, add column if not exists lng double precision;
+
+create index concurrently if not exists as_parttimer_lat_lng_idx
+    on public.as_parttimer (lat, lng)
+    where lat is not null;
+
+create index concurrently if not exists joblist_active_lat_lng_idx
+    on public.joblist (lat, lng)
+    where status = 'active' and lat is not null;
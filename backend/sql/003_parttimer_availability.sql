@@ -0,0 +1,9 @@
+-- Availability flag for GET /api/employer/available-parttimers. The listing
+-- embeds users(...) into as_parttimer rows through as_parttimer_id_fkey
+-- (000_profile_foreign_keys.sql), so it is a single joined query.
+
+alter table public.as_parttimer add column if not exists available boolean not null default true;
+
+create index concurrently if not exists as_parttimer_available_id_idx
+    on public.as_parttimer (id)
+    where available;
@@ -0,0 +1,9 @@
+-- POST /api/auth/google upserts users with on_conflict=google_id, which
+-- needs a unique constraint to arbitrate on. Any duplicate rows left by the
+-- old select-then-insert login path must be merged before this runs.
+
+create unique index concurrently if not exists users_google_id_key
+    on public.users (google_id);
+
+alter table public.users
+    add constraint users_google_id_unique unique using index users_google_id_key;
@@ -0,0 +1,45 @@
+-- GET /api/employer/applications reads one row per job with its applicant
+-- aggregates, and embeds the newest applicants through job_applications.jobid.
+-- PostgREST applies the embedded limit per job, so the whole inbox page is a
+-- single query.
+
+create index concurrently if not exists job_applications_jobid_recent_idx
+    on public.job_applications (jobid, created_at desc, id desc);
+
+create index concurrently if not exists joblist_emp_recent_idx
+    on public.joblist (as_emp_id, created_at desc, id desc);
+
+create or replace view public.employer_job_inbox
+with (security_invoker = true) as
+select
+    j.id,
+    j.as_emp_id,
+    j.category,
+    j.short_desc,
+    j.location,
+    j.created_at,
+    j.status,
+    coalesce(a.applicant_count, 0) as applicant_count,
+    a.best_bid,
+    a.last_applied_at
+from public.joblist j
+left join lateral (
+    select
+        count(*) as applicant_count,
+        min(coalesce(ja.bid_amount, ja.amount)) as best_bid,
+        max(ja.created_at) as last_applied_at
+    from public.job_applications ja
+    where ja.jobid = j.id
+) a on true;
+
+do $$
+begin
+    if not exists (select 1 from pg_constraint where conname = 'job_applications_jobid_fkey') then
+        alter table public.job_applications
+            add constraint job_applications_jobid_fkey foreign key (jobid) references public.joblist (id);
+    end if;
+    if not exists (select 1 from pg_constraint where conname = 'job_applications_prtmr_id_fkey') then
+        alter table public.job_applications
+            add constraint job_applications_prtmr_id_fkey foreign key (prtmr_id) references public.as_parttimer (as_prtmr_id);
+    end if;
+end $$;
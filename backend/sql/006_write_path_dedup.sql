@@ -0,0 +1,24 @@
+-- The write paths now insert with ON CONFLICT DO NOTHING instead of
+-- read-then-insert, so each one needs a unique index to arbitrate on:
+--   POST /api/parttimer/apply_job/{jobid}, /apply_jobs  on_conflict=jobid,prtmr_id
+--   POST /api/employer/check_or_create_employer         on_conflict=id
+--   POST /api/parttimer/check_or_create_parttimer       on_conflict=id
+-- Duplicate as_employer/as_parttimer rows left by the old path are referenced
+-- by jobs and applications through their generated ids, so they must be merged
+-- by hand before this runs. Duplicate applications carry nothing beyond the
+-- first one and are dropped here, keeping the earliest.
+
+delete from public.job_applications ja
+using public.job_applications earlier
+where ja.jobid = earlier.jobid
+  and ja.prtmr_id = earlier.prtmr_id
+  and (earlier.created_at, earlier.id) < (ja.created_at, ja.id);
+
+create unique index concurrently if not exists job_applications_jobid_prtmr_id_key
+    on public.job_applications (jobid, prtmr_id);
+
+create unique index concurrently if not exists as_employer_id_key
+    on public.as_employer (id);
+
+create unique index concurrently if not exists as_parttimer_id_key
+    on public.as_parttimer (id);
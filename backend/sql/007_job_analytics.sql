@@ -0,0 +1,173 @@
+-- GET /api/analytics/jobs serves salary percentiles, shift-length distributions
+-- and bid statistics from these materialized views instead of exporting
+-- joblist. Each view groups per (category, location) and also rolls up per
+-- category, with location '*'. Salaries are only comparable within one
+-- salary_condition, so it is always part of the salary key. A missing location
+-- is grouped as '' before aggregating: NULL and '' rows would otherwise form
+-- two groups with the same key and break the unique indexes that REFRESH ...
+-- CONCURRENTLY needs.
+--
+-- Shift times and dates are free text as the API wrote them. They are read
+-- through try_time()/try_date(), which give NULL for anything that does not
+-- parse ('25:99', '2024-02-30'): a failing cast would abort the CREATE and every
+-- REFRESH after it. Rows without a usable shift are left out of job_shift_stats.
+--
+-- refresh_job_analytics() recomputes all three with REFRESH ... CONCURRENTLY,
+-- so readers are never blocked. Where pg_cron is installed it runs every
+-- 15 minutes; otherwise call it from any scheduler (select public.refresh_job_analytics()).
+
+create or replace function public.try_time(value text)
+returns time
+language plpgsql
+stable
+as $$
+begin
+    if value !~ '^\d{1,2}:\d{2}' then
+        return null;
+    end if;
+    return value::time;
+exception when others then
+    return null;
+end;
+$$;
+
+-- YYYY-MM-DD only, so the result does not depend on DateStyle
+create or replace function public.try_date(value text)
+returns date
+language plpgsql
+stable
+as $$
+begin
+    if value !~ '^\d{4}-\d{2}-\d{2}$' then
+        return null;
+    end if;
+    return value::date;
+exception when others then
+    return null;
+end;
+$$;
+
+
+create materialized view if not exists public.job_salary_stats as
+select
+    j.category,
+    case when grouping(j.location) = 1 then '*' else j.location end as location,
+    j.salary_condition,
+    count(*) as job_count,
+    count(*) filter (where j.status = 'active') as active_count,
+    min(j.salary) as min_salary,
+    max(j.salary) as max_salary,
+    round(avg(j.salary)::numeric, 2) as avg_salary,
+    percentile_cont(0.10) within group (order by j.salary) as p10,
+    percentile_cont(0.25) within group (order by j.salary) as p25,
+    percentile_cont(0.50) within group (order by j.salary) as p50,
+    percentile_cont(0.75) within group (order by j.salary) as p75,
+    percentile_cont(0.90) within group (order by j.salary) as p90,
+    now() as refreshed_at
+from (
+    select
+        category,
+        coalesce(location, '') as location,
+        coalesce(nullif(salary_condition, ''), 'unspecified') as salary_condition,
+        salary,
+        status
+    from public.joblist
+    where salary is not null
+) j
+group by grouping sets ((j.category, j.location, j.salary_condition), (j.category, j.salary_condition));
+
+create unique index if not exists job_salary_stats_key
+    on public.job_salary_stats (category, location, salary_condition);
+
+
+create materialized view if not exists public.job_shift_stats as
+with parsed as (
+    select
+        j.category,
+        coalesce(j.location, '') as location,
+        public.try_time(j.start_of_shift::text) as starts,
+        public.try_time(j.end_of_shift::text) as ends,
+        coalesce(j."break", 0) as break_hours,
+        public.try_date(j.duration_upto::text) - public.try_date(j.duration_from::text) + 1 as duration_days
+    from public.joblist j
+), shifts as (
+    select
+        p.category,
+        p.location,
+        -- an end at or before the start is an overnight shift
+        extract(epoch from (p.ends - p.starts)) / 3600.0
+            + case when p.ends <= p.starts then 24 else 0 end
+            - p.break_hours as shift_hours,
+        p.break_hours,
+        p.duration_days
+    from parsed p
+    where p.starts is not null and p.ends is not null
+)
+select
+    s.category,
+    case when grouping(s.location) = 1 then '*' else s.location end as location,
+    count(*) as job_count,
+    round(avg(s.shift_hours)::numeric, 2) as avg_shift_hours,
+    percentile_cont(0.25) within group (order by s.shift_hours) as p25_shift_hours,
+    percentile_cont(0.50) within group (order by s.shift_hours) as p50_shift_hours,
+    percentile_cont(0.75) within group (order by s.shift_hours) as p75_shift_hours,
+    count(*) filter (where s.shift_hours < 4) as shifts_under_4h,
+    count(*) filter (where s.shift_hours >= 4 and s.shift_hours < 6) as shifts_4_6h,
+    count(*) filter (where s.shift_hours >= 6 and s.shift_hours < 8) as shifts_6_8h,
+    count(*) filter (where s.shift_hours >= 8 and s.shift_hours < 10) as shifts_8_10h,
+    count(*) filter (where s.shift_hours >= 10 and s.shift_hours < 12) as shifts_10_12h,
+    count(*) filter (where s.shift_hours >= 12) as shifts_12h_plus,
+    round(avg(s.break_hours)::numeric, 2) as avg_break_hours,
+    round(avg(s.duration_days)::numeric, 2) as avg_duration_days,
+    percentile_cont(0.50) within group (order by s.duration_days) as p50_duration_days,
+    now() as refreshed_at
+from shifts s
+group by grouping sets ((s.category, s.location), (s.category));
+
+create unique index if not exists job_shift_stats_key
+    on public.job_shift_stats (category, location);
+
+
+create materialized view if not exists public.job_bid_stats as
+select
+    j.category,
+    case when grouping(j.location) = 1 then '*' else j.location end as location,
+    count(*) as application_count,
+    count(a.bid_amount) as bid_count,
+    round(count(a.bid_amount)::numeric / count(*), 4) as bid_rate,
+    round(avg(a.amount)::numeric, 2) as avg_amount,
+    round(avg(a.bid_amount)::numeric, 2) as avg_bid_amount,
+    -- bid relative to the applicant's own asking amount: 0.9 = bid 10% under
+    percentile_cont(0.50) within group (order by a.bid_amount / nullif(a.amount, 0))
+        filter (where a.bid_amount is not null) as p50_bid_ratio,
+    round(avg(a.bid_amount / nullif(a.amount, 0))::numeric, 4) as avg_bid_ratio,
+    round(avg(a.amount / nullif(j.salary, 0))::numeric, 4) as avg_amount_to_salary,
+    now() as refreshed_at
+from public.job_applications a
+join (select id, category, coalesce(location, '') as location, salary from public.joblist) j on j.id = a.jobid
+group by grouping sets ((j.category, j.location), (j.category));
+
+create unique index if not exists job_bid_stats_key
+    on public.job_bid_stats (category, location);
+
+
+create or replace function public.refresh_job_analytics()
+returns timestamptz
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    refresh materialized view concurrently public.job_salary_stats;
+    refresh materialized view concurrently public.job_shift_stats;
+    refresh materialized view concurrently public.job_bid_stats;
+    return now();
+end;
+$$;
+
+do $$
+begin
+    if exists (select 1 from pg_extension where extname = 'pg_cron') then
+        perform cron.schedule('refresh-job-analytics', '*/15 * * * *', 'select public.refresh_job_analytics()');
+    end if;
+end $$;
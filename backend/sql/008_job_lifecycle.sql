@@ -0,0 +1,154 @@
+-- Job lifecycle. Jobs are inserted 'active'; these functions move them on:
+--
+--   fill_jobs      active -> filled   once one of its applications is 'accepted'
+--   expire_jobs    active -> expired  once duration_upto has passed
+--   archive_jobs   jobs that stopped being active (closed, filled, expired) and
+--                  ended more than archive_after_days ago move, with their
+--                  applications, to joblist_archive / job_applications_archive
+--
+-- The API's sweeper (utils/job_sweeper.py) calls them every JOB_SWEEP_INTERVAL
+-- seconds in every worker. Each call handles at most batch_size rows, locked
+-- with SKIP LOCKED, so workers sweeping at the same time split the backlog
+-- instead of queueing behind each other, and returns the rows it moved so the
+-- caller can update its caches and in-memory indexes.
+--
+-- The feed indexes in 001 are partial on status = 'active' and only ever hold
+-- the hot set; archiving keeps the table itself, and the indexes that are not
+-- partial (employer inbox, geo), from growing with jobs nobody can apply to.
+-- Archived jobs no longer appear in the employer's job list, the inbox or the
+-- analytics views.
+--
+-- duration_upto is free text as the API wrote it. The sweeps only read values
+-- shaped like YYYY-MM-DD (as 007 does) and compare them as text, which orders
+-- ISO dates correctly in the "C" collation; a ::date cast would fail the whole
+-- batch on one malformed row and could not use an index, since text -> date
+-- depends on DateStyle. The indexes below are on that exact expression and
+-- guard, so the planner can match them. Jobs without a usable duration_upto
+-- never expire and are archived by created_at instead.
+
+create index concurrently if not exists joblist_active_upto_iso_idx
+    on public.joblist ((duration_upto::text collate "C"))
+    where status = 'active' and duration_upto::text ~ '^\d{4}-\d{2}-\d{2}$';
+
+create index concurrently if not exists job_applications_accepted_jobid_idx
+    on public.job_applications (jobid)
+    where status = 'accepted';
+
+create index concurrently if not exists joblist_inactive_upto_iso_idx
+    on public.joblist ((duration_upto::text collate "C"))
+    where status <> 'active' and duration_upto::text ~ '^\d{4}-\d{2}-\d{2}$';
+
+create index concurrently if not exists joblist_inactive_undated_idx
+    on public.joblist (created_at)
+    where status <> 'active' and coalesce(duration_upto::text, '') !~ '^\d{4}-\d{2}-\d{2}$';
+
+-- same columns as the live tables plus archived_at; a column added to joblist or
+-- job_applications has to be added here too before the next archive run
+create table if not exists public.joblist_archive (like public.joblist including defaults);
+alter table public.joblist_archive add column if not exists archived_at timestamptz not null default now();
+create unique index if not exists joblist_archive_id_key on public.joblist_archive (id);
+create index if not exists joblist_archive_emp_idx on public.joblist_archive (as_emp_id, created_at desc);
+
+create table if not exists public.job_applications_archive (like public.job_applications including defaults);
+alter table public.job_applications_archive add column if not exists archived_at timestamptz not null default now();
+create unique index if not exists job_applications_archive_id_key on public.job_applications_archive (id);
+create index if not exists job_applications_archive_jobid_idx on public.job_applications_archive (jobid);
+create index if not exists job_applications_archive_prtmr_idx on public.job_applications_archive (prtmr_id);
+
+-- only reachable through archive_jobs() and the service role
+alter table public.joblist_archive enable row level security;
+alter table public.job_applications_archive enable row level security;
+
+
+create or replace function public.fill_jobs(batch_size int default 500)
+returns setof public.joblist
+language sql
+security definer
+set search_path = public
+as $$
+    update public.joblist j
+    set status = 'filled'
+    where j.id in (
+        select l.id
+        from public.joblist l
+        where l.status = 'active'
+          and exists (select 1 from public.job_applications a where a.jobid = l.id and a.status = 'accepted')
+        limit batch_size
+        for update of l skip locked
+    )
+      and j.status = 'active'
+    returning j.*;
+$$;
+
+create or replace function public.expire_jobs(batch_size int default 500)
+returns setof public.joblist
+language sql
+security definer
+set search_path = public
+as $$
+    update public.joblist j
+    set status = 'expired'
+    where j.id in (
+        select l.id
+        from public.joblist l
+        where l.status = 'active'
+          and l.duration_upto::text ~ '^\d{4}-\d{2}-\d{2}$'
+          and (l.duration_upto::text collate "C") < to_char(current_date, 'YYYY-MM-DD')
+        order by (l.duration_upto::text collate "C")
+        limit batch_size
+        for update of l skip locked
+    )
+      and j.status = 'active'
+    returning j.*;
+$$;
+
+-- applications go first: job_applications.jobid references joblist (005), and
+-- its check runs at the end of the statement, after both deletes. Dated and
+-- undated jobs are picked separately so each side can use its index; undated
+-- ones fill whatever room the dated ones leave in the batch.
+create or replace function public.archive_jobs(archive_after_days int default 90, batch_size int default 500)
+returns setof public.joblist_archive
+language sql
+security definer
+set search_path = public
+as $$
+    with dated as (
+        select l.id
+        from public.joblist l
+        where l.status <> 'active'
+          and l.duration_upto::text ~ '^\d{4}-\d{2}-\d{2}$'
+          and (l.duration_upto::text collate "C") < to_char(current_date - archive_after_days, 'YYYY-MM-DD')
+        order by (l.duration_upto::text collate "C")
+        limit batch_size
+        for update of l skip locked
+    ), undated as (
+        select l.id
+        from public.joblist l
+        where l.status <> 'active'
+          and coalesce(l.duration_upto::text, '') !~ '^\d{4}-\d{2}-\d{2}$'
+          and l.created_at < current_date - archive_after_days
+        order by l.created_at
+        limit greatest(batch_size - (select count(*) from dated), 0)
+        for update of l skip locked
+    ), doomed as (
+        select id from dated
+        union all
+        select id from undated
+    ), moved_applications as (
+        delete from public.job_applications a
+        using doomed d
+        where a.jobid = d.id
+        returning a.*
+    ), archived_applications as (
+        insert into public.job_applications_archive
+        select m.*, now() from moved_applications m
+    ), moved as (
+        delete from public.joblist j
+        using doomed d
+        where j.id = d.id
+        returning j.*
+    )
+    insert into public.joblist_archive
+    select m.*, now() from moved m
+    returning *;
+$$;
@@ -0,0 +1,54 @@
+"""
+The PostgREST stand-in from bench/ runs in a child process for the whole
+session, seeded once, with the API imported against it. Tests talk to the
+app in-process over ASGI (bench.harness.api_client).
+"""
+import os
+import socket
+from types import SimpleNamespace
+
+import pytest
+from loguru import logger
+
+from bench import fake_postgrest
+from bench.harness import import_app
+from bench.seed import generate_dataset, load_dataset
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def stack():
+    logger.remove()
+    port = free_port()
+    # the stand-in also answers as a Nominatim-style geocoder
+    os.environ.setdefault("GEOCODER_URL", f"http://127.0.0.1:{port}/geocode/search")
+    os.environ.setdefault("GEOCODE_CONCURRENCY", "8")
+    process = fake_postgrest.serve_in_process(port)
+    try:
+        app = import_app(f"http://127.0.0.1:{port}")
+        from utils.supabase_client import supabase
+
+        data, tables = generate_dataset(employers=5, parttimers=20, jobs=500, applications=0)
+        load_dataset(supabase, tables)
+        yield SimpleNamespace(app=app, supabase=supabase, data=data, port=port)
+    finally:
+        process.terminate()
+
+
+@pytest.fixture
+def backend_latency(stack):
+    """
+    configure(latency_ms, error_rate, **per_path_latency_ms) for the stand-in
+    (search= is the geocoder); reset after the test.
+    """
+    def configure(latency_ms=0.0, error_rate=0.0, **table_latency_ms):
+        stack.supabase.rpc("bench_configure", {"latency_ms": latency_ms, "error_rate": error_rate,
+                                               "table_latency_ms": table_latency_ms}).execute()
+
+    yield configure
+    configure(0.0)
@@ -0,0 +1,92 @@
+"""Google sign-in and access tokens."""
+import asyncio
+import os
+import time
+import uuid
+
+import jwt
+import pytest
+
+from bench.harness import api_client
+from bench.loadtest import GoogleSigner
+
+
+def test_concurrent_first_logins_create_one_user(stack):
+    """Double-clicked sign-in or several tabs: every request gets the same, single users row."""
+    from utils.auth import verify_access_token
+
+    signer = GoogleSigner(os.environ["GOOGLE_CLIENT_ID"])
+    google_id = f"g-{uuid.uuid4()}"
+    token = signer.id_token(google_id, f"{google_id}@bench.local")
+
+    async def run():
+        async with api_client(stack.app) as client:
+            return await asyncio.gather(*(client.post("/api/auth/google", json={"token": token})
+                                          for _ in range(20)))
+
+    responses = asyncio.run(run())
+    assert [res.status_code for res in responses] == [200] * 20
+    rows = stack.supabase.from_("users").select("id").eq("google_id", google_id).execute().data
+    assert len(rows) == 1
+    assert {res.json()["user"]["google_id"] for res in responses} == {google_id}
+    # every caller is signed in as that one row
+    assert {verify_access_token(res.json()["token"])["id"] for res in responses} == {rows[0]["id"]}
+
+
+@pytest.fixture
+def signing_keys(stack, monkeypatch):
+    """Two known kids, "current" signing; no legacy secret unless a test sets one."""
+    import utils.auth
+
+    monkeypatch.setattr(utils.auth, "JWT_KEYS", {"current": "current-secret", "previous": "previous-secret"})
+    monkeypatch.setattr(utils.auth, "JWT_ACTIVE_KID", "current")
+    monkeypatch.setattr(utils.auth, "JWT_LEGACY_SECRET", "")
+    return utils.auth
+
+
+def sign(claims, secret, kid=None):
+    return jwt.encode(claims, secret, algorithm="HS256", headers={"kid": kid} if kid else None)
+
+
+def test_token_with_kid_and_exp_is_accepted(signing_keys):
+    assert signing_keys.verify_access_token(signing_keys.create_access_token({"id": "u1"}))["id"] == "u1"
+    # a key rotated out of signing still verifies what it signed
+    token = sign({"id": "u2", "exp": int(time.time()) + 60}, "previous-secret", kid="previous")
+    assert signing_keys.verify_access_token(token)["id"] == "u2"
+
+
+def test_token_without_exp_is_rejected(signing_keys):
+    with pytest.raises(jwt.MissingRequiredClaimError):
+        signing_keys.verify_access_token(sign({"id": "u1"}, "current-secret", kid="current"))
+
+
+def test_expired_token_is_rejected(signing_keys):
+    with pytest.raises(jwt.ExpiredSignatureError):
+        signing_keys.verify_access_token(sign({"id": "u1", "exp": int(time.time()) - 60}, "current-secret",
+                                              kid="current"))
+
+
+def test_unknown_kid_is_rejected(signing_keys):
+    token = sign({"id": "u1", "exp": int(time.time()) + 60}, "current-secret", kid="retired")
+    with pytest.raises(jwt.InvalidKeyError):
+        signing_keys.verify_access_token(token)
+
+
+def test_kidless_token_needs_the_legacy_secret(signing_keys, monkeypatch):
+    token = sign({"id": "u1"}, "legacy-secret")
+    with pytest.raises(jwt.InvalidTokenError):
+        signing_keys.verify_access_token(token)  # no JWT_LEGACY_SECRET: never accepted
+
+    monkeypatch.setattr(signing_keys, "JWT_LEGACY_SECRET", "legacy-secret")
+    assert signing_keys.verify_access_token(token)["id"] == "u1"
+    # not against any of the kid secrets
+    with pytest.raises(jwt.InvalidSignatureError):
+        signing_keys.verify_access_token(sign({"id": "u1"}, "current-secret"))
+
+
+def test_auth_counters_are_not_public(stack):
+    async def run():
+        async with api_client(stack.app) as client:
+            return (await client.get("/api/auth/metrics")).status_code
+
+    assert asyncio.run(run()) == 404
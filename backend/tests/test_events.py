@@ -0,0 +1,72 @@
+"""Event stream authentication and what job events disclose."""
+import asyncio
+import json
+
+import pytest
+
+from bench.harness import api_client, make_token
+
+
+def test_stream_ticket_is_single_use(stack):
+    from utils.auth import get_stream_user
+
+    user_id = stack.data.parttimers[0]
+    token = make_token(user_id)
+
+    async def run():
+        async with api_client(stack.app) as client:
+            res = await client.post("/api/events/ticket", headers={"Authorization": f"Bearer {token}"})
+            ticket = res.json()["ticket"]
+            claims = await get_stream_user(ticket=ticket, credentials=None)  # what the first connection does
+            replayed = await client.get("/api/events/stream", params={"ticket": ticket})
+            as_ticket = await client.get("/api/events/stream", params={"ticket": token})
+            as_token = await client.get("/api/events/stream", params={"token": token})
+            ticket_as_bearer = await client.get("/api/parttimer/profile",
+                                                headers={"Authorization": f"Bearer {ticket}"})
+            return res, claims, replayed, as_ticket, as_token, ticket_as_bearer
+
+    res, claims, replayed, as_ticket, as_token, ticket_as_bearer = asyncio.run(run())
+    assert res.status_code == 200 and res.json()["expires_in"] > 0
+    assert claims["id"] == user_id
+    assert replayed.status_code == 401
+    # the session token is accepted in neither query parameter, and a ticket is no session token
+    assert as_ticket.status_code == 401
+    assert as_token.status_code == 401
+    assert ticket_as_bearer.status_code == 401
+
+
+@pytest.mark.usefixtures("stack")  # the app's settings come from its environment
+def test_job_events_do_not_name_the_employer():
+    from routers.events import format_sse, subscriber_filter
+    from utils.events import EventBus, job_event, JOB_CREATED, APPLICATION_CREATED
+
+    job = {"id": 7, "as_emp_id": "emp-1", "category": "Retail", "location": "Makati", "status": "active"}
+    own_jobs, others_jobs = set(), set()
+    owner = subscriber_filter(set(), None, None, "emp-1", own_jobs)
+    other = subscriber_filter(set(), None, None, "emp-2", others_jobs)
+
+    async def run():
+        bus = EventBus()
+        seen = {"owner": bus.subscribe(owner), "other": bus.subscribe(other)}
+        await bus.publish(JOB_CREATED, job_event(job), owner="emp-1")
+        await bus.publish(APPLICATION_CREATED, {"id": 1, "jobid": 7})
+        return {name: [s.queue.get_nowait() for _ in range(s.queue.qsize())] for name, s in seen.items()}
+
+    received = asyncio.run(run())
+    assert [e["type"] for e in received["owner"]] == [JOB_CREATED, APPLICATION_CREATED]
+    assert [e["type"] for e in received["other"]] == [JOB_CREATED]
+    sent = format_sse(received["other"][0])
+    assert "emp-1" not in sent and "as_emp_id" not in json.loads(sent.split("data: ", 1)[1])
+
+
+@pytest.mark.usefixtures("stack")  # the app's settings come from its environment
+def test_event_ids_are_distinct_across_workers():
+    from utils.events import EventBus, JOB_CREATED
+
+    async def first_id():
+        bus = EventBus()  # each worker has its own bus
+        subscription = bus.subscribe(lambda event: True)
+        await bus.publish(JOB_CREATED, {"id": 1})
+        return subscription.queue.get_nowait()["id"]
+
+    assert asyncio.run(first_id()) != asyncio.run(first_id())
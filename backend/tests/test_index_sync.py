@@ -0,0 +1,95 @@
+"""
+Writes that reach the database through another worker: the in-memory search,
+geo and matching indexes here catch up from job events and periodic reloads.
+"""
+import asyncio
+import random
+import uuid
+
+from bench.harness import api_client, make_token
+from bench.seed import job_form
+
+
+def insert_job(stack, marker, **fields):
+    """A job posted through some other worker: in the database, not in this worker's indexes."""
+    form = job_form(random.Random(marker))
+    row = {**{k: v for k, v in form.items() if k != "break_"}, "short_desc": f"{marker} wanted",
+           "as_emp_id": stack.supabase.from_("as_employer").select("as_emp_id").limit(1).execute().data[0]["as_emp_id"],
+           "status": "active", "lat": 14.55, "lng": 121.02, **fields}
+    return stack.supabase.from_("joblist").insert(row).execute().data[0]
+
+
+def searched(client, headers, marker):
+    async def ids():
+        res = await client.get("/api/joblist/search", params={"q": marker, "prefix": "false"}, headers=headers)
+        res.raise_for_status()
+        return {job["id"] for job in res.json()["jobs"]}
+    return ids()
+
+
+def test_job_events_from_other_workers_update_the_indexes(stack):
+    from utils.events import events, job_event, JOB_CREATED, JOB_STATUS
+    from utils.geo import job_index
+    from utils.index_sync import IndexSync
+    from utils.search import search_index
+
+    marker = f"sync{uuid.uuid4().hex[:8]}"
+    headers = {"Authorization": f"Bearer {make_token(stack.data.parttimers[0])}"}
+
+    async def run():
+        sync = IndexSync(reload_interval=0, follow=True)  # as with a broker shared by the workers
+        await search_index.ensure_loaded()
+        await sync.start()
+        try:
+            async with api_client(stack.app) as client:
+                job = await asyncio.to_thread(insert_job, stack, marker)
+                before = await searched(client, headers, marker)
+                await events.publish(JOB_CREATED, job_event(job), owner=job["as_emp_id"])
+                await asyncio.sleep(0.3)
+                created = await searched(client, headers, marker), job["id"] in job_index._points
+
+                closed = {**job, "status": "closed"}
+                await asyncio.to_thread(
+                    lambda: stack.supabase.from_("joblist").update({"status": "closed"}).eq("id", job["id"]).execute())
+                await events.publish(JOB_STATUS, job_event(closed), owner=job["as_emp_id"])
+                await asyncio.sleep(0.3)
+                return job["id"], before, created, (await searched(client, headers, marker),
+                                                    job["id"] in job_index._points)
+        finally:
+            await sync.stop()
+
+    job_id, before, (found, placed), (after, still_placed) = asyncio.run(run())
+    assert job_id not in before
+    assert job_id in found and placed
+    assert job_id not in after and not still_placed
+
+
+def test_reload_picks_up_writes_that_sent_no_event(stack):
+    from utils.index_sync import IndexSync
+    from utils.matching import matching
+    from utils.search import search_index
+
+    marker = f"reload{uuid.uuid4().hex[:8]}"
+    parttimer = stack.data.parttimers[3]
+    headers = {"Authorization": f"Bearer {make_token(parttimer)}"}
+
+    async def run():
+        await search_index.ensure_loaded()
+        await matching.ensure_loaded()
+        async with api_client(stack.app) as client:
+            job = await asyncio.to_thread(insert_job, stack, marker)
+            await asyncio.to_thread(
+                lambda: stack.supabase.from_("as_parttimer").update({"available": False}).eq("id", parttimer).execute())
+            try:
+                before = await searched(client, headers, marker), parttimer in matching.parttimers
+                await IndexSync(reload_interval=0, follow=False).reload()
+                after = await searched(client, headers, marker), parttimer in matching.parttimers
+            finally:
+                await asyncio.to_thread(lambda: stack.supabase.from_("as_parttimer").update({"available": True})
+                                        .eq("id", parttimer).execute())
+                await IndexSync(reload_interval=0, follow=False).reload()
+            return job["id"], before, after
+
+    job_id, (found_before, listed_before), (found_after, listed_after) = asyncio.run(run())
+    assert job_id not in found_before and listed_before
+    assert job_id in found_after and not listed_after
@@ -0,0 +1,84 @@
+"""
+Admission limit and rate limits under overload: a short run of what
+bench/overload.py measures at length.
+"""
+import asyncio
+import uuid
+from collections import Counter
+
+import pytest
+
+from bench.harness import api_client, make_token, percentile
+from bench.overload import open_loop
+
+
+@pytest.fixture
+def rate_limits():
+    from utils.ratelimit import rate_limiter, MemoryBucketStore
+
+    saved = rate_limiter.enabled, rate_limiter.store
+    rate_limiter.enabled, rate_limiter.store = True, MemoryBucketStore()
+    yield rate_limiter
+    rate_limiter.enabled, rate_limiter.store = saved
+
+
+def auth(user_id=None):
+    return {"Authorization": f"Bearer {make_token(user_id or str(uuid.uuid4()))}"}
+
+
+def test_bounded_queue_keeps_latency_flat(stack, backend_latency):
+    """Four times what the backend can serve: the excess is shed, the rest stays within the queue timeout."""
+    from utils.db import admission
+
+    saved = admission.limit, admission.max_queue, admission.timeout
+    admission.limit, admission.max_queue, admission.timeout = 4, 16, 0.25
+    backend_latency(50)  # 4 slots x 50ms: about 80 calls/s
+    users = [auth() for _ in range(50)]
+
+    async def run():
+        async with api_client(stack.app) as client:
+            return await open_loop(client, 320, 2.0, lambda i: users[i % len(users)])
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        admission.limit, admission.max_queue, admission.timeout = saved
+    statuses = Counter(status for _, (status, _) in results)
+    ok = [ms for _, (status, ms) in results if status == 200]
+    assert set(statuses) <= {200, 503}
+    assert statuses[503] > 0 and ok
+    # queue timeout plus one backend call, with room for a loaded test machine
+    assert percentile(ok, 99) < 250 + 50 + 450
+
+
+def test_noisy_user_is_throttled_alone(stack, rate_limits):
+    users = [auth() for _ in range(20)]
+    noisy = auth()
+
+    async def run():
+        async with api_client(stack.app) as client:
+            return await asyncio.gather(
+                open_loop(client, 20, 1.0, lambda i: users[i % len(users)]),
+                open_loop(client, 100, 1.0, lambda i: noisy),
+            )
+
+    others, noisy_results = asyncio.run(run())
+    assert Counter(status for _, (status, _) in others) == {200: 20}
+    assert Counter(status for _, (status, _) in noisy_results)[429] > 0
+
+
+def test_probes_are_not_rate_limited(stack, rate_limits):
+    """Probes share the caller's address with everything else; an empty bucket must not fail them."""
+    async def run():
+        async with api_client(stack.app) as client:
+            limited = False
+            for _ in range(500):
+                if (await client.get("/api/joblist/get_job_category")).status_code == 429:
+                    limited = True
+                    break
+            return limited, (await client.get("/livez")).status_code, (await client.get("/readyz")).status_code
+
+    limited, livez, readyz = asyncio.run(run())
+    assert limited
+    assert livez == 200
+    assert readyz != 429  # 503 here: the lifespan has not run
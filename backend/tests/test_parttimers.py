@@ -0,0 +1,54 @@
+"""Part-timer availability and the employer's part-timer listing."""
+import asyncio
+
+import orjson
+
+from bench.harness import api_client, make_token
+
+
+def auth(user_id):
+    return {"Authorization": f"Bearer {make_token(user_id)}"}
+
+
+def test_unavailable_parttimers_leave_the_listing(stack):
+    parttimer, employer = stack.data.parttimers[0], stack.data.employers[0]
+
+    async def listed(client):
+        res = await client.get("/api/employer/available-parttimers", params={"limit": 100, "fields": "id"},
+                               headers=auth(employer))
+        res.raise_for_status()
+        return {row["id"] for row in res.json()["as_parttimer"]}
+
+    async def set_available(client, available):
+        res = await client.post("/api/parttimer/availability_update", json={"available": available},
+                                headers=auth(parttimer))
+        res.raise_for_status()
+
+    async def run():
+        async with api_client(stack.app) as client:
+            try:
+                await set_available(client, False)
+                hidden = await listed(client)
+            finally:
+                await set_available(client, True)
+            return hidden, await listed(client)
+
+    hidden, shown = asyncio.run(run())
+    assert parttimer not in hidden
+    assert parttimer in shown
+
+
+def test_failed_stream_ends_with_an_error_line(stack, backend_latency):
+    async def run():
+        async with api_client(stack.app) as client:
+            res = await client.get("/api/employer/available-parttimers", params={"stream": "true"},
+                                   headers=auth(stack.data.employers[0]))
+            return res.status_code, res.content.splitlines()
+
+    complete_status, complete = asyncio.run(run())
+    backend_latency(error_rate=1.0)
+    status, lines = asyncio.run(run())
+
+    assert complete_status == 200 and all("error" not in orjson.loads(line) for line in complete)
+    assert status == 200  # sent before the first batch is fetched
+    assert orjson.loads(lines[-1]) == {"error": "Internal server error"}
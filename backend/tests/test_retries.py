@@ -0,0 +1,126 @@
+"""
+Retried and concurrent duplicate writes: a short run of what bench/retry_storm.py
+measures at length. Idempotency-Key replays, and the ON CONFLICT DO NOTHING
+upserts that keep one row per applicant/job and per profile.
+"""
+import asyncio
+import random
+import uuid
+
+from bench.harness import api_client, make_token
+from bench.seed import job_form
+
+
+def auth(user_id, **headers):
+    return {"Authorization": f"Bearer {make_token(user_id)}", **headers}
+
+
+def count(supabase, table, **eq):
+    query = supabase.from_(table).select("id", count="exact")
+    for column, value in eq.items():
+        query = query.eq(column, value)
+    return query.limit(1).execute().count
+
+
+def active_jobs(stack, n):
+    rows = stack.supabase.from_("joblist").select("id").eq("status", "active").order("id").limit(n).execute().data
+    return [str(row["id"]) for row in rows]
+
+
+def new_user(stack):
+    user_id = str(uuid.uuid4())
+    stack.supabase.from_("users").insert({"id": user_id, "google_id": f"g-{user_id}", "name": "Test User",
+                                          "email": f"{user_id}@bench.local"}).execute()
+    return user_id
+
+
+def test_idempotent_retries_post_one_job(stack):
+    form = job_form(random.Random(1))
+    form["short_desc"] = f"retried {uuid.uuid4()}"
+    headers = auth(stack.data.employers[0], **{"Idempotency-Key": str(uuid.uuid4())})
+
+    async def run():
+        async with api_client(stack.app) as client:
+            def post():
+                return client.post("/api/joblist/listNewJob", json=form, headers=headers)
+
+            first = await post()
+            # a retry storm: sequential and concurrent copies of the same request
+            return first, await asyncio.gather(*(post() for _ in range(5)))
+
+    first, retries = asyncio.run(run())
+    assert first.status_code == 200 and "Idempotent-Replayed" not in first.headers
+    assert all(res.status_code == 200 and res.headers["Idempotent-Replayed"] == "true" for res in retries)
+    assert {res.json()["job"][0]["id"] for res in retries} == {first.json()["job"][0]["id"]}
+    assert count(stack.supabase, "joblist", short_desc=form["short_desc"]) == 1
+
+
+def test_key_reused_for_a_different_request_is_rejected(stack):
+    rng = random.Random(2)
+    headers = auth(stack.data.employers[0], **{"Idempotency-Key": str(uuid.uuid4())})
+
+    async def run():
+        async with api_client(stack.app) as client:
+            first = await client.post("/api/joblist/listNewJob", json=job_form(rng), headers=headers)
+            other = await client.post("/api/joblist/listNewJob", json=job_form(rng), headers=headers)
+            return first, other
+
+    first, other = asyncio.run(run())
+    assert first.status_code == 200
+    assert other.status_code == 422
+
+
+def test_concurrent_applications_keep_one_row(stack):
+    parttimer = stack.data.parttimers[-1]
+    jobid = active_jobs(stack, 1)[0]
+    body = {"amount": 500}
+
+    async def run():
+        async with api_client(stack.app) as client:
+            return await asyncio.gather(*(client.post(f"/api/parttimer/apply_job/{jobid}", json=body,
+                                                      headers=auth(parttimer)) for _ in range(10)))
+
+    responses = asyncio.run(run())
+    assert [res.status_code for res in responses] == [200] * 10
+    assert sum(res.json()["message"] == "Application submitted successfully" for res in responses) == 1
+    assert len({res.json()["application"]["id"] for res in responses}) == 1
+    as_prtmr_id = responses[0].json()["application"]["prtmr_id"]
+    assert count(stack.supabase, "job_applications", jobid=jobid, prtmr_id=as_prtmr_id) == 1
+
+
+def test_batch_applications_skip_jobs_already_applied_to(stack):
+    parttimer = stack.data.parttimers[-2]
+    jobids = active_jobs(stack, 3)
+    items = [{"jobid": jobid, "amount": 500} for jobid in jobids]
+
+    async def run():
+        async with api_client(stack.app) as client:
+            await client.post(f"/api/parttimer/apply_job/{jobids[0]}", json={"amount": 500}, headers=auth(parttimer))
+            return await asyncio.gather(*(client.post("/api/parttimer/apply_jobs", json=items, headers=auth(parttimer))
+                                          for _ in range(3)))
+
+    responses = asyncio.run(run())
+    assert [res.status_code for res in responses] == [200] * 3
+    statuses = [[result["status"] for result in res.json()["results"]] for res in responses]
+    assert all(row[0] == "already_applied" for row in statuses)
+    # each of the other jobs was applied to by exactly one of the racing batches
+    assert [sum(row[i] == "applied" for row in statuses) for i in (1, 2)] == [1, 1]
+    as_prtmr_id = responses[0].json()["results"][0]["application"]["prtmr_id"]
+    assert [count(stack.supabase, "job_applications", jobid=jobid, prtmr_id=as_prtmr_id) for jobid in jobids] == [1] * 3
+
+
+def test_concurrent_first_profile_creation_keeps_one_row(stack):
+    for role, table, id_field in (("employer", "as_employer", "as_emp_id"),
+                                  ("parttimer", "as_parttimer", "as_prtmr_id")):
+        user_id = new_user(stack)
+
+        async def run():
+            async with api_client(stack.app) as client:
+                return await asyncio.gather(*(client.post(f"/api/{role}/check_or_create_{role}",
+                                                          headers=auth(user_id)) for _ in range(10)))
+
+        responses = asyncio.run(run())
+        assert [res.status_code for res in responses] == [200] * 10, role
+        assert sum(res.json()["status"] == "created" for res in responses) == 1, role
+        assert len({res.json()[id_field] for res in responses}) == 1, role
+        assert count(stack.supabase, table, id=user_id) == 1, role
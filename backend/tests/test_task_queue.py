@@ -0,0 +1,94 @@
+"""
+Side effects queued after the write: a short run of what bench/task_queue.py
+measures at length, covering every endpoint that geocodes.
+"""
+import asyncio
+import itertools
+import random
+import time
+
+from bench.harness import api_client, make_token, percentile
+from bench.seed import job_form
+
+_places = itertools.count()
+
+
+def unknown_place():
+    """A location neither the gazetteer nor the geocode cache knows."""
+    return f"{next(_places)} Test Street, Makati"
+
+
+async def timed(request):
+    started = time.perf_counter()
+    res = await request
+    res.raise_for_status()
+    return (time.perf_counter() - started) * 1000, res.json()
+
+
+async def write_all(client, stack, writes):
+    """Posts a job and moves an employer and a part-timer, writes times over; returns the samples and what moved."""
+    rng = random.Random(0)
+    employer = {"Authorization": f"Bearer {make_token(stack.data.employers[0])}"}
+    samples, jobs, employers, parttimers = [], [], [], []
+    for i in range(writes):
+        form = job_form(rng)
+        form["location"] = unknown_place()
+        ms, body = await timed(client.post("/api/joblist/listNewJob", json=form, headers=employer))
+        samples.append(ms)
+        jobs.append(body["job"][0]["id"])
+
+        user_id = stack.data.employers[i % len(stack.data.employers)]
+        ms, _ = await timed(client.post("/api/employer/location_update", json={
+            "location": unknown_place(), "status": "true"},
+            headers={"Authorization": f"Bearer {make_token(user_id)}"}))
+        samples.append(ms)
+        employers.append(user_id)
+
+        user_id = stack.data.parttimers[i % len(stack.data.parttimers)]
+        ms, body = await timed(client.post("/api/parttimer/location_update", json={"location": unknown_place()},
+                                           headers={"Authorization": f"Bearer {make_token(user_id)}"}))
+        samples.append(ms)
+        assert body["lat"] is None  # placed by the task, not the request
+        parttimers.append(user_id)
+    return samples, jobs, employers, parttimers
+
+
+def unplaced(supabase, table, column, ids):
+    rows = supabase.from_(table).select(f"{column}, lat").in_(column, ids).execute().data
+    return [row[column] for row in rows if row.get("lat") is None]
+
+
+def test_write_latency_ignores_geocoder_latency(stack, backend_latency):
+    from utils.geo import close_geocoder
+    from utils.tasks import tasks
+
+    async def run():
+        latencies = {}
+        try:
+            async with api_client(stack.app) as client:
+                for geocoder_ms in (0, 500):
+                    backend_latency(0, search=geocoder_ms)
+                    samples, *moved = await write_all(client, stack, 5)
+                    latencies[geocoder_ms] = percentile(samples, 50)
+                    drained = await tasks.join(timeout=60)
+            return latencies, drained, moved
+        finally:
+            await tasks.stop()
+            await close_geocoder()  # the lifespan would; its connections belong to this loop
+
+    latencies, drained, (jobs, employers, parttimers) = asyncio.run(run())
+    # inline, every write would wait the full 500ms for the geocoder
+    assert latencies[500] < latencies[0] + 100
+    assert drained
+    assert unplaced(stack.supabase, "joblist", "id", jobs) == []
+    assert unplaced(stack.supabase, "as_employer", "id", employers) == []
+    assert unplaced(stack.supabase, "as_parttimer", "id", parttimers) == []
+
+
+def test_geocoding_handlers_share_one_limit(stack):
+    """job, employer and part-timer geocodes all count against GEOCODE_CONCURRENCY together."""
+    from utils.geo import geocoder_limit
+    from utils.tasks import tasks
+
+    names = ("job.geocode", "employer.geocode", "parttimer.geocode")
+    assert all(tasks._handlers[name].limit is geocoder_limit for name in names)
@@ -1,21 +1,68 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 from utils.supabase_client import supabase
-import requests
+from utils.db import run_query
+from utils.google_tokens import verify_google_id_token, GoogleTokenError
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from utils.cache import TTLCache
+from utils.job_cache import make_cache_backend
+from utils.metrics import metrics
+from utils.ratelimit import rate_limiter
+from loguru import logger
 import jwt
 import os
-import logging
-import sys
+import time
+import uuid
 
 router = APIRouter(prefix="/api/auth", tags=["Auth"])
 
-# Environment variables
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_KEY = os.environ["SUPABASE_ANON_KEY"]
-GOOGLE_CLIENT_ID = os.environ["GOOGLE_CLIENT_ID"]
-JWT_SECRET = os.environ.get("JWT_SECRET", "your_jwt_secret")
+# Environment variables (required ones are checked at startup by utils.lifecycle, not at import)
+GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID", "")
+# signs and verifies tokens under kid "default" when JWT_KEYS is not set
+JWT_SECRET = os.environ.get("JWT_SECRET", "")
+# tokens issued before key ids existed carry no kid and no exp. They are accepted,
+# checked against this secret, only while it is set; unset it once they have aged out
+JWT_LEGACY_SECRET = os.environ.get("JWT_LEGACY_SECRET", "")
 JWT_ALGORITHM = "HS256"
+JWT_TTL_SECONDS = int(os.environ.get("JWT_TTL_SECONDS", str(7 * 24 * 3600)))
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", "300"))
+# EventSource cannot send headers, so event streams authenticate with ?ticket=:
+# single use and short lived, as access logs record the URL
+STREAM_TICKET_TTL = int(os.environ.get("STREAM_TICKET_TTL", "30"))
+# "" remembers redeemed tickets in this process only; sqlite:///path/to/file or
+# redis://host:port/db share them across workers (as JOB_CACHE_URL)
+STREAM_TICKET_URL = os.environ.get("STREAM_TICKET_URL", "")
+STREAM_TICKET_AUDIENCE = "event-stream"
+
+
+def load_signing_keys(raw):
+    """
+    Parse JWT_KEYS ("kid1:secret1,kid2:secret2"). The active kid signs new
+    tokens; every listed kid still verifies, so keys can be rotated by adding
+    a new one, switching JWT_ACTIVE_KID, and dropping the old one after JWT_TTL_SECONDS.
+    """
+    keys = {}
+    for item in (raw or "").split(","):
+        kid, sep, secret = item.partition(":")
+        if sep and kid.strip() and secret.strip():
+            keys[kid.strip()] = secret.strip()
+    if not keys and JWT_SECRET:
+        keys["default"] = JWT_SECRET
+    return keys
+
+
+JWT_KEYS = load_signing_keys(os.environ.get("JWT_KEYS", ""))
+JWT_ACTIVE_KID = os.environ.get("JWT_ACTIVE_KID", next(iter(JWT_KEYS), "default"))
+
+
+def check_signing_keys():
+    """Called by utils.lifecycle.check_config before a worker starts."""
+    if not JWT_KEYS:
+        raise RuntimeError("Set JWT_KEYS or JWT_SECRET to sign access tokens")
+    if JWT_ACTIVE_KID not in JWT_KEYS:
+        raise RuntimeError(f"JWT_ACTIVE_KID {JWT_ACTIVE_KID!r} is not in JWT_KEYS")
 
 
 # Models
@@ -24,92 +71,184 @@ class TokenData(BaseModel):
 
 security = HTTPBearer()
 
-    
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
-logger = logging.getLogger(__name__)
+
+class AuthStats:
+    """Counters and cumulative timing for get_current_user."""
+
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.failures = 0
+        self.verify_seconds = 0.0
+        self.total_seconds = 0.0
+
+    def snapshot(self):
+        misses = self.requests - self.cache_hits
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "failures": self.failures,
+            "cache_size": len(claims_cache),
+            "avg_verify_us": round(self.verify_seconds / misses * 1e6, 2) if misses else 0.0,
+            "avg_total_us": round(self.total_seconds / self.requests * 1e6, 2) if self.requests else 0.0,
+        }
 
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+auth_stats = AuthStats()
+metrics.register_snapshot("auth", auth_stats.snapshot)
+# verified token -> claims; entries never outlive the token's own exp
+claims_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+
+def create_access_token(claims):
+    now = int(time.time())
+    payload = {**claims, "iat": now, "exp": now + JWT_TTL_SECONDS}
+    return jwt.encode(payload, JWT_KEYS[JWT_ACTIVE_KID], algorithm=JWT_ALGORITHM, headers={"kid": JWT_ACTIVE_KID})
+
+
+def create_stream_ticket(claims):
+    """
+    A ticket for one event stream connection. Its aud claim keeps it from being
+    accepted as an access token, and the lack of one keeps access tokens out of ?ticket=.
+    """
+    now = int(time.time())
+    payload = {**{k: claims.get(k) for k in ("id", "google_id", "email")}, "aud": STREAM_TICKET_AUDIENCE,
+               "jti": uuid.uuid4().hex, "iat": now, "exp": now + STREAM_TICKET_TTL}
+    return jwt.encode(payload, JWT_KEYS[JWT_ACTIVE_KID], algorithm=JWT_ALGORITHM, headers={"kid": JWT_ACTIVE_KID})
+
+
+redeemed_tickets = make_cache_backend(STREAM_TICKET_URL, AUTH_CACHE_SIZE, "STREAM_TICKET_URL")
+
+
+async def redeem_stream_ticket(ticket):
+    """Return the claims of a valid ticket not used before, or raise a 401."""
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
+        secret = JWT_KEYS[jwt.get_unverified_header(ticket).get("kid")]
+        payload = jwt.decode(ticket, secret, algorithms=[JWT_ALGORITHM], audience=STREAM_TICKET_AUDIENCE,
+                             options={"require": ["exp", "jti"]})
     except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        raise HTTPException(status_code=401, detail="Invalid ticket")
+    key = f"stream-ticket:{payload['jti']}"
+    try:
+        if await redeemed_tickets.get(key):
+            raise HTTPException(status_code=401, detail="Ticket already used")
+        await redeemed_tickets.set(key, 1, max(payload["exp"] - time.time(), 1))
+    except HTTPException:
+        raise
+    except Exception as e:
+        # the ticket is signed and expires within STREAM_TICKET_TTL; don't fail streams over the store
+        logger.warning(f"Stream ticket store failed: {str(e)}")
+    return payload
+
+
+def verify_access_token(token):
+    kid = jwt.get_unverified_header(token).get("kid")
+    if not kid:
+        if not JWT_LEGACY_SECRET:
+            raise jwt.InvalidTokenError("token has no kid")
+        return jwt.decode(token, JWT_LEGACY_SECRET, algorithms=[JWT_ALGORITHM])
+    secret = JWT_KEYS.get(kid)
+    if secret is None:
+        raise jwt.InvalidKeyError(f"unknown kid {kid!r}")
+    return jwt.decode(token, secret, algorithms=[JWT_ALGORITHM], options={"require": ["exp"]})
+
+
+def authenticate_token(token):
+    """Return the claims of a valid access token (cached), or raise a 401."""
+    started = time.perf_counter()
+    auth_stats.requests += 1
+    try:
+        payload = claims_cache.get(token)
+        if payload is not None:
+            auth_stats.cache_hits += 1
+            return payload
+        try:
+            payload = verify_access_token(token)
+        except Exception:
+            auth_stats.failures += 1
+            raise HTTPException(status_code=401, detail="Invalid token")
+        auth_stats.verify_seconds += time.perf_counter() - started
+        ttl = AUTH_CACHE_TTL
+        if "exp" in payload:
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl > 0:
+            claims_cache.set(token, payload, ttl=ttl)
+        return payload
+    finally:
+        auth_stats.total_seconds += time.perf_counter() - started
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    claims = authenticate_token(credentials.credentials)
+    await rate_limiter.check_user(claims.get("id"))
+    return claims
+
+
+async def get_stream_user(
+    ticket: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+):
+    """
+    Like get_current_user, but also accepts ?ticket= (POST /api/events/ticket)
+    because EventSource cannot send headers.
+    """
+    if credentials is not None:
+        claims = authenticate_token(credentials.credentials)
+    elif ticket:
+        claims = await redeem_stream_ticket(ticket)
+    else:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    await rate_limiter.check_user(claims.get("id"))
+    return claims
+
 
 @router.post("/google")
 async def google_auth(token_data: TokenData):
     token = token_data.token
     try:
-        # Step 1: Verify token with Google
-        verify_url = f"https://oauth2.googleapis.com/tokeninfo?id_token={token}"
+        # Step 1: Verify token signature locally against Google's cached JWKS
+        try:
+            user_info = await verify_google_id_token(token, GOOGLE_CLIENT_ID)
+        except GoogleTokenError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Step 2: Prepare user data
+        user_data = {
+            "google_id": user_info.get("sub"),
+            "email": user_info.get("email"),
+            "name": user_info.get("name"),
+            "picture_url": user_info.get("picture"),
+            "email_verified": user_info.get("email_verified"),
+        }
+        # Step 3: Create or refresh the user and read back its id in one atomic upsert.
+        # ON CONFLICT (google_id) also makes concurrent first logins of one account safe.
         try:
-            verify_response = requests.get(verify_url, timeout=5)
-            if verify_response.status_code != 200:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Token verification failed: {verify_response.text}"
-                )
-            user_info = verify_response.json()
-            if not user_info.get("aud"):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Invalid token: no audience"
-                )
-            if user_info.get("aud") != GOOGLE_CLIENT_ID:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Token audience mismatch."
-                )
-            # Step 2: Prepare user data
-            user_data = {
-                "google_id": user_info.get("sub"),
-                "email": user_info.get("email"),
-                "name": user_info.get("name"),
-                "picture_url": user_info.get("picture"),
-                "email_verified": user_info.get("email_verified"),
+            user_row = await run_query(supabase.from_("users").upsert(user_data, on_conflict="google_id"))
+            user_id = user_row.data[0]["id"] if user_row.data else None
+            if user_id is None:
+                raise RuntimeError("upsert returned no row")
+            # Create JWT token
+            payload = {
+                "google_id": user_data["google_id"],
+                "id": user_id,
+                "email": user_data["email"]
             }
-            # Step 3: Save to Supabase
-            try:
-                existing_user = supabase.from_("users").select("*").eq("google_id", user_data["google_id"]).maybe_single().execute()
-                if existing_user is None or existing_user.data is None:
-                    supabase.from_("users").insert(user_data).execute()
-                else:
-                    logger.info(f"User {user_data['email']} already exists.")
-                # Fetch the user ID from Supabase
-                user_row = supabase.from_("users").select("*").eq("google_id", user_data["google_id"]).maybe_single().execute()
-                user_id = user_row.data["id"] if user_row and user_row.data else None
-                # Create JWT token
-                payload = {
-                    "google_id": user_data["google_id"],
-                    "id": user_id,
-                    "email": user_data["email"]
-                }
-                token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
-                return {
-                    "status": "success",
-                    "user": user_data,
-                    "token": token
-                }
-            except Exception as supabase_error:
-                logger.error(f"Supabase operation failed: {str(supabase_error)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Database operation failed: {str(supabase_error)}"
-                )
-        except requests.RequestException as e:
+            token = create_access_token(payload)
+            return {
+                "status": "success",
+                "user": user_data,
+                "token": token
+            }
+        except Exception as supabase_error:
+            logger.error(f"Supabase operation failed: {str(supabase_error)}")
             raise HTTPException(
-                status_code=400,
-                detail=f"Google token verification failed: {str(e)}"
+                status_code=500,
+                detail=f"Database operation failed: {str(supabase_error)}"
             )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
-
@@ -0,0 +1,118 @@
+import os
+import zlib
+
+try:
+    import brotli  # optional dependency
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# brotli's high qualities are far too slow for on-the-fly responses
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# compressing these would hold back events until a buffer fills
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+class _Gzip:
+    encoding = "gzip"
+
+    def __init__(self):
+        self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        # sync flush so each streamed chunk reaches the client immediately
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        return self._z.compress(data) + self._z.flush()
+
+
+class _Brotli:
+    encoding = "br"
+
+    def __init__(self):
+        self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def chunk(self, data):
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self, data=b""):
+        return self._c.process(data) + self._c.finish()
+
+
+def _accepted(scope):
+    for name, value in scope.get("headers", ()):
+        if name == b"accept-encoding":
+            return {token.split(";")[0].strip() for token in value.decode("latin-1").lower().split(",")}
+    return set()
+
+
+class CompressionMiddleware:
+    """
+    Brotli (when installed and accepted) or gzip for responses of at least
+    minimum_size bytes. Streamed bodies are compressed chunk by chunk with a
+    flush after each, so NDJSON keeps streaming; event streams are left alone.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = _accepted(scope)
+        if brotli is not None and "br" in accepted:
+            make_encoder = _Brotli
+        elif "gzip" in accepted:
+            make_encoder = _Gzip
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", ())}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = b"content-encoding" in headers or content_type.startswith(UNCOMPRESSED_TYPES)
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message  # held until the first body chunk shows the size
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if start is not None:
+                headers = [(k, v) for k, v in start.get("headers", ()) if k.lower() != b"content-length"]
+                if not more and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+                encoder = make_encoder()
+                headers += [(b"content-encoding", encoder.encoding.encode()), (b"vary", b"Accept-Encoding")]
+                if not more:
+                    body = encoder.finish(body)
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start, "headers": headers})
+                    start = None
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({**start, "headers": headers})
+                start = None
+            await send({"type": "http.response.body", "body": encoder.finish(body) if not more else encoder.chunk(body),
+                        "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
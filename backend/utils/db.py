@@ -0,0 +1,140 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from utils.metrics import metrics, describe_query
+
+# The supabase-py client is synchronous: every .execute() is a blocking HTTP
+# round trip. Routers must go through run_query() so the call runs on a
+# bounded worker pool instead of stalling the event loop. The underlying
+# httpx.Client is shared by all workers and keeps its connections alive.
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "16"))
+
+# Calls beyond DB_MAX_CONCURRENCY wait in a bounded queue for at most
+# DB_QUEUE_TIMEOUT seconds; past either bound they are shed with
+# BackendOverloaded instead of piling up behind a slow or throttled upstream.
+DB_MAX_QUEUE = int(os.getenv("DB_MAX_QUEUE", "128"))
+DB_QUEUE_TIMEOUT = float(os.getenv("DB_QUEUE_TIMEOUT", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_CONCURRENCY, thread_name_prefix="supabase")
+
+
+class BackendOverloaded(Exception):
+    """A backend call was shed because the queue in front of Supabase is full or too slow."""
+
+
+# set per request by RateLimitMiddleware: routes that turn every exception into
+# a 500 would otherwise hide a shed call, which the client should see as a 503
+shed_calls = ContextVar("shed_calls", default=None)
+
+
+class AdmissionLimiter:
+    """
+    At most `limit` calls run at once; up to `max_queue` more wait in FIFO order,
+    each for at most `timeout` seconds. Not tied to one event loop, so scripts
+    that call asyncio.run() repeatedly can share the module-level instance.
+    """
+
+    def __init__(self, limit, max_queue, timeout):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters = deque()
+        self.shed_full = 0
+        self.shed_timeout = 0
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.shed_full += 1
+            raise BackendOverloaded("backend queue full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot straight to the waiter, so active is unchanged here
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.shed_timeout += 1
+            raise BackendOverloaded(f"waited over {self.timeout}s for a backend slot")
+        except asyncio.CancelledError:
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot arrived just as the caller gave up
+            raise
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def snapshot(self):
+        return {"active": self.active, "queued": len(self._waiters),
+                "shed_queue_full": self.shed_full, "shed_queue_timeout": self.shed_timeout}
+
+
+admission = AdmissionLimiter(DB_MAX_CONCURRENCY, DB_MAX_QUEUE, DB_QUEUE_TIMEOUT)
+metrics.register_snapshot("backend", admission.snapshot)
+
+
+async def run_query(query):
+    """Execute a postgrest query builder off the event loop and return its response."""
+    loop = asyncio.get_running_loop()
+    table, operation = describe_query(query)
+    submitted = time.perf_counter()
+    timing = {}
+
+    def execute():
+        timing["started"] = time.perf_counter()
+        return query.execute()
+
+    try:
+        await admission.acquire()
+    except BackendOverloaded as e:
+        shed = shed_calls.get()
+        if shed is not None:
+            shed.append(str(e))
+        metrics.observe_query(table, operation, time.perf_counter() - submitted, 0.0, False)
+        raise
+
+    ok = False
+    try:
+        response = await loop.run_in_executor(_executor, execute)
+        ok = True
+        return response
+    finally:
+        admission.release()
+        finished = time.perf_counter()
+        started = timing.get("started", finished)
+        metrics.observe_query(table, operation, started - submitted, finished - started, ok)
+
+
+async def run_queries(*queries):
+    """Execute independent queries concurrently; results keep the argument order."""
+    return await asyncio.gather(*(run_query(q) for q in queries))
+
+
+def embedded_one(value):
+    """One-to-one embeds come back as an object or a one-item list depending on the PostgREST version."""
+    if isinstance(value, list):
+        return value[0] if value else {}
+    return value or {}
+
+
+def shutdown():
+    _executor.shutdown(wait=True)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from loguru import logger
+from utils.tasks import tasks
+
+# Event types published by the routers
+JOB_CREATED = "job.created"
+JOB_STATUS = "job.status"
+APPLICATION_CREATED = "application.created"
+
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+# task that hands an event to the broker, off the request that published it
+PUBLISH_TASK = "events.publish"
+
+# job events reach every subscriber: nothing here may identify the employer
+JOB_EVENT_FIELDS = ("id", "category", "short_desc", "location", "salary", "created_at", "status")
+
+
+def job_event(job):
+    return {field: job.get(field) for field in JOB_EVENT_FIELDS}
+
+
+class Subscription:
+    """One connected client: a bounded queue plus the predicate deciding what it receives."""
+
+    def __init__(self, accepts, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.accepts = accepts
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, event):
+        if not self.accepts(event):
+            return
+        if self.queue.full():
+            # a slow consumer loses its oldest events rather than stalling publishers
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class InMemoryBroker:
+    """Delivers events within this process only."""
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def publish(self, event):
+        self._deliver(event)
+
+    async def stop(self):
+        pass
+
+
+class RedisBroker:
+    """Fans events out across worker processes through a Redis pub/sub channel."""
+
+    def __init__(self, url, channel="speedjobs:events"):
+        import redis.asyncio as redis  # optional dependency
+        self._redis = redis.from_url(url)
+        self.channel = channel
+        self._task = None
+
+    async def start(self, deliver):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel)
+
+        async def pump():
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    try:
+                        deliver(json.loads(message["data"]))
+                    except Exception as e:
+                        logger.warning(f"Dropping malformed event: {str(e)}")
+        self._task = asyncio.create_task(pump())
+
+    async def publish(self, event):
+        await self._redis.publish(self.channel, json.dumps(event, default=str))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        await self._redis.aclose()
+
+
+class EventBus:
+    """Publish/subscribe hub. Publishers hand events to the broker; the broker delivers them back to local subscribers."""
+
+    def __init__(self, broker=None):
+        self.broker = broker or InMemoryBroker()
+        self._subscribers = set()
+        self._started = False
+
+    async def start(self):
+        if not self._started:
+            await self.broker.start(self._deliver)
+            self._started = True
+
+    async def stop(self):
+        if self._started:
+            await self.broker.stop()
+            self._started = False
+
+    def _deliver(self, event):
+        for subscription in list(self._subscribers):
+            subscription.offer(event)
+
+    async def publish(self, event_type, data, owner=None):
+        """
+        Publish an event; never raises, so a broker hiccup can't fail the write
+        that triggered it. Events for a remote broker go through the task queue,
+        which retries them; in-process delivery has no I/O worth deferring (and
+        must stay in this process, whichever worker a queued task would reach).
+        owner (the job's as_emp_id) is for subscriber filters; clients only get data.
+        Ids are uuids: every worker publishing to a RedisBroker must hand out distinct ones.
+        """
+        event = {"id": uuid.uuid4().hex, "type": event_type, "ts": time.time(), "data": data, "owner": owner}
+        try:
+            if isinstance(self.broker, InMemoryBroker):
+                await self.send(event)
+            else:
+                await tasks.enqueue(PUBLISH_TASK, event)
+        except Exception as e:
+            logger.warning(f"Failed to publish {event_type}: {str(e)}")
+
+    async def send(self, event):
+        await self.start()
+        await self.broker.publish(event)
+
+    def subscribe(self, accepts):
+        subscription = Subscription(accepts)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+
+def _make_bus():
+    url = os.getenv("EVENTS_REDIS_URL", "")
+    if url:
+        try:
+            return EventBus(RedisBroker(url))
+        except ImportError:
+            logger.warning("EVENTS_REDIS_URL is set but redis is not installed; using the in-process broker")
+    return EventBus()
+
+
+events = _make_bus()
+tasks.register(PUBLISH_TASK, events.send)
@@ -0,0 +1,257 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import re
+import threading
+
+import httpx
+from loguru import logger
+from utils.cache import TTLCache
+from utils.supabase_client import supabase
+from utils.db import run_query
+from utils.tasks import TaskLimit
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+
+# Optional Nominatim-compatible endpoint, e.g. https://nominatim.openstreetmap.org/search
+GEOCODER_URL = os.getenv("GEOCODER_URL", "")
+# Optional JSON file of {"place name": [lat, lng]} checked before the remote geocoder
+GEO_GAZETTEER_PATH = os.getenv("GEO_GAZETTEER_PATH", "")
+# remote lookups running at once across every geocoding task; public Nominatim
+# instances allow about one request per second
+GEOCODE_CONCURRENCY = int(os.getenv("GEOCODE_CONCURRENCY", "1"))
+geocoder_limit = TaskLimit(GEOCODE_CONCURRENCY)
+
+_COORDS_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+_geocode_cache = TTLCache(maxsize=20_000, ttl=24 * 3600)
+_gazetteer = None
+_client = None
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def normalize_place(location):
+    return " ".join((location or "").lower().replace(",", " ").split())
+
+
+def _load_gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = {}
+        if GEO_GAZETTEER_PATH:
+            try:
+                with open(GEO_GAZETTEER_PATH) as f:
+                    _gazetteer = {normalize_place(k): tuple(v) for k, v in json.load(f).items()}
+            except Exception as e:
+                logger.warning(f"Could not load gazetteer {GEO_GAZETTEER_PATH}: {str(e)}")
+    return _gazetteer
+
+
+def geocode_local(location):
+    """
+    (resolved, coords) from a literal "lat, lng", the cache or the gazetteer,
+    without calling GEOCODER_URL. resolved is False when only the remote
+    geocoder can place the location: geocode() it later, off the request path.
+    """
+    if not location or not location.strip():
+        return True, None
+    match = _COORDS_RE.match(location)
+    if match:
+        lat, lng = float(match.group(1)), float(match.group(2))
+        return True, ((lat, lng) if -90 <= lat <= 90 and -180 <= lng <= 180 else None)
+
+    key = normalize_place(location)
+    cached = _geocode_cache.get(key)
+    if cached is not None:
+        return True, (cached or None)
+    coords = _load_gazetteer().get(key)
+    if coords is not None or not GEOCODER_URL:
+        _geocode_cache.set(key, coords or ())
+        return True, coords
+    return False, None
+
+
+def geocoder_client():
+    """One client for every lookup, so connections to GEOCODER_URL are reused; closed by the lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=5, headers={"User-Agent": "speedjobs-backend"})
+    return _client
+
+
+async def close_geocoder():
+    if _client is not None:
+        await _client.aclose()
+
+
+async def geocode(location, strict=False):
+    """
+    Resolve a free-text location to (lat, lng), or None if it cannot be placed.
+    Accepts literal "lat, lng" strings, then the local gazetteer, then GEOCODER_URL.
+    A failing geocoder gives None, or raises with strict=True so a task can retry.
+    """
+    resolved, coords = geocode_local(location)
+    if resolved:
+        return coords
+    try:
+        res = await geocoder_client().get(GEOCODER_URL, params={"q": location, "format": "json", "limit": 1})
+        res.raise_for_status()
+        hits = res.json()
+        if hits:
+            coords = (float(hits[0]["lat"]), float(hits[0]["lon"]))
+    except Exception as e:
+        if strict:
+            raise
+        logger.warning(f"geocode failed for {location!r}: {str(e)}")
+        return None
+    # remember misses too so unknown places don't hit the geocoder every time
+    _geocode_cache.set(normalize_place(location), coords or ())
+    return coords
+
+
+class GeoIndex:
+    """
+    In-process uniform grid over lat/lng. Each cell is cell_deg degrees square,
+    so a radius query only visits the cells overlapping the search circle.
+    """
+
+    def __init__(self, cell_deg=0.1):
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._points = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def add(self, key, lat, lng):
+        with self._lock:
+            self._discard(key)
+            cell = self._cell(lat, lng)
+            self._points[key] = (lat, lng, cell)
+            self._cells.setdefault(cell, {})[key] = (lat, lng)
+
+    def remove(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key):
+        old = self._points.pop(key, None)
+        if old:
+            bucket = self._cells.get(old[2])
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._cells[old[2]]
+
+    def get(self, key):
+        point = self._points.get(key)
+        return point[:2] if point else None
+
+    def __len__(self):
+        return len(self._points)
+
+    def _ring_cells(self, lat, lng, ring):
+        clat, clng = self._cell(lat, lng)
+        if ring == 0:
+            yield (clat, clng)
+            return
+        for dlat in range(-ring, ring + 1):
+            for dlng in range(-ring, ring + 1):
+                if max(abs(dlat), abs(dlng)) == ring:
+                    yield (clat + dlat, clng + dlng)
+
+    def _ring_reach_km(self, lat, ring):
+        # distance guaranteed covered once rings 0..ring have been scanned
+        lng_km = KM_PER_DEG_LAT * max(math.cos(math.radians(min(abs(lat), 89.0))), 1e-6)
+        return ring * self.cell_deg * min(KM_PER_DEG_LAT, lng_km)
+
+    def within(self, lat, lng, radius_km, limit=None):
+        """Keys within radius_km of (lat, lng) as [(distance_km, key)], nearest first."""
+        lng_scale = max(math.cos(math.radians(min(abs(lat), 89.0))), 1e-6)
+        rings = math.ceil(radius_km / (self.cell_deg * KM_PER_DEG_LAT * lng_scale)) + 1
+        hits = []
+        with self._lock:
+            for ring in range(rings + 1):
+                for cell in self._ring_cells(lat, lng, ring):
+                    for key, (plat, plng) in self._cells.get(cell, {}).items():
+                        d = haversine_km(lat, lng, plat, plng)
+                        if d <= radius_km:
+                            hits.append((d, key))
+        return heapq.nsmallest(limit, hits) if limit else sorted(hits)
+
+    def nearest(self, lat, lng, k, max_km=200.0):
+        """k nearest keys, widening ring by ring until the k-th hit is provably closest."""
+        heap = []
+        with self._lock:
+            for ring in itertools.count():
+                for cell in self._ring_cells(lat, lng, ring):
+                    for key, (plat, plng) in self._cells.get(cell, {}).items():
+                        d = haversine_km(lat, lng, plat, plng)
+                        if d <= max_km:
+                            heapq.heappush(heap, (-d, key))
+                            if len(heap) > k:
+                                heapq.heappop(heap)
+                reach = self._ring_reach_km(lat, ring)
+                if reach >= max_km or (len(heap) == k and -heap[0][0] <= reach):
+                    break
+        return sorted((-d, key) for d, key in heap)
+
+    async def ensure_loaded(self, loader):
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await loader(self)
+                self.loaded = True
+
+    async def reload(self, loader):
+        """Rebuild with loader and swap it in; queries keep using the old grid meanwhile. No-op until loaded."""
+        if not self.loaded:
+            return
+        fresh = GeoIndex(self.cell_deg)
+        await loader(fresh)
+        with self._lock:
+            self._cells, self._points = fresh._cells, fresh._points
+
+
+job_index = GeoIndex()
+parttimer_index = GeoIndex()
+
+
+async def _load_table(index, table, key_column, filters=(), batch=1000):
+    last_key = None
+    while True:
+        query = supabase.from_(table).select(f"{key_column}, lat, lng").gte("lat", -90)
+        for column, value in filters:
+            query = query.eq(column, value)
+        if last_key is not None:
+            query = query.gt(key_column, last_key)
+        result = await run_query(query.order(key_column).limit(batch))
+        rows = result.data or []
+        for row in rows:
+            if row.get("lat") is not None and row.get("lng") is not None:
+                index.add(row[key_column], row["lat"], row["lng"])
+        if len(rows) < batch:
+            break
+        last_key = rows[-1][key_column]
+    logger.info(f"Loaded {len(index)} {table} coordinates into the geo index")
+
+
+async def load_job_index(index):
+    await _load_table(index, "joblist", "id", filters=[("status", "active")])
+
+
+async def load_parttimer_index(index):
+    await _load_table(index, "as_parttimer", "id")
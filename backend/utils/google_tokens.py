@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import re
+import time
+
+import httpx
+import jwt
+from jwt.algorithms import RSAAlgorithm
+from loguru import logger
+
+GOOGLE_JWKS_URL = os.getenv("GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
+GOOGLE_TOKENINFO_URL = os.getenv("GOOGLE_TOKENINFO_URL", "https://oauth2.googleapis.com/tokeninfo")
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# Fall back to the tokeninfo endpoint when the key set cannot be fetched
+GOOGLE_TOKENINFO_FALLBACK = os.getenv("GOOGLE_TOKENINFO_FALLBACK", "true").lower() == "true"
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleTokenError(Exception):
+    """The ID token is malformed, expired, or not issued for this client."""
+
+
+class GoogleKeySet:
+    """
+    Google's signing keys, cached in-process for as long as the JWKS response's
+    Cache-Control max-age allows. An unknown kid triggers an early refresh
+    (rate limited by min_refresh_interval) to pick up rotated keys.
+    """
+
+    def __init__(self, url=GOOGLE_JWKS_URL, default_ttl=3600, min_refresh_interval=30):
+        self.url = url
+        self.default_ttl = default_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._client = None
+
+    def set_keys(self, jwks, ttl=None):
+        """Install a JWKS document ({"keys": [...]}), e.g. a locally generated test key set."""
+        self._keys = {jwk["kid"]: RSAAlgorithm.from_jwk(json.dumps(jwk)) for jwk in jwks.get("keys", [])}
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + (self.default_ttl if ttl is None else ttl)
+
+    def http_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=5)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def refresh(self):
+        res = await self.http_client().get(self.url)
+        res.raise_for_status()
+        match = _MAX_AGE_RE.search(res.headers.get("cache-control", ""))
+        self.set_keys(res.json(), ttl=int(match.group(1)) if match else None)
+        logger.info(f"Loaded {len(self._keys)} Google signing keys")
+
+    async def get_key(self, kid):
+        now = time.monotonic()
+        stale = now >= self._expires_at
+        unknown = kid not in self._keys and now - self._fetched_at >= self.min_refresh_interval
+        if stale or unknown:
+            async with self._lock:
+                now = time.monotonic()
+                if now >= self._expires_at or (kid not in self._keys and now - self._fetched_at >= self.min_refresh_interval):
+                    await self.refresh()
+        return self._keys.get(kid)
+
+
+google_keys = GoogleKeySet()
+
+
+async def _tokeninfo(token, client_id):
+    res = await google_keys.http_client().get(GOOGLE_TOKENINFO_URL, params={"id_token": token})
+    if res.status_code != 200:
+        raise GoogleTokenError(f"Token verification failed: {res.text}")
+    claims = res.json()
+    if claims.get("aud") != client_id:
+        raise GoogleTokenError("Token audience mismatch.")
+    return claims
+
+
+async def verify_google_id_token(token, client_id):
+    """Verify a Google ID token locally against the cached JWKS and return its claims."""
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.PyJWTError as e:
+        raise GoogleTokenError(f"Malformed token: {str(e)}")
+
+    try:
+        key = await google_keys.get_key(header.get("kid"))
+    except httpx.HTTPError as e:
+        if not GOOGLE_TOKENINFO_FALLBACK:
+            raise GoogleTokenError(f"Could not fetch Google signing keys: {str(e)}")
+        logger.warning(f"JWKS fetch failed, falling back to tokeninfo: {str(e)}")
+        try:
+            return await _tokeninfo(token, client_id)
+        except httpx.HTTPError as e:
+            raise GoogleTokenError(f"Google token verification failed: {str(e)}")
+
+    if key is None:
+        raise GoogleTokenError("Unknown signing key")
+    try:
+        claims = jwt.decode(token, key, algorithms=["RS256"], audience=client_id)
+    except jwt.InvalidAudienceError:
+        raise GoogleTokenError("Token audience mismatch.")
+    except jwt.PyJWTError as e:
+        raise GoogleTokenError(f"Invalid token: {str(e)}")
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise GoogleTokenError("Invalid token issuer")
+    return claims
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import os
+
+from fastapi import HTTPException
+from loguru import logger
+
+from utils.job_cache import make_cache_backend
+from utils.metrics import metrics
+from utils.responses import dumps
+
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "20000"))
+# long enough to cover a mobile client's retry window
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# "" keeps results in this process, so a retry that reaches another worker runs
+# again; sqlite:///path/to/file or redis://host:port/db share them (as JOB_CACHE_URL)
+IDEMPOTENCY_URL = os.getenv("IDEMPOTENCY_URL", "")
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def fingerprint(payload):
+    """Stable digest of a request's meaningful inputs, to catch a key reused for a different request."""
+    return hashlib.sha256(dumps(payload)).hexdigest()
+
+
+class IdempotencyCache:
+    """
+    Results of write requests that carried an Idempotency-Key, per user and
+    endpoint. A retry with the same key gets the first result back without
+    touching the database; a concurrent duplicate waits for the first attempt
+    instead of racing it. Only successful results are kept, so a request that
+    failed can be retried with the same key. Results live in a job-cache
+    backend (IDEMPOTENCY_URL); waiting for an attempt in flight only works
+    within one worker.
+    """
+
+    def __init__(self, backend=None, ttl=IDEMPOTENCY_TTL):
+        if backend is None:
+            backend = make_cache_backend(IDEMPOTENCY_URL, IDEMPOTENCY_CACHE_SIZE, "IDEMPOTENCY_URL")
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight = {}
+        self.stored = 0
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+        self.errors = 0
+
+    async def _get(self, cache_key):
+        try:
+            return await self.backend.get(cache_key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Idempotency store read failed: {str(e)}")
+            return None
+
+    async def _set(self, cache_key, entry):
+        try:
+            await self.backend.set(cache_key, entry, self.ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Idempotency store write failed: {str(e)}")
+
+    async def run(self, scope, key, payload, compute, response=None):
+        """
+        Returns compute()'s result, or the stored result of an earlier request
+        with the same (scope, key). Without a key this is just compute().
+        """
+        if not key:
+            return await compute()
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+        cache_key = "idempotency:" + ":".join(str(part) for part in (*scope, key))
+        digest = fingerprint(payload)
+
+        while True:
+            entry = await self._get(cache_key)
+            if entry is not None:
+                return self._replay(entry, digest, response)
+            pending = self._inflight.get(cache_key)
+            if pending is None:
+                break
+            self.waited += 1
+            # the first attempt's outcome decides: replay its result, or retry if it failed
+            await asyncio.shield(pending)
+
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = pending
+        try:
+            result = await compute()
+            await self._set(cache_key, [digest, result])
+            self.stored += 1
+            return result
+        finally:
+            del self._inflight[cache_key]
+            pending.set_result(None)
+
+    def _replay(self, entry, digest, response):
+        stored_digest, result = entry
+        if stored_digest != digest:
+            self.conflicts += 1
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        self.replayed += 1
+        if response is not None:
+            response.headers[REPLAYED_HEADER] = "true"
+        return result
+
+    def snapshot(self):
+        return {
+            "size": len(self.backend),
+            "inflight": len(self._inflight),
+            "stored": self.stored,
+            "replayed": self.replayed,
+            "waited": self.waited,
+            "conflicts": self.conflicts,
+            "errors": self.errors,
+        }
+
+
+idempotency = IdempotencyCache()
+metrics.register_snapshot("idempotency", idempotency.snapshot)
@@ -0,0 +1,129 @@
+import asyncio
+import contextvars
+import os
+import random
+
+from loguru import logger
+
+from utils.db import run_query
+from utils.events import events, InMemoryBroker, JOB_CREATED, JOB_STATUS
+from utils.geo import job_index, parttimer_index, load_job_index, load_parttimer_index
+from utils.matching import matching, JOB_SUMMARY_FIELDS
+from utils.metrics import metrics
+from utils.search import search_index, SUMMARY_FIELDS, FIELD_WEIGHTS
+from utils.supabase_client import supabase
+
+# every index is rebuilt from the database this often; 0 only follows job events
+INDEX_RELOAD_INTERVAL = float(os.getenv("INDEX_RELOAD_INTERVAL", "300"))
+# job ids re-read per query when following events
+INDEX_SYNC_BATCH = 200
+
+JOB_INDEX_COLUMNS = ", ".join(dict.fromkeys(SUMMARY_FIELDS + tuple(FIELD_WEIGHTS) + JOB_SUMMARY_FIELDS + ("lat", "lng")))
+
+
+def index_job(job):
+    """Bring this worker's job indexes in line with one joblist row."""
+    if job.get("status") == "active" and job.get("lat") is not None and job.get("lng") is not None:
+        job_index.add(job["id"], job["lat"], job["lng"])
+    else:
+        job_index.remove(job["id"])
+    matching.add_job(job)
+    search_index.add(job)
+
+
+def forget_job(job_id):
+    job_index.remove(job_id)
+    matching.remove_job(job_id)
+    search_index.remove(job_id)
+
+
+class IndexSync:
+    """
+    The search, geo and matching indexes live in each worker and are updated by
+    the worker that handles a write. With a broker shared by the workers
+    (EVENTS_REDIS_URL), job.created and job.status events from every worker are
+    followed here: the jobs they name are re-read from joblist in batches and
+    re-indexed (this worker's own writes too, which costs one batched read), so
+    the events themselves carry nothing the indexes need. Every reload_interval
+    seconds all indexes are also rebuilt, which is the only way part-timer
+    changes and writes made outside the API reach this worker.
+    """
+
+    def __init__(self, reload_interval=INDEX_RELOAD_INTERVAL, follow=None):
+        self.reload_interval = reload_interval
+        # a process-local broker only carries this worker's own writes, which are indexed already
+        self.follow = not isinstance(events.broker, InMemoryBroker) if follow is None else follow
+        self.synced = 0
+        self.reloads = 0
+        self.errors = 0
+        self._follower = None
+        self._reloader = None
+        self._subscription = None
+
+    async def sync_jobs(self, job_ids):
+        """Re-read and re-index jobs changed elsewhere; ones no longer in joblist (archived) are dropped."""
+        result = await run_query(supabase.from_("joblist").select(JOB_INDEX_COLUMNS).in_("id", list(job_ids)))
+        rows = {str(job["id"]): job for job in result.data or []}
+        for job_id in job_ids:
+            job = rows.get(str(job_id))
+            if job is None:
+                forget_job(job_id)
+            else:
+                index_job(job)
+        self.synced += len(job_ids)
+
+    async def reload(self):
+        await search_index.reload()
+        await job_index.reload(load_job_index)
+        await parttimer_index.reload(load_parttimer_index)
+        await matching.reload()
+        self.reloads += 1
+
+    async def _follow(self):
+        queue = self._subscription.queue
+        while True:
+            job_ids = {(await queue.get())["data"]["id"]}
+            while not queue.empty() and len(job_ids) < INDEX_SYNC_BATCH:
+                job_ids.add(queue.get_nowait()["data"]["id"])
+            try:
+                await self.sync_jobs(job_ids)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Index sync of {len(job_ids)} jobs failed, the next reload catches up: {str(e)}")
+
+    async def _reload_periodically(self):
+        # workers started together would otherwise reload in lockstep
+        await asyncio.sleep(self.reload_interval * random.uniform(1, 1.5))
+        while True:
+            try:
+                await self.reload()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Index reload failed, retrying in {self.reload_interval:.0f}s: {str(e)}")
+            await asyncio.sleep(self.reload_interval)
+
+    async def start(self):
+        # a fresh context, as for the task queue: syncing is not part of any request
+        create_task = asyncio.get_running_loop().create_task
+        if self.follow and self._follower is None:
+            self._subscription = events.subscribe(
+                lambda event: event.get("type") in (JOB_CREATED, JOB_STATUS) and "id" in (event.get("data") or {}))
+            self._follower = contextvars.Context().run(create_task, self._follow())
+        if self.reload_interval > 0 and self._reloader is None:
+            self._reloader = contextvars.Context().run(create_task, self._reload_periodically())
+
+    async def stop(self):
+        tasks = [task for task in (self._follower, self._reloader) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._subscription is not None:
+            events.unsubscribe(self._subscription)
+        self._follower = self._reloader = self._subscription = None
+
+    def snapshot(self):
+        return {"synced": self.synced, "reloads": self.reloads, "errors": self.errors}
+
+
+index_sync = IndexSync()
+metrics.register_snapshot("index_sync", index_sync.snapshot)
@@ -0,0 +1,231 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+import orjson
+from loguru import logger
+
+from utils.cache import TTLCache
+from utils.metrics import metrics
+from utils.responses import dumps
+
+JOB_CACHE_ENABLED = os.getenv("JOB_CACHE_ENABLED", "1") == "1"
+# "" keeps entries in this process; redis://host:port/db shares them across workers
+# and hosts; sqlite:///path/to/file is a stand-in for workers on one machine
+JOB_CACHE_URL = os.getenv("JOB_CACHE_URL", "")
+JOB_CACHE_SIZE = int(os.getenv("JOB_CACHE_SIZE", "20000"))
+# writes invalidate explicitly; the TTL only bounds staleness from writes made elsewhere
+JOB_CACHE_TTL = float(os.getenv("JOB_CACHE_TTL", "60"))
+
+
+def employer_jobs_key(as_emp_id):
+    return f"employer_jobs:{as_emp_id}"
+
+
+def job_key(job_id):
+    return f"job:{job_id}"
+
+
+class LocalCacheBackend:
+    """Entries in this process only: fastest, but other workers won't see invalidations."""
+
+    def __init__(self, maxsize=JOB_CACHE_SIZE):
+        self._entries = TTLCache(maxsize=maxsize)
+
+    async def get(self, key):
+        return self._entries.get(key)
+
+    async def set(self, key, value, ttl):
+        self._entries.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self._entries.pop(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Entries in Redis, shared by every worker and replica; an invalidation anywhere is seen everywhere."""
+
+    def __init__(self, url, prefix="speedjobs:cache:"):
+        import redis.asyncio as redis  # optional dependency
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key):
+        raw = await self._redis.get(self.prefix + key)
+        return None if raw is None else orjson.loads(raw)
+
+    async def set(self, key, value, ttl):
+        await self._redis.set(self.prefix + key, dumps(value), px=max(1, int(ttl * 1000)))
+
+    async def delete(self, *keys):
+        await self._redis.delete(*(self.prefix + key for key in keys))
+
+    def __len__(self):
+        return 0
+
+
+class SqliteCacheBackend:
+    """
+    Entries in a SQLite file that every worker on the machine opens: the shared
+    store without running Redis, for development and single-host deployments.
+    Least recently written entries are trimmed past maxsize.
+    """
+
+    def __init__(self, path, maxsize=JOB_CACHE_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as db:
+            db.execute("create table if not exists cache (key text primary key, value blob, expires real)")
+            db.execute("create index if not exists cache_expires on cache (expires)")
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("pragma journal_mode=wal")
+            db.execute("pragma synchronous=normal")
+        return db
+
+    def _get(self, key):
+        row = self._connect().execute("select value, expires from cache where key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return orjson.loads(row[0])
+
+    def _set(self, key, value, ttl):
+        db = self._connect()
+        db.execute("insert or replace into cache (key, value, expires) values (?, ?, ?)",
+                   (key, dumps(value), time.time() + ttl))
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            db.execute("delete from cache where expires <= ?", (time.time(),))
+            db.execute("delete from cache where key not in (select key from cache order by expires desc limit ?)",
+                       (self.maxsize,))
+
+    def _delete(self, keys):
+        self._connect().executemany("delete from cache where key = ?", [(key,) for key in keys])
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, value, ttl):
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def delete(self, *keys):
+        await asyncio.to_thread(self._delete, keys)
+
+    def __len__(self):
+        return self._connect().execute("select count(*) from cache").fetchone()[0]
+
+
+def make_cache_backend(url=JOB_CACHE_URL, maxsize=JOB_CACHE_SIZE, setting="JOB_CACHE_URL"):
+    if url.startswith("sqlite:///"):
+        return SqliteCacheBackend(url[len("sqlite:///"):], maxsize=maxsize)
+    if url:
+        try:
+            return RedisCacheBackend(url)
+        except ImportError:
+            logger.warning(f"{setting} is set but redis is not installed; caching in-process")
+    return LocalCacheBackend(maxsize=maxsize)
+
+
+class ReadThroughCache:
+    """
+    get_or_load() serves from the backend or runs the loader once per key,
+    however many requests miss at the same time. A load that overlaps an
+    invalidation in this process is returned but not stored, so a write can't
+    be undone by a read that started before it. Backend failures count as
+    misses: the cache can slow nothing down but itself.
+    """
+
+    def __init__(self, backend, ttl=JOB_CACHE_TTL, enabled=JOB_CACHE_ENABLED):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self._inflight = {}
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidated = 0
+        self.errors = 0
+
+    async def get_or_load(self, key, load):
+        if not self.enabled:
+            return await load()
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache read failed for {key}: {str(e)}")
+            value = None
+        if value is not None:
+            self.hits += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this request was cancelled, not the load
+                return await self.get_or_load(key, load)  # the loading request went away; try again
+        self.misses += 1
+        pending = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            invalidations = self._invalidations
+            value = await load()
+            if value is not None and invalidations == self._invalidations:
+                try:
+                    await self.backend.set(key, value, self.ttl)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"Cache write failed for {key}: {str(e)}")
+            pending.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            pending.exception()  # waiters re-raise it; don't warn when there are none
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def invalidate(self, *keys):
+        self._invalidations += 1
+        self.invalidated += len(keys)
+        if not self.enabled:
+            return
+        try:
+            await self.backend.delete(*keys)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache invalidation failed for {', '.join(keys)}: {str(e)}")
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidated": self.invalidated,
+            "errors": self.errors,
+            "size": len(self.backend),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+job_cache = ReadThroughCache(make_cache_backend())
+metrics.register_snapshot("job_cache", job_cache.snapshot)
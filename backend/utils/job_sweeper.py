@@ -0,0 +1,137 @@
+import asyncio
+import contextvars
+import os
+import random
+import time
+
+from loguru import logger
+
+from utils.db import run_query
+from utils.events import events, job_event, JOB_STATUS
+from utils.index_sync import index_job, forget_job
+from utils.job_cache import job_cache, employer_jobs_key, job_key
+from utils.metrics import metrics
+from utils.supabase_client import supabase
+
+# "0" leaves every job active until its employer changes the status
+JOB_SWEEP_ENABLED = os.getenv("JOB_SWEEP_ENABLED", "1") == "1"
+JOB_SWEEP_INTERVAL = float(os.getenv("JOB_SWEEP_INTERVAL", "300"))
+JOB_SWEEP_BATCH = int(os.getenv("JOB_SWEEP_BATCH", "500"))
+# batches per step and pass, so one pass over a large backlog can't hold the backend for long
+JOB_SWEEP_MAX_BATCHES = int(os.getenv("JOB_SWEEP_MAX_BATCHES", "20"))
+# jobs that ended this many days ago move to joblist_archive; 0 keeps them in joblist
+JOB_ARCHIVE_AFTER_DAYS = int(os.getenv("JOB_ARCHIVE_AFTER_DAYS", "90"))
+
+
+async def apply_job_statuses(jobs):
+    """Bring this worker's caches and indexes in line with jobs whose status changed, and tell subscribers."""
+    keys = {key for job in jobs for key in (employer_jobs_key(job.get("as_emp_id")), job_key(job["id"]))}
+    await job_cache.invalidate(*keys)
+    for job in jobs:
+        index_job(job)
+        await events.publish(JOB_STATUS, job_event(job), owner=job.get("as_emp_id"))
+
+
+async def forget_jobs(jobs):
+    """Jobs moved to the archive: drop them from the caches and indexes."""
+    keys = {key for job in jobs for key in (employer_jobs_key(job.get("as_emp_id")), job_key(job["id"]))}
+    await job_cache.invalidate(*keys)
+    for job in jobs:
+        forget_job(job["id"])
+
+
+class JobSweeper:
+    """
+    Moves jobs through their lifecycle with the batched functions in
+    sql/008_job_lifecycle.sql: filled once an application is accepted, expired
+    once duration_upto has passed, archived JOB_ARCHIVE_AFTER_DAYS after that.
+    Every worker sweeps; the database hands each job to one of them. Status
+    changes made by other workers reach this one's indexes through
+    utils.index_sync.
+    """
+
+    def __init__(self, interval=JOB_SWEEP_INTERVAL, batch=JOB_SWEEP_BATCH, max_batches=JOB_SWEEP_MAX_BATCHES,
+                 archive_after_days=JOB_ARCHIVE_AFTER_DAYS):
+        self.enabled = JOB_SWEEP_ENABLED
+        self.interval = interval
+        self.batch = batch
+        self.max_batches = max_batches
+        self.archive_after_days = archive_after_days
+        self.passes = 0
+        self.filled = 0
+        self.expired = 0
+        self.archived = 0
+        self.errors = 0
+        self.last_sweep_seconds = 0.0
+        self._task = None
+
+    async def _drain(self, function, params, apply):
+        """Call a lifecycle function until a batch comes back short; returns how many rows it moved."""
+        moved = 0
+        for _ in range(self.max_batches):
+            response = await run_query(supabase.rpc(function, {**params, "batch_size": self.batch}))
+            rows = response.data or []
+            if rows:
+                await apply(rows)
+            moved += len(rows)
+            if len(rows) < self.batch:
+                break
+        return moved
+
+    async def sweep(self):
+        """One pass; returns the number of jobs filled, expired and archived."""
+        started = time.perf_counter()
+        counts = {
+            "filled": await self._drain("fill_jobs", {}, apply_job_statuses),
+            "expired": await self._drain("expire_jobs", {}, apply_job_statuses),
+            "archived": 0,
+        }
+        if self.archive_after_days > 0:
+            counts["archived"] = await self._drain(
+                "archive_jobs", {"archive_after_days": self.archive_after_days}, forget_jobs)
+        self.passes += 1
+        self.filled += counts["filled"]
+        self.expired += counts["expired"]
+        self.archived += counts["archived"]
+        self.last_sweep_seconds = time.perf_counter() - started
+        if any(counts.values()):
+            logger.info(f"Job sweep: {counts['filled']} filled, {counts['expired']} expired, "
+                        f"{counts['archived']} archived in {self.last_sweep_seconds * 1000:.0f}ms")
+        return counts
+
+    async def _run(self):
+        # workers started together would otherwise sweep in lockstep
+        await asyncio.sleep(random.uniform(0, self.interval))
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Job sweep failed, retrying in {self.interval:.0f}s: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        # a fresh context, as for the task queue: sweeps are not part of any request
+        self._task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def snapshot(self):
+        return {
+            "passes": self.passes,
+            "filled": self.filled,
+            "expired": self.expired,
+            "archived": self.archived,
+            "errors": self.errors,
+            "last_sweep_ms": round(self.last_sweep_seconds * 1000, 1),
+        }
+
+
+job_sweeper = JobSweeper()
+metrics.register_snapshot("job_sweeper", job_sweeper.snapshot)
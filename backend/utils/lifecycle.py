@@ -0,0 +1,139 @@
+import asyncio
+import os
+import time
+
+from loguru import logger
+
+from utils import db
+from utils.auth import check_signing_keys, JWT_LEGACY_SECRET
+from utils.events import events
+from utils.geo import job_index, parttimer_index, load_job_index, load_parttimer_index, close_geocoder
+from utils.google_tokens import google_keys
+from utils.index_sync import index_sync
+from utils.job_sweeper import job_sweeper
+from utils.matching import matching
+from utils.metrics import metrics
+from utils.search import search_index
+from utils.supabase_client import supabase
+from utils.taxonomy import taxonomy
+from utils.tasks import tasks
+
+REQUIRED_ENV = ("SUPABASE_URL", "SUPABASE_ANON_KEY", "GOOGLE_CLIENT_ID")
+# per step; a warmup that fails or times out is retried lazily by the first request that needs it
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "10"))
+# load the search, geo and matching indexes in the background and hold /readyz until they are in
+WARMUP_INDEXES = os.getenv("WARMUP_INDEXES", "1") == "1"
+# how long /readyz waits for them; a slower index keeps loading after the worker reports ready
+INDEX_WARMUP_TIMEOUT = float(os.getenv("INDEX_WARMUP_TIMEOUT", "60"))
+# how long shutdown waits for background tasks already running
+TASKS_STOP_TIMEOUT = float(os.getenv("TASKS_STOP_TIMEOUT", "10"))
+
+
+def check_config():
+    missing = [name for name in REQUIRED_ENV if not os.getenv(name)]
+    if missing:
+        raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
+    check_signing_keys()
+    if JWT_LEGACY_SECRET:
+        logger.warning("JWT_LEGACY_SECRET is set: tokens without kid or exp are still accepted")
+
+
+async def _warm(name, step, timeout=WARMUP_TIMEOUT):
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(step, timeout=timeout)
+        logger.info(f"Warmed {name} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return True
+    except Exception as e:
+        logger.warning(f"Warming {name} failed, it will load on first use: {str(e) or type(e).__name__}")
+        return False
+
+
+class Lifecycle:
+    """
+    Startup, readiness and shutdown for one worker process. startup() runs from
+    the lifespan hook before the worker accepts requests: it checks the config,
+    creates the Supabase client and loads what the first requests would
+    otherwise wait on. The larger in-memory indexes load in the background;
+    /readyz reports ready once they are in and until a drain starts.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.warm = False
+        self.draining = False
+        self.warmup_seconds = 0.0
+        self._warmup_task = None
+        self._index_loads = []
+
+    @property
+    def ready(self):
+        return self.started and self.warm and not self.draining
+
+    async def startup(self):
+        started = time.perf_counter()
+        check_config()
+        supabase.connect()
+        await asyncio.gather(
+            _warm("taxonomy", taxonomy.get()),
+            _warm("Google signing keys", google_keys.refresh()),
+            _warm("event bus", events.start()),
+        )
+        await tasks.start()
+        await job_sweeper.start()
+        await index_sync.start()
+        self.started = True
+        if WARMUP_INDEXES:
+            self._warmup_task = asyncio.create_task(self._warm_indexes(started))
+        else:
+            self._finish_warmup(started)
+
+    async def _warm_indexes(self, started):
+        loads = {
+            "search index": search_index.ensure_loaded(),
+            "job geo index": job_index.ensure_loaded(load_job_index),
+            "part-timer geo index": parttimer_index.ensure_loaded(load_parttimer_index),
+            "matching engine": matching.ensure_loaded(),
+        }
+        self._index_loads = [asyncio.ensure_future(load) for load in loads.values()]
+        # shielded: timing out only stops holding readiness back, the load carries on
+        await asyncio.gather(*(_warm(name, asyncio.shield(load), INDEX_WARMUP_TIMEOUT)
+                               for name, load in zip(loads, self._index_loads)))
+        self._finish_warmup(started)
+
+    def _finish_warmup(self, started):
+        self.warm = True
+        self.warmup_seconds = time.perf_counter() - started
+        logger.info(f"Worker {os.getpid()} ready after {self.warmup_seconds:.2f}s")
+
+    def begin_drain(self):
+        """Fail readiness so the load balancer stops routing here; requests are still served."""
+        if not self.draining:
+            self.draining = True
+            logger.info(f"Worker {os.getpid()} draining")
+
+    async def shutdown(self):
+        self.begin_drain()
+        for task in [self._warmup_task, *self._index_loads]:
+            if task is not None and not task.done():
+                task.cancel()
+        await index_sync.stop()
+        await job_sweeper.stop()
+        await tasks.stop(TASKS_STOP_TIMEOUT)
+        await events.stop()
+        await google_keys.aclose()
+        await close_geocoder()
+        await asyncio.to_thread(db.shutdown)
+        supabase.close()
+        self.started = False
+
+    def snapshot(self):
+        return {
+            "ready": int(self.ready),
+            "draining": int(self.draining),
+            "warmup_seconds": round(self.warmup_seconds, 3),
+        }
+
+
+lifecycle = Lifecycle()
+metrics.register_snapshot("lifecycle", lifecycle.snapshot)
@@ -0,0 +1,254 @@
+import asyncio
+import heapq
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+from loguru import logger
+from utils.geo import normalize_place
+from utils.supabase_client import supabase
+from utils.db import run_query
+
+ANY_CATEGORY = "*"
+JOB_SUMMARY_FIELDS = ("id", "as_emp_id", "category", "short_desc", "location", "salary", "created_at", "status")
+
+
+class _Greatest:
+    """Sorts after every key, for bisecting to the end of a run of equal scores."""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_GREATEST = _Greatest()
+
+
+class RankedBucket:
+    """Keys kept sorted by descending score, so the best k are a slice and a score floor is a bisect."""
+
+    def __init__(self):
+        self._scores = {}
+        self._order = []  # (-score, key)
+
+    def upsert(self, key, score):
+        self.remove(key)
+        self._scores[key] = score
+        insort(self._order, (-score, key))
+
+    def remove(self, key):
+        score = self._scores.pop(key, None)
+        if score is not None:
+            i = bisect_left(self._order, (-score, key))
+            if i < len(self._order) and self._order[i] == (-score, key):
+                self._order.pop(i)
+
+    def score(self, key):
+        return self._scores.get(key)
+
+    def iter_ranked(self, min_score=None):
+        end = len(self._order) if min_score is None else bisect_right(self._order, (-min_score, _GREATEST))
+        for i in range(end):
+            yield self._order[i]
+
+    def __len__(self):
+        return len(self._order)
+
+
+class MatchingEngine:
+    """
+    Incrementally maintained indexes for recommendations:
+
+    - jobs: (location, category) -> jobs ranked by salary, plus a category -> locations
+      inverted index, so top-K jobs for a part-timer merges only the buckets in their area.
+    - part-timers: (location, category) -> part-timers ranked by applications made in that
+      category, and (location, "*") -> every available part-timer ranked by total applications.
+
+    top-K is a heapq.merge over the already-sorted buckets, i.e. O(K log B) for B buckets.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = {}
+        self._job_buckets = {}
+        self._locations_by_category = {}
+        self._categories_by_location = {}
+        self.parttimers = {}
+        self._parttimer_buckets = {}
+        self._experience = {}
+        self.inactive_employers = set()
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+
+    # ------------------------------------------------------------ jobs
+
+    def add_job(self, job):
+        if job.get("status", "active") != "active":
+            self.remove_job(job.get("id"))
+            return
+        summary = {field: job.get(field) for field in JOB_SUMMARY_FIELDS}
+        location, category = normalize_place(job.get("location")), job.get("category") or ""
+        with self._lock:
+            self._remove_job(summary["id"])
+            self.jobs[summary["id"]] = (location, category, summary)
+            self._job_buckets.setdefault((location, category), RankedBucket()).upsert(summary["id"], float(job.get("salary") or 0))
+            self._locations_by_category.setdefault(category, set()).add(location)
+            self._categories_by_location.setdefault(location, set()).add(category)
+
+    def remove_job(self, job_id):
+        with self._lock:
+            self._remove_job(job_id)
+
+    def _remove_job(self, job_id):
+        entry = self.jobs.pop(job_id, None)
+        if entry:
+            location, category, _ = entry
+            bucket = self._job_buckets.get((location, category))
+            if bucket is not None:
+                bucket.remove(job_id)
+                if not len(bucket):
+                    del self._job_buckets[(location, category)]
+                    self._locations_by_category.get(category, set()).discard(location)
+                    self._categories_by_location.get(location, set()).discard(category)
+
+    def set_employer_active(self, as_emp_id, active):
+        if active:
+            self.inactive_employers.discard(as_emp_id)
+        else:
+            self.inactive_employers.add(as_emp_id)
+
+    def recommend_jobs(self, location, k, categories=None, min_salary=None):
+        """Top-k active jobs in the part-timer's location, best paid first."""
+        location = normalize_place(location)
+        with self._lock:
+            wanted = categories or self._categories_by_location.get(location, ())
+            streams = [
+                self._job_buckets[(location, c)].iter_ranked(min_salary)
+                for c in wanted if (location, c) in self._job_buckets
+            ]
+            results = []
+            for neg_salary, job_id in heapq.merge(*streams):
+                summary = self.jobs[job_id][2]
+                if summary.get("as_emp_id") in self.inactive_employers:
+                    continue
+                results.append({**summary, "score": -neg_salary})
+                if len(results) >= k:
+                    break
+            return results
+
+    # ------------------------------------------------------------ part-timers
+
+    def update_parttimer(self, user_id, location, available=True):
+        location = normalize_place(location)
+        with self._lock:
+            self._remove_parttimer(user_id)
+            if not available or not location:
+                return
+            self.parttimers[user_id] = location
+            experience = self._experience.get(user_id, {})
+            self._parttimer_buckets.setdefault((location, ANY_CATEGORY), RankedBucket()).upsert(user_id, float(sum(experience.values())))
+            for category, count in experience.items():
+                self._parttimer_buckets.setdefault((location, category), RankedBucket()).upsert(user_id, float(count))
+
+    def _remove_parttimer(self, user_id):
+        location = self.parttimers.pop(user_id, None)
+        if location is None:
+            return
+        for category in list(self._experience.get(user_id, {})) + [ANY_CATEGORY]:
+            bucket = self._parttimer_buckets.get((location, category))
+            if bucket is not None:
+                bucket.remove(user_id)
+
+    def record_application(self, user_id, job_id=None, category=None):
+        if not self.loaded:
+            # the initial load counts every stored application itself
+            return
+        with self._lock:
+            if category is None and job_id in self.jobs:
+                category = self.jobs[job_id][1]
+            if not category:
+                return
+            experience = self._experience.setdefault(user_id, {})
+            experience[category] = experience.get(category, 0) + 1
+            location = self.parttimers.get(user_id)
+            if location is not None:
+                self._parttimer_buckets.setdefault((location, category), RankedBucket()).upsert(user_id, float(experience[category]))
+                self._parttimer_buckets[(location, ANY_CATEGORY)].upsert(user_id, float(sum(experience.values())))
+
+    def recommend_parttimers(self, location, category, k):
+        """Top-k available part-timers in the job's location: experienced in its category first, then the rest."""
+        location = normalize_place(location)
+        with self._lock:
+            results, seen = [], set()
+            for key in ((location, category), (location, ANY_CATEGORY)):
+                bucket = self._parttimer_buckets.get(key)
+                if bucket is None:
+                    continue
+                for neg_score, user_id in bucket.iter_ranked():
+                    if user_id in seen:
+                        continue
+                    seen.add(user_id)
+                    results.append({"id": user_id, "category_experience": self._experience.get(user_id, {}).get(category, 0)})
+                    if len(results) >= k:
+                        return results
+            return results
+
+    # ------------------------------------------------------------ loading
+
+    async def ensure_loaded(self):
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await self._load()
+                self.loaded = True
+
+    async def reload(self):
+        """Rebuild from the database and swap it in; recommendations keep using the old state meanwhile."""
+        if not self.loaded:
+            return
+        fresh = MatchingEngine()
+        await fresh._load()
+        with self._lock:
+            for name in ("jobs", "_job_buckets", "_locations_by_category", "_categories_by_location",
+                         "parttimers", "_parttimer_buckets", "_experience", "inactive_employers"):
+                setattr(self, name, getattr(fresh, name))
+
+    async def _load(self, batch=1000):
+        async for row in _paged("joblist", "id, " + ", ".join(f for f in JOB_SUMMARY_FIELDS if f != "id"),
+                                filters=[("status", "active")], batch=batch):
+            self.add_job(row)
+        async for row in _paged("as_employer", "id, as_emp_id", filters=[("status", False)], batch=batch):
+            self.inactive_employers.add(row["as_emp_id"])
+        async for row in _paged("job_applications", "id, prtmr_id, joblist(category), as_parttimer(id)", batch=batch):
+            job = row.get("joblist") or {}
+            parttimer = row.get("as_parttimer") or {}
+            job = job[0] if isinstance(job, list) and job else job
+            parttimer = parttimer[0] if isinstance(parttimer, list) and parttimer else parttimer
+            if job and parttimer:
+                experience = self._experience.setdefault(parttimer["id"], {})
+                experience[job["category"]] = experience.get(job["category"], 0) + 1
+        async for row in _paged("as_parttimer", "id, location, available", batch=batch):
+            self.update_parttimer(row["id"], row.get("location"), row.get("available", True) is not False)
+        logger.info(f"Matching engine loaded {len(self.jobs)} jobs and {len(self.parttimers)} part-timers")
+
+
+async def _paged(table, columns, filters=(), batch=1000):
+    last_id = None
+    while True:
+        query = supabase.from_(table).select(columns)
+        for column, value in filters:
+            query = query.eq(column, value)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        result = await run_query(query.order("id").limit(batch))
+        rows = result.data or []
+        for row in rows:
+            yield row
+        if len(rows) < batch:
+            return
+        last_id = rows[-1]["id"]
+
+
+matching = MatchingEngine()
@@ -0,0 +1,208 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from loguru import logger
+
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "speedjobs")
+# requests slower than this log their backend-call trace
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "500"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FANOUT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense, one series per label tuple."""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            for label_values, series in items:
+                labels = _labels(self.labels, label_values)
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-2]}')
+                lines.append(f"{self.name}_count{{{labels}}} {series[-2]}")
+                lines.append(f"{self.name}_sum{{{labels}}} {series[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class RequestTrace:
+    """Backend calls made while serving one request, in order."""
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.calls = []  # (table, operation, wait_ms, run_ms, ok)
+
+    def record(self, table, operation, wait_seconds, run_seconds, ok):
+        self.calls.append((table, operation, round(wait_seconds * 1000, 2), round(run_seconds * 1000, 2), ok))
+
+    @property
+    def db_ms(self):
+        return sum(call[3] for call in self.calls)
+
+    def summary(self):
+        return ", ".join(f"{op} {table} {run_ms}ms" + ("" if ok else " FAILED") for table, op, _, run_ms, ok in self.calls)
+
+
+current_trace = ContextVar("current_trace", default=None)
+
+
+class Metrics:
+    def __init__(self, prefix=METRICS_PREFIX):
+        self.request_seconds = Histogram(f"{prefix}_http_request_duration_seconds",
+                                         "Request latency by route", ("method", "route", "status"), LATENCY_BUCKETS)
+        self.request_queries = Histogram(f"{prefix}_http_request_backend_calls",
+                                         "Supabase calls made per request, by route", ("method", "route"), FANOUT_BUCKETS)
+        self.query_seconds = Histogram(f"{prefix}_supabase_query_duration_seconds",
+                                       "Supabase call latency by table and operation", ("table", "operation"), LATENCY_BUCKETS)
+        self.query_wait_seconds = Histogram(f"{prefix}_supabase_pool_wait_seconds",
+                                            "Time a Supabase call waited for a worker thread", ("table",), LATENCY_BUCKETS)
+        self.query_errors = Counter(f"{prefix}_supabase_query_errors_total",
+                                    "Supabase calls that raised", ("table", "operation"))
+        self.prefix = prefix
+        self._snapshots = {}
+
+    def register_snapshot(self, name, snapshot):
+        """Expose a component's snapshot() dict as gauges named <prefix>_<name>_<key>."""
+        self._snapshots[name] = snapshot
+
+    def observe_query(self, table, operation, wait_seconds, run_seconds, ok):
+        self.query_seconds.observe((table, operation), run_seconds)
+        self.query_wait_seconds.observe((table,), wait_seconds)
+        if not ok:
+            self.query_errors.inc((table, operation))
+        trace = current_trace.get()
+        if trace is not None:
+            trace.record(table, operation, wait_seconds, run_seconds, ok)
+
+    def observe_request(self, trace, route, status):
+        elapsed = time.perf_counter() - trace.started
+        self.request_seconds.observe((trace.method, route, str(status)), elapsed)
+        self.request_queries.observe((trace.method, route), len(trace.calls))
+        if elapsed * 1000 >= TRACE_SLOW_MS:
+            logger.warning(f"Slow request {trace.method} {trace.path} {elapsed * 1000:.0f}ms "
+                           f"status={status} calls={len(trace.calls)}: {trace.summary()}")
+
+    def render(self):
+        lines = []
+        for metric in (self.request_seconds, self.request_queries, self.query_seconds,
+                       self.query_wait_seconds, self.query_errors):
+            lines.extend(metric.render())
+        for name, snapshot in self._snapshots.items():
+            try:
+                values = snapshot()
+            except Exception as e:
+                logger.warning(f"Metrics snapshot {name} failed: {str(e)}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {self.prefix}_{name}_{key} gauge")
+                    lines.append(f"{self.prefix}_{name}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def describe_query(query):
+    """(table, operation) for a postgrest request builder."""
+    path = getattr(query, "path", "") or ""
+    table = path.strip("/") or "unknown"
+    method = (getattr(query, "http_method", "") or "").upper()
+    if method == "POST":
+        prefer = str((getattr(query, "headers", None) or {}).get("Prefer", ""))
+        operation = "rpc" if table.startswith("rpc/") else "upsert" if "resolution=" in prefer else "insert"
+    else:
+        operation = {"GET": "select", "HEAD": "count", "PATCH": "update", "DELETE": "delete"}.get(method, method.lower() or "unknown")
+    return table, operation
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and backend-call fan-out. Each
+    request gets a RequestTrace in a context variable that run_query appends
+    to; the totals go out in a Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope["method"], scope["path"])
+        token = current_trace.set(trace)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing",
+                                f'db;dur={trace.db_ms:.1f};desc="{len(trace.calls)} calls"'.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_trace.reset(token)
+            # templated path (e.g. /api/joblist/{job_id}) keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            metrics.observe_request(trace, route, status)
@@ -0,0 +1,57 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size=2):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _quote(value):
+    # timestamps contain "." and ":" which PostgREST treats as syntax inside or=()
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+def keyset_after(query, cursor, column="created_at", tiebreak="id", desc=True, embedded=None):
+    """
+    Restrict query to rows strictly after cursor in (column, tiebreak) order.
+    The cursor comes from encode_cursor(row[column], row[tiebreak]).
+    """
+    value, row_id = decode_cursor(cursor)
+    op = "lt" if desc else "gt"
+    expr = f"({column}.{op}.{_quote(value)},and({column}.eq.{_quote(value)},{tiebreak}.{op}.{_quote(row_id)}))"
+    # postgrest-py 0.10 has no or_() builder, so add the parameter directly
+    query.params = query.params.add(f"{embedded}.or" if embedded else "or", expr)
+    return query
+
+
+def order_keyset(query, column="created_at", tiebreak="id", desc=True, embedded=None):
+    # a single order parameter; chained .order() calls would send it twice
+    direction = "desc" if desc else "asc"
+    query.params = query.params.add(
+        f"{embedded}.order" if embedded else "order", f"{column}.{direction},{tiebreak}.{direction}"
+    )
+    return query
+
+
+def split_page(rows, limit, column="created_at", tiebreak="id"):
+    """Given limit + 1 rows, return (page, next_cursor)."""
+    rows = rows or []
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last.get(column), last.get(tiebreak))
@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from loguru import logger
+
+from utils.db import BackendOverloaded, shed_calls
+from utils.metrics import metrics
+from utils.responses import dumps
+
+try:
+    import redis.asyncio as redis  # optional dependency, for limits shared across workers
+except ImportError:
+    redis = None
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# "memory" keeps buckets per process; redis://host:port/db shares them across workers
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# tokens per second and bucket size. Per-IP limits are loose because mobile
+# carriers put many users behind one address; the per-user limit does the real work.
+RATE_LIMIT_IP_RATE = float(os.getenv("RATE_LIMIT_IP_RATE", "50"))
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "100"))
+RATE_LIMIT_USER_RATE = float(os.getenv("RATE_LIMIT_USER_RATE", "10"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "40"))
+RATE_LIMIT_LOGIN_RATE = float(os.getenv("RATE_LIMIT_LOGIN_RATE", "1"))
+RATE_LIMIT_LOGIN_BURST = float(os.getenv("RATE_LIMIT_LOGIN_BURST", "10"))
+# only honour X-Forwarded-For behind a proxy that sets it, or clients pick their own bucket
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+LOGIN_PATHS = ("/api/auth/google",)
+EXEMPT_PATHS = ("/health", "/livez", "/readyz", "/metrics")
+OVERLOAD_RETRY_AFTER = os.getenv("OVERLOAD_RETRY_AFTER", "1")
+
+
+class MemoryBucketStore:
+    """Token buckets in this process, least recently used evicted past max_keys (an evicted bucket starts full)."""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    async def take(self, key, rate, burst, cost=1.0):
+        """Spend cost tokens if available. Returns (allowed, seconds until enough tokens)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# refill, spend and store in one round trip; Redis' clock keeps workers consistent
+TAKE_SCRIPT = """
+local rate, burst, cost, ttl = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1e6
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens, updated = tonumber(state[1]) or burst, tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """Token buckets in Redis, shared by every worker and replica pointing at it."""
+
+    def __init__(self, url, prefix="ratelimit:"):
+        self._client = redis.from_url(url)
+        self._take = self._client.register_script(TAKE_SCRIPT)
+        self.prefix = prefix
+
+    async def take(self, key, rate, burst, cost=1.0):
+        # a bucket idle long enough to refill completely carries no state worth keeping
+        ttl = max(1, int(burst / rate) + 1)
+        allowed, tokens = await self._take(keys=[self.prefix + key], args=[rate, burst, cost, ttl])
+        return bool(allowed), 0.0 if allowed else (cost - float(tokens)) / rate
+
+    def __len__(self):
+        return 0
+
+
+def make_bucket_store(url=RATE_LIMIT_STORE):
+    if url == "memory":
+        return MemoryBucketStore()
+    if redis is None:
+        logger.warning(f"RATE_LIMIT_STORE={url} needs the redis package; falling back to per-process buckets")
+        return MemoryBucketStore()
+    return RedisBucketStore(url)
+
+
+class RateLimiter:
+    def __init__(self, store, enabled=RATE_LIMIT_ENABLED):
+        self.store = store
+        self.enabled = enabled
+        self.rejected = {"ip": 0, "login": 0, "user": 0}
+
+    async def check(self, kind, key, rate, burst):
+        """Returns 0 when allowed, otherwise the seconds to wait before retrying."""
+        if not self.enabled:
+            return 0.0
+        try:
+            allowed, retry_after = await self.store.take(f"{kind}:{key}", rate, burst)
+        except Exception as e:
+            # a broken shared store must not take the API down with it
+            logger.warning(f"Rate limit store failed, allowing request: {str(e)}")
+            return 0.0
+        if allowed:
+            return 0.0
+        self.rejected[kind] += 1
+        return retry_after
+
+    async def check_user(self, user_id):
+        """Per-user bucket, keyed by the access token's id claim. Raises a 429 when empty."""
+        if not user_id:
+            return
+        retry_after = await self.check("user", user_id, RATE_LIMIT_USER_RATE, RATE_LIMIT_USER_BURST)
+        if retry_after:
+            raise HTTPException(status_code=429, detail="Too many requests",
+                                headers={"Retry-After": retry_after_header(retry_after)})
+
+    def snapshot(self):
+        return {"buckets": len(self.store), **{f"rejected_{kind}": n for kind, n in self.rejected.items()}}
+
+
+def retry_after_header(seconds):
+    return str(max(1, int(seconds + 0.999)))
+
+
+def client_ip(scope):
+    if RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def send_json(send, status, detail, retry_after):
+    body = dumps({"detail": detail})
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", retry_after.encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """
+    Per-IP token buckets (a stricter one for login) checked before routing,
+    and a 503 with Retry-After for any request that had a backend call shed,
+    including when the route caught the error and answered 500.
+    """
+
+    def __init__(self, app, limiter=None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if scope["method"] != "OPTIONS" and not path.startswith(EXEMPT_PATHS):
+            ip = client_ip(scope)
+            retry_after = await self.limiter.check("ip", ip, RATE_LIMIT_IP_RATE, RATE_LIMIT_IP_BURST)
+            if not retry_after and path.startswith(LOGIN_PATHS):
+                retry_after = await self.limiter.check("login", ip, RATE_LIMIT_LOGIN_RATE, RATE_LIMIT_LOGIN_BURST)
+            if retry_after:
+                await send_json(send, 429, "Too many requests", retry_after_header(retry_after))
+                return
+
+        shed = []
+        token = shed_calls.set(shed)
+        started = replaced = False
+
+        async def send_or_replace(message):
+            nonlocal started, replaced
+            if message["type"] == "http.response.start":
+                started = True
+                if shed and message["status"] >= 500:
+                    replaced = True
+                    await send_json(send, 503, "Service overloaded, retry shortly", OVERLOAD_RETRY_AFTER)
+                    return
+            if not replaced:
+                await send(message)
+
+        try:
+            await self.app(scope, receive, send_or_replace)
+        except BackendOverloaded:
+            if started:
+                raise
+            await send_json(send, 503, "Service overloaded, retry shortly", OVERLOAD_RETRY_AFTER)
+        finally:
+            shed_calls.reset(token)
+
+
+rate_limiter = RateLimiter(make_bucket_store())
+metrics.register_snapshot("ratelimit", rate_limiter.snapshot)
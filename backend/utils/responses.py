@@ -0,0 +1,44 @@
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+import orjson
+
+
+def json_response(content, status_code=200, headers=None):
+    """
+    Serialize straight to bytes with orjson. Returning a Response from a route
+    skips FastAPI's jsonable_encoder pass, which dominates the cost of large lists.
+    """
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def dumps(content):
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def parse_fields(fields, allowed):
+    """
+    Parse a ?fields=a,b sparse fieldset against the columns an endpoint offers.
+    Returns the requested names in the endpoint's column order, or None for "all".
+    """
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}; "
+                                                    f"available: {', '.join(allowed)}")
+    return tuple(f for f in allowed if f in requested) or None
+
+
+def select_columns(fieldset, default, required=()):
+    """PostgREST select list for a fieldset (default when None), plus the columns the endpoint itself needs."""
+    columns = list(fieldset or default)
+    columns += [c for c in required if c not in columns]
+    return ", ".join(columns)
+
+
+def project(rows, fieldset):
+    """Drop the columns fetched for the endpoint's own use but not asked for."""
+    if fieldset is None:
+        return rows
+    return [{f: row.get(f) for f in fieldset} for row in rows]
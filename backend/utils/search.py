@@ -0,0 +1,262 @@
+import asyncio
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+
+from loguru import logger
+from utils.supabase_client import supabase
+from utils.db import run_query
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or the to with".split())
+# short_desc is the job title, so it counts more than the body
+FIELD_WEIGHTS = {"short_desc": 3.0, "category": 1.5, "long_desc": 1.0}
+SUMMARY_FIELDS = ("id", "category", "short_desc", "location", "salary", "created_at", "status")
+MAX_PREFIX_EXPANSION = 50
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class SearchIndex:
+    """
+    In-process inverted index over joblist text with BM25 ranking.
+
+    Each term's postings are kept sorted by BM25 impact (the per-document part of
+    the score), so top-k is a threshold-algorithm walk that stops once no unseen
+    document can beat the current k-th best, instead of scoring every match.
+    A sorted vocabulary makes prefix expansion (typeahead) a bisect plus a short scan.
+    Impacts use the average document length at the time a job is indexed;
+    reweight() recomputes them against the current average.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}  # term -> [(-impact, doc_id)] ascending, i.e. best first
+        self._doc_terms = {}  # doc_id -> {term: impact}
+        self._doc_tf = {}  # doc_id -> {term: weighted tf}
+        self._doc_len = {}
+        self._total_len = 0.0
+        self._vocabulary = []
+        self.docs = {}
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, job):
+        doc_id = job.get("id")
+        if job.get("status", "active") != "active":
+            self.remove(doc_id)
+            return
+        with self._lock:
+            self._remove(doc_id)
+            self._store(job)
+            self._index(doc_id, self._total_len / len(self.docs))
+
+    def add_many(self, jobs):
+        """Bulk build: store everything, then lay out each posting list with one sort."""
+        with self._lock:
+            for job in jobs:
+                if job.get("status", "active") == "active":
+                    self._remove(job.get("id"))
+                    self._store(job)
+            self._rebuild()
+
+    def _store(self, job):
+        doc_id = job.get("id")
+        tf = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(job.get(field)):
+                tf[token] = tf.get(token, 0.0) + weight
+        self.docs[doc_id] = {field: job.get(field) for field in SUMMARY_FIELDS}
+        self._doc_tf[doc_id] = tf
+        self._doc_len[doc_id] = sum(tf.values())
+        self._total_len += self._doc_len[doc_id]
+
+    def _index(self, doc_id, avg_len, keep_sorted=True):
+        tf, length = self._doc_tf[doc_id], self._doc_len[doc_id]
+        impacts = self._doc_terms[doc_id] = {}
+        for term, freq in tf.items():
+            impact = freq * (BM25_K1 + 1) / (freq + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len))
+            impacts[term] = impact
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = []
+                if keep_sorted:
+                    insort(self._vocabulary, term)
+            if keep_sorted:
+                insort(postings, (-impact, doc_id))
+            else:
+                postings.append((-impact, doc_id))
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        if doc_id not in self.docs:
+            return
+        impacts = self._doc_terms.pop(doc_id, {})
+        del self.docs[doc_id]
+        self._doc_tf.pop(doc_id, None)
+        self._total_len -= self._doc_len.pop(doc_id, 0.0)
+        for term, impact in impacts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            i = bisect_left(postings, (-impact, doc_id))
+            if i < len(postings) and postings[i] == (-impact, doc_id):
+                postings.pop(i)
+            if not postings:
+                del self._postings[term]
+                i = bisect_left(self._vocabulary, term)
+                if i < len(self._vocabulary) and self._vocabulary[i] == term:
+                    self._vocabulary.pop(i)
+
+    def reweight(self):
+        """Recompute every impact against the current average document length."""
+        with self._lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        self._postings, self._vocabulary, self._doc_terms = {}, [], {}
+        if not self.docs:
+            return
+        avg_len = self._total_len / len(self.docs)
+        for doc_id in self.docs:
+            self._index(doc_id, avg_len, keep_sorted=False)
+        for postings in self._postings.values():
+            postings.sort()
+        self._vocabulary = sorted(self._postings)
+
+    def _expand_prefix(self, prefix, limit=MAX_PREFIX_EXPANSION):
+        start = bisect_left(self._vocabulary, prefix)
+        expanded = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix) or len(expanded) >= limit:
+                break
+            expanded.append(term)
+        return expanded
+
+    def _idf(self, term):
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5))
+
+    def _score(self, doc_id, weighted_groups):
+        impacts = self._doc_terms[doc_id]
+        total = 0.0
+        for group in weighted_groups:
+            best = 0.0
+            for term, idf in group:
+                impact = impacts.get(term)
+                if impact is not None and impact * idf > best:
+                    best = impact * idf
+            total += best
+        return total
+
+    def search(self, query, limit=20, offset=0, prefix=True):
+        """
+        BM25-ranked matches for query; a job matching more query words ranks higher.
+        With prefix=True the last word also matches as a prefix, so partially typed
+        queries return results. Returns (hits, has_more).
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], False
+        want = offset + limit + 1
+        with self._lock:
+            # each query word is a group of index terms; a document scores its best term per group
+            groups = [[t] for t in tokens[:-1]]
+            groups.append(self._expand_prefix(tokens[-1]) if prefix else [tokens[-1]])
+            groups = [[t for t in group if t in self._postings] for group in groups]
+            groups = [group for group in groups if group]
+            if not groups:
+                return [], False
+            weighted_groups = [[(t, self._idf(t)) for t in group] for group in groups]
+            streams = [heapq.merge(*(_scaled(self._postings[t], idf) for t, idf in group)) for group in weighted_groups]
+
+            top, seen = [], set()  # top: min-heap of (score, doc_id)
+            frontier = [math.inf] * len(streams)
+            active = list(range(len(streams)))
+            while active:
+                for g in list(active):
+                    item = next(streams[g], None)
+                    if item is None:
+                        active.remove(g)
+                        frontier[g] = 0.0
+                        continue
+                    frontier[g] = -item[0]
+                    doc_id = item[1]
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    entry = (self._score(doc_id, weighted_groups), doc_id)
+                    if len(top) < want:
+                        heapq.heappush(top, entry)
+                    elif entry > top[0]:
+                        heapq.heapreplace(top, entry)
+                # nothing unseen can score more than the sum of the current frontier
+                if len(top) >= want and top[0][0] >= sum(frontier):
+                    break
+
+            ranked = sorted(top, reverse=True)[offset:]
+            hits = [{**self.docs[doc_id], "score": round(score, 4)} for score, doc_id in ranked[:limit]]
+            return hits, len(ranked) > limit
+
+    def suggest(self, prefix, limit=10):
+        """Vocabulary completions for a partial word, most common first."""
+        tokens = tokenize(prefix)
+        if not tokens:
+            return []
+        with self._lock:
+            candidates = self._expand_prefix(tokens[-1], limit=MAX_PREFIX_EXPANSION * 4)
+            ranked = heapq.nlargest(limit, candidates, key=lambda term: len(self._postings.get(term, ())))
+        return ranked
+
+    async def ensure_loaded(self, batch=1000):
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if self.loaded:
+                return
+            rows, last_id = [], None
+            columns = ", ".join(dict.fromkeys(SUMMARY_FIELDS + tuple(FIELD_WEIGHTS)))
+            while True:
+                query = supabase.from_("joblist").select(columns).eq("status", "active")
+                if last_id is not None:
+                    query = query.gt("id", last_id)
+                result = await run_query(query.order("id").limit(batch))
+                page = result.data or []
+                rows.extend(page)
+                if len(page) < batch:
+                    break
+                last_id = page[-1]["id"]
+            # jobs indexed by save_job while loading are in rows too; add_many replaces them
+            self.add_many(rows)
+            self.loaded = True
+            logger.info(f"Search index loaded {len(self.docs)} jobs, {len(self._vocabulary)} terms")
+
+    async def reload(self):
+        """Rebuild from joblist and swap it in; searches keep using the old index meanwhile. No-op until loaded."""
+        if not self.loaded:
+            return
+        fresh = SearchIndex()
+        await fresh.ensure_loaded()
+        with self._lock:
+            for name in ("_postings", "_doc_terms", "_doc_tf", "_doc_len", "_total_len", "_vocabulary", "docs"):
+                setattr(self, name, getattr(fresh, name))
+
+
+def _scaled(postings, idf):
+    for neg_impact, doc_id in postings:
+        yield neg_impact * idf, doc_id
+
+
+search_index = SearchIndex()
@@ -1,10 +1,37 @@
 from supabase import create_client
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+class LazySupabaseClient:
+    """
+    Stands in for the Supabase client and creates it on first use, so importing
+    the app reads no credentials and opens nothing. The lifespan hook calls
+    connect() at startup; each worker process gets its own client either way.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+        return self._client
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.postgrest.session.close()
+
+    def __getattr__(self, name):
+        return getattr(self.connect(), name)
+
+
+supabase = LazySupabaseClient()
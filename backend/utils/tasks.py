@@ -0,0 +1,382 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+import orjson
+from loguru import logger
+
+from utils.metrics import metrics
+from utils.responses import dumps
+
+# "0" runs every task inline in the request that enqueued it, as before the queue existed
+TASKS_ENABLED = os.getenv("TASKS_ENABLED", "1") == "1"
+# "" keeps the queue in this process (lost on restart); sqlite:///path/to/file survives
+# restarts and is shared by the workers on one machine
+TASKS_URL = os.getenv("TASKS_URL", "")
+TASK_CONCURRENCY = int(os.getenv("TASK_CONCURRENCY", "16"))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "5"))
+# retry n waits about TASK_BACKOFF_BASE * 2**(n-1) seconds, jittered, capped at TASK_BACKOFF_MAX
+TASK_BACKOFF_BASE = float(os.getenv("TASK_BACKOFF_BASE", "1"))
+TASK_BACKOFF_MAX = float(os.getenv("TASK_BACKOFF_MAX", "300"))
+TASK_TIMEOUT = float(os.getenv("TASK_TIMEOUT", "30"))
+TASK_POLL_INTERVAL = float(os.getenv("TASK_POLL_INTERVAL", "1"))
+# a task claimed by a worker that died is handed out again after this many seconds
+TASK_LEASE = float(os.getenv("TASK_LEASE", "120"))
+DEAD_LETTER_SIZE = 1000
+
+
+class MemoryTaskBackend:
+    """Tasks in this process: no setup and no I/O, but whatever is queued at exit is lost."""
+
+    def __init__(self, dead_letter_size=DEAD_LETTER_SIZE):
+        self._due = []  # heap of (run_at, seq, task)
+        self._seq = itertools.count()
+        self._dead = deque(maxlen=dead_letter_size)
+
+    async def push(self, task):
+        heapq.heappush(self._due, (task["run_at"], next(self._seq), task))
+
+    async def claim(self, limit, lease):
+        now = time.time()
+        claimed = []
+        while self._due and len(claimed) < limit and self._due[0][0] <= now:
+            claimed.append(heapq.heappop(self._due)[2])
+        return claimed
+
+    async def ack(self, task):
+        pass
+
+    async def reschedule(self, task):
+        await self.push(task)
+
+    async def bury(self, task):
+        self._dead.append(task)
+
+    async def dead_letters(self, limit=100):
+        return list(self._dead)[-limit:]
+
+    def pending(self):
+        return len(self._due)
+
+    def dead(self):
+        return len(self._dead)
+
+
+class SqliteTaskBackend:
+    """
+    Tasks in a SQLite file: they survive a restart, and every worker on the
+    machine claims from the same table. Claimed tasks are leased; if the
+    worker dies before acking, the lease runs out and another worker retries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        db = self._connect()
+        db.execute("create table if not exists tasks (id text primary key, name text, payload blob, "
+                   "attempts integer, run_at real, state text, lease_until real, error text)")
+        db.execute("create index if not exists tasks_due on tasks (state, run_at)")
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("pragma journal_mode=wal")
+            db.execute("pragma synchronous=normal")
+        return db
+
+    def _push(self, task):
+        self._connect().execute(
+            "insert or replace into tasks (id, name, payload, attempts, run_at, state, lease_until, error) "
+            "values (?, ?, ?, ?, ?, 'pending', null, ?)",
+            (task["id"], task["name"], dumps(task["payload"]), task["attempts"], task["run_at"], task.get("error")))
+
+    def _claim(self, limit, lease):
+        db = self._connect()
+        now = time.time()
+        db.execute("begin immediate")
+        try:
+            rows = db.execute(
+                "select id, name, payload, attempts, run_at from tasks "
+                "where (state = 'pending' and run_at <= ?) or (state = 'leased' and lease_until <= ?) "
+                "order by run_at limit ?", (now, now, limit)).fetchall()
+            db.executemany("update tasks set state = 'leased', lease_until = ? where id = ?",
+                           [(now + lease, row[0]) for row in rows])
+            db.execute("commit")
+        except Exception:
+            db.execute("rollback")
+            raise
+        return [{"id": r[0], "name": r[1], "payload": orjson.loads(r[2]), "attempts": r[3], "run_at": r[4]}
+                for r in rows]
+
+    def _ack(self, task):
+        self._connect().execute("delete from tasks where id = ?", (task["id"],))
+
+    def _bury(self, task):
+        self._connect().execute("update tasks set state = 'dead', attempts = ?, error = ? where id = ?",
+                                (task["attempts"], task.get("error"), task["id"]))
+
+    def _dead_letters(self, limit):
+        rows = self._connect().execute(
+            "select id, name, payload, attempts, run_at, error from tasks where state = 'dead' "
+            "order by run_at desc limit ?", (limit,)).fetchall()
+        return [{"id": r[0], "name": r[1], "payload": orjson.loads(r[2]), "attempts": r[3], "run_at": r[4],
+                 "error": r[5]} for r in rows]
+
+    def _count(self, where):
+        return self._connect().execute(f"select count(*) from tasks where {where}").fetchone()[0]
+
+    async def push(self, task):
+        await asyncio.to_thread(self._push, task)
+
+    async def claim(self, limit, lease):
+        return await asyncio.to_thread(self._claim, limit, lease)
+
+    async def ack(self, task):
+        await asyncio.to_thread(self._ack, task)
+
+    async def reschedule(self, task):
+        await asyncio.to_thread(self._push, task)
+
+    async def bury(self, task):
+        await asyncio.to_thread(self._bury, task)
+
+    async def dead_letters(self, limit=100):
+        return await asyncio.to_thread(self._dead_letters, limit)
+
+    def pending(self):
+        return self._count("state != 'dead'")
+
+    def dead(self):
+        return self._count("state = 'dead'")
+
+
+def make_task_backend(url=TASKS_URL):
+    if url.startswith("sqlite:///"):
+        return SqliteTaskBackend(url[len("sqlite:///"):])
+    if url:
+        logger.warning(f"Unsupported TASKS_URL {url!r}; queueing tasks in-process")
+    return MemoryTaskBackend()
+
+
+class TaskLimit:
+    """A cap on running tasks that several handlers can share, e.g. everything calling one rate-limited API."""
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.running = 0
+
+
+class TaskHandler:
+    def __init__(self, name, fn, max_attempts, timeout, concurrency):
+        self.name = name
+        self.fn = fn
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        if concurrency is None or isinstance(concurrency, TaskLimit):
+            self.limit = concurrency
+        else:
+            self.limit = TaskLimit(concurrency)
+
+
+class TaskQueue:
+    """
+    Post-commit work (publishing events, geocoding, notifications) that a
+    request hands off instead of waiting for. enqueue() returns as soon as the
+    task is stored; workers in this process run it with at most `concurrency`
+    tasks in flight overall, and per handler if one is given. A failing task is
+    retried with jittered exponential backoff and dead-lettered after
+    max_attempts. Payloads must be JSON-serializable so any backend can store them.
+    """
+
+    def __init__(self, backend, enabled=TASKS_ENABLED, concurrency=TASK_CONCURRENCY, poll_interval=TASK_POLL_INTERVAL,
+                 lease=TASK_LEASE, backoff_base=TASK_BACKOFF_BASE, backoff_max=TASK_BACKOFF_MAX):
+        self.backend = backend
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._handlers = {}
+        self._running = set()
+        self._wake = None
+        self._dispatcher = None
+        self._stopping = False
+        self.enqueued = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.errors = 0
+
+    def register(self, name, fn, max_attempts=TASK_MAX_ATTEMPTS, timeout=TASK_TIMEOUT, concurrency=None):
+        """
+        fn(payload) is awaited for every task enqueued under name; it should be
+        safe to run twice. concurrency is a number for this handler alone or a
+        TaskLimit shared with other handlers.
+        """
+        self._handlers[name] = TaskHandler(name, fn, max_attempts, timeout, concurrency)
+
+    async def enqueue(self, name, payload, delay=0.0):
+        """Store a task and return its id. Never raises for backend trouble: the task then runs inline."""
+        handler = self._handlers[name]  # an unknown name is a bug, not a runtime condition
+        payload = orjson.loads(dumps(payload))
+        self.enqueued += 1
+        if not self.enabled:
+            await self._call_inline(handler, payload)
+            return None
+        task = {"id": str(uuid.uuid4()), "name": name, "payload": payload, "attempts": 0,
+                "run_at": time.time() + delay}
+        try:
+            await self.backend.push(task)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Could not queue {name}, running it inline: {str(e)}")
+            await self._call_inline(handler, payload)
+            return None
+        await self.start()
+        self._wake.set()
+        return task["id"]
+
+    async def _call_inline(self, handler, payload):
+        try:
+            await asyncio.wait_for(handler.fn(payload), timeout=handler.timeout)
+            self.succeeded += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Task {handler.name} failed: {str(e) or type(e).__name__}")
+
+    async def start(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._stopping = False
+            self._wake = asyncio.Event()
+            # a fresh context: tasks must not inherit (and report into) the request that started the workers
+            self._dispatcher = contextvars.Context().run(asyncio.get_running_loop().create_task, self._dispatch())
+
+    async def stop(self, timeout=10.0):
+        """Stop claiming and give running tasks up to timeout to finish."""
+        if self._dispatcher is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._dispatcher
+        self._dispatcher = None
+        if self._running:
+            _, unfinished = await asyncio.wait(set(self._running), timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+        left = self.backend.pending()
+        if left:
+            logger.warning(f"Stopped with {left} queued tasks"
+                           + (" (lost: the queue is in-process)" if isinstance(self.backend, MemoryTaskBackend) else ""))
+
+    async def join(self, timeout=30.0):
+        """Wait until nothing is queued or running (benchmarks; retries scheduled later count as queued)."""
+        deadline = time.monotonic() + timeout
+        while self._running or self.backend.pending():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    async def _dispatch(self):
+        while not self._stopping:
+            self._wake.clear()
+            claimed = []
+            free = self.concurrency - len(self._running)
+            if free > 0:
+                try:
+                    claimed = await self.backend.claim(free, self.lease)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"Could not claim tasks: {str(e)}")
+            for task in claimed:
+                await self._start(task)
+            if not claimed or len(self._running) >= self.concurrency:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _start(self, task):
+        handler = self._handlers.get(task["name"])
+        if handler is None:
+            task["error"] = "no handler registered"
+            await self._settle(self.backend.bury, task)
+            self.dead_lettered += 1
+            return
+        if handler.limit is not None and handler.limit.running >= handler.limit.concurrency:
+            # over this handler's limit: put it back without using up an attempt
+            task["run_at"] = time.time() + self.poll_interval / 10
+            await self._settle(self.backend.reschedule, task)
+            return
+        if handler.limit is not None:
+            handler.limit.running += 1
+        running = asyncio.create_task(self._run(handler, task))
+        self._running.add(running)
+        running.add_done_callback(self._finished)
+
+    def _finished(self, running):
+        self._running.discard(running)
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self, handler, task):
+        try:
+            await asyncio.wait_for(handler.fn(task["payload"]), timeout=handler.timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            task["attempts"] += 1
+            task["error"] = str(e) or type(e).__name__
+            if task["attempts"] >= handler.max_attempts:
+                self.dead_lettered += 1
+                logger.error(f"Task {handler.name} {task['id']} failed {task['attempts']} times, "
+                             f"dead-lettered: {task['error']}")
+                await self._settle(self.backend.bury, task)
+            else:
+                self.retried += 1
+                task["run_at"] = time.time() + self.backoff(task["attempts"])
+                logger.warning(f"Task {handler.name} {task['id']} failed (attempt {task['attempts']}), "
+                               f"retrying: {task['error']}")
+                await self._settle(self.backend.reschedule, task)
+        else:
+            self.succeeded += 1
+            await self._settle(self.backend.ack, task)
+        finally:
+            if handler.limit is not None:
+                handler.limit.running -= 1
+
+    async def _settle(self, step, task):
+        try:
+            await step(task)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Could not update task {task['id']}: {str(e)}")
+
+    def backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def snapshot(self):
+        return {
+            "enqueued": self.enqueued,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "errors": self.errors,
+            "running": len(self._running),
+            "pending": self.backend.pending(),
+        }
+
+
+tasks = TaskQueue(make_task_backend())
+metrics.register_snapshot("tasks", tasks.snapshot)
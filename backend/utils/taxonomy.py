@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from loguru import logger
+from utils.supabase_client import supabase
+from utils.db import run_queries
+from utils.responses import dumps
+
+TAXONOMY_TTL = float(os.getenv("TAXONOMY_TTL", "600"))
+# serialized bodies kept per snapshot (one per endpoint/argument/fieldset combination)
+RENDER_CACHE_SIZE = 512
+
+
+class TaxonomySnapshot:
+    """Immutable, indexed view of job_category + job_details."""
+
+    def __init__(self, categories, details):
+        self.categories = [{"id": c.get("id"), "category": c.get("category")} for c in categories]
+        self.short_descs_by_category = {}
+        self.long_desc_by_short_desc = {}
+        for d in details:
+            cid, sd = d.get("category_id"), d.get("short_desc")
+            if cid is None or sd is None:
+                continue
+            self.short_descs_by_category.setdefault(str(cid), []).append(sd)
+            self.long_desc_by_short_desc.setdefault(sd, d.get("long_desc") or "")
+        self.categories_with_short_descs = [
+            {**c, "short_descs": self.short_descs_by_category.get(str(c["id"]), [])}
+            for c in self.categories
+        ]
+        digest = hashlib.sha1(
+            json.dumps([self.categories_with_short_descs, self.long_desc_by_short_desc], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        self.digest = digest[:20]
+        self.etag = f'W/"{self.digest}"'
+        self.loaded_at = time.monotonic()
+        self._rendered = {}
+
+    def render(self, key, build):
+        """JSON bytes of build(), serialized once per snapshot and key."""
+        body = self._rendered.get(key)
+        if body is None:
+            body = dumps(build())
+            if len(self._rendered) < RENDER_CACHE_SIZE:
+                self._rendered[key] = body
+        return body
+
+
+class Taxonomy:
+    """Serves the category taxonomy from memory, reloading it after TAXONOMY_TTL or invalidate()."""
+
+    def __init__(self, ttl=TAXONOMY_TTL):
+        self.ttl = ttl
+        self._snapshot = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _fresh(self):
+        return self._snapshot is not None and time.monotonic() - self._snapshot.loaded_at < self.ttl
+
+    async def get(self):
+        if self._fresh():
+            return self._snapshot
+        async with self._lock:
+            if not self._fresh():
+                await self._reload()
+        return self._snapshot
+
+    async def _reload(self):
+        try:
+            cat_res, jd_res = await run_queries(
+                supabase.from_("job_category").select("id,category"),
+                supabase.from_("job_details").select("category_id,short_desc,long_desc"),
+            )
+            self._snapshot = TaxonomySnapshot(cat_res.data or [], jd_res.data or [])
+        except Exception as e:
+            if self._snapshot is None:
+                raise
+            # keep serving the stale snapshot rather than failing the request
+            logger.warning(f"Taxonomy refresh failed, serving stale snapshot: {str(e)}")
+            self._snapshot.loaded_at = time.monotonic()
+
+
+taxonomy = Taxonomy()